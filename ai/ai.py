@@ -1,11 +1,20 @@
-import copy
+import itertools
 import logging
-import multiprocessing
+import math
+import os
 import pdb
+import random
+import time
+from concurrent import futures
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
-from model.model import Board, Tile, Piece, MoveType, Color
+from ai.ordering import MoveOrdering
+from ai.stats import SearchStats
+from ai.tablebase import Tablebase, open_tablebase
+from ai.transposition import TranspositionTable, Bound
+from model.bitboard import BitBoard, SQUARE_TILES
+from model.model import Board, Tile, Piece, MoveType, Color, PLAYABLE_TILES
 
 
 class Move:
@@ -26,33 +35,146 @@ class Move:
         return Move(self.path[::-1])
 
 
+class SearchTimeout(Exception):
+    pass
+
+
+# numbers the searches of this process, so the workers of a search can tell it from the one before
+_search_ids = itertools.count(1)
+
+
 class Ai:
-    def __init__(self, board: Board,  color: Color, depth: int = 4):
+    MAX_SEARCH_DEPTH = 64
+
+    def __init__(self, board: Board,  color: Color, depth: int = 4, alpha_beta: bool = False,
+                 transposition_table: Optional[TranspositionTable] = None, bitboard: bool = False,
+                 time_limit: Optional[float] = None, lazy_smp_workers: int = 0, collect_stats: bool = False,
+                 quiescence_depth: int = 0):
         self.board = board
         self.depth = depth
         self.color = color
+        self.alpha_beta = alpha_beta
+        self.transposition_table = transposition_table
+        self.ordering = MoveOrdering()
+        self.bitboard = bitboard
+        self.time_limit = time_limit
+        self.deadline = None
+        self.root_move_hint = None
+        self.depth_limited = False
+        self.completed_depth = 0
+        self.lazy_smp_workers = lazy_smp_workers
+        self.helper_index = 0
+        self.stop_signal = None
         self.last_move = None
-        logger = multiprocessing.log_to_stderr()
-        logger.setLevel(5)
+        self.collect_stats = collect_stats
+        # how many plies past depth a leaf with a capture pending is searched on, capture by capture
+        self.quiescence_depth = quiescence_depth
+        # an OpeningBook answers instead of the search for the first book_depth plies of a game
+        self.opening_book = None
+        self.book_depth = 0
+        self.book_randomness = 0.0
+        self.book_random = random.Random()
+        # a Tablebase gives the exact value of positions with few enough pieces in place of searching them
+        self.tablebase = None  # type: Optional[Tablebase]
+        # with batch_evaluation set, the leaf children of each node at the last ply before the horizon are
+        # scored together by a BatchEvaluator for the board's weights instead of one get_value at a time
+        self.batch_evaluation = False
+        self.batch_evaluator = None
+        # an evaluator, such as a NetworkEvaluator, scores leaves in place of get_value; it takes rows of
+        # kind codes like a BatchEvaluator, so leaves are always batched with one; executor workers load
+        # their own from its path, if it has one
+        self.evaluator = None
+        # the statistics of the search in progress, and of the last finished one
+        self.stats = None  # type: Optional[SearchStats]
+        self.last_stats = None  # type: Optional[SearchStats]
+        # the search in progress, or the last one; a worker's is the one its latest task came from
+        self.search_id = None  # type: Optional[tuple]
+
+    def worker_settings(self) -> dict:
+        # everything an executor worker needs to search like this Ai, in plain picklable values
+        shared_table = None
+        if self.transposition_table is not None and self.transposition_table.shared:
+            shared_table = self.transposition_table.spec()
+        return {
+            "color": self.color.value,
+            "depth": self.depth,
+            "quiescence_depth": self.quiescence_depth,
+            "alpha_beta": self.alpha_beta,
+            "bitboard": self.bitboard,
+            "last_move": None if self.last_move is None else tile_pairs(self.last_move),
+            "deadline": self.deadline,
+            "weights": self.board.get_weights(),
+            "shared_table": shared_table,
+            "tablebase": None if self.tablebase is None else self.tablebase.path,
+            "batch_evaluation": self.batch_evaluation,
+            "evaluator": getattr(self.evaluator, "path", None),
+            "collect_stats": self.stats is not None,
+            "search_id": self.search_id,
+        }
+
+    def apply_worker_settings(self, settings: dict):
+        self.color = Color(settings["color"])
+        self.depth = settings["depth"]
+        self.quiescence_depth = settings["quiescence_depth"]
+        self.alpha_beta = settings["alpha_beta"]
+        self.bitboard = settings["bitboard"]
+        self.last_move = None if settings["last_move"] is None else move_from_pairs(settings["last_move"])
+        self.deadline = settings["deadline"]
+        if settings["shared_table"] is not None:
+            from ai.shared_table import SharedTranspositionTable
+            self.transposition_table = SharedTranspositionTable.attach(*settings["shared_table"])
+        elif self.transposition_table is None or self.transposition_table.shared:
+            self.transposition_table = TranspositionTable()
+        if settings["search_id"] != self.search_id:
+            # a private table ages its entries the way the searching Ai's own table does; a shared one is
+            # aged by that Ai
+            self.search_id = settings["search_id"]
+            if not self.transposition_table.shared:
+                self.transposition_table.new_search()
+            self.ordering.new_search()
+        self.tablebase = None if settings["tablebase"] is None else open_tablebase(settings["tablebase"])
+        self.set_batch_evaluation(settings["batch_evaluation"])
+        self.evaluator = None
+        if settings["evaluator"] is not None:
+            from ai.network import open_network
+            self.evaluator = open_network(settings["evaluator"])
+        self.prepare_batch_evaluator(settings["weights"])
 
     def next_move(self, executor):
         move = self.get_best_move(executor)
         if move is not None:
-            self.do_move(move, self.board)
-            self.last_move = move
+            self.play(move)
+
+    def play(self, move: Move):
+        self.do_move(move, self.board)
+        self.last_move = move
 
     def get_available_moves(self, board) -> List[Move]:
-        moves = []
-        for row in range(8):
-            for col in range(8):
-                if (col + row) % 2 == 1:
-                    piece = board.get_piece_at(Tile(row, col))
-                    if piece is not None and piece.color == board.turn:
-                        moves += self.get_moves(Tile(row, col), board)
-        return moves
+        return list(self.generate_moves(board))
+
+    def generate_moves(self, board) -> Iterator[Move]:
+        # the legal moves one at a time, so a caller that only needs the first stops generating there; the
+        # board must be as it was whenever the generator resumes
+        if isinstance(board, BitBoard):
+            for path in board.generate_paths():
+                yield Move([SQUARE_TILES[square] for square in path])
+            return
+        # once a capture exists only captures are legal, so only the pieces that can capture are looked at
+        jumping = board.has_jump()
+        jumpers = board.red_jumpers if board.turn == Color.RED else board.black_jumpers
+        for tile in PLAYABLE_TILES:
+            if jumping:
+                if tile in jumpers:
+                    yield from self.generate_piece_moves(tile, board, True)
+                continue
+            piece = board.get_piece_at(tile)
+            if piece is not None and piece.color == board.turn:
+                yield from self.generate_piece_moves(tile, board, False)
 
     @staticmethod
     def do_move(move: Move, board) -> (List[Piece], bool):
+        if isinstance(board, BitBoard):
+            return board.do_move(move)
         start, *rest = move.path
         initial_turn = board.turn
         piece_at_start = board.get_piece_at(start)
@@ -71,10 +193,14 @@ class Ai:
         return jumped_pieces, was_king
 
     def undo_move(self, move: Move, jumped_pieces: List[Piece], must_jump: bool, was_king: bool, board):
+        if isinstance(board, BitBoard):
+            board.undo_move(move, jumped_pieces, must_jump, was_king)
+            return
         inverse_move = move.inverse()
         self.undo_path(inverse_move.path, jumped_pieces, was_king, board)
         board.switch_turn_color()
         board.must_jump = must_jump
+        board.count_turn(-1)
 
     def undo_path(self, path, jumped_pieces, was_king: bool, board):
         start, *tail = path
@@ -103,82 +229,392 @@ class Ai:
     def set_depth(self, depth):
         self.depth = depth
 
-    def get_moves(self, start: Tile, board, only_jumps=False, previous_moves=None, counter=0) -> List[Move]:
-        if previous_moves is None:
-            previous_moves = []
-        moves = []
-        tiles_to_check = list(start.get_valid_diagonal_tiles(2))
-        if not only_jumps:
-            tiles_to_check += list(start.get_valid_diagonal_tiles(1))
-        for end in tiles_to_check:
-            current_move = Move([start, end])
-            redid_move = False
-            for move in previous_moves:
-                if current_move == move.inverse() or current_move == move:
-                    redid_move = True
-                    break
-            if redid_move:
+    def set_alpha_beta(self, alpha_beta: bool):
+        self.alpha_beta = alpha_beta
+
+    @staticmethod
+    def move_priority(move: Move, board) -> int:
+        start, first_step, end = move.path[0], move.path[1], move.path[-1]
+        jumps = len(move.path) - 1 if start.distance_from(first_step) == 2 else 0
+        promotion = end.is_end_row() and not board.is_king_at(start)
+        return jumps * 2 + int(promotion)
+
+    def generate_piece_moves(self, start: Tile, board, jumping: bool, visited=None) -> Iterator[Move]:
+        # visited holds the jump edges of the chain so far, both ways round, as from * 64 + to tile indices;
+        # a chain may not take an edge again or go back along one
+        if not jumping:
+            for end in start.get_valid_diagonal_tiles(1):
+                if board.classify_move(start, end) == MoveType.NORMAL:
+                    yield Move([start, end])
+            return
+        if visited is None:
+            visited = set()
+        start_index = start.row * 8 + start.column
+        for end in start.get_valid_diagonal_tiles(2):
+            end_index = end.row * 8 + end.column
+            if start_index * 64 + end_index in visited:
                 continue
-            move_type = board.classify_move(start, end)
-            if move_type == MoveType.INVALID:
+            if board.classify_move(start, end) != MoveType.JUMP:
                 continue
-            if move_type == MoveType.NORMAL:
-                moves.append(current_move)
-            if move_type == MoveType.JUMP:
-                piece = board.get_piece_at(start)
-                was_king = piece.is_king
-                if end.is_end_row():
-                    piece.king()
-                board.set_piece_at(start, None)
-                board.set_piece_at(end, piece)
-                extra_jumps = self.get_moves(end, board, only_jumps=True,
-                                             previous_moves=previous_moves + [current_move], counter=counter + 1)
-                piece.king() if was_king else piece.unking()
-                board.set_piece_at(start, piece)
-                board.set_piece_at(end, None)
-                if extra_jumps:
-                    moves += [Move([start] + m.path) for m in extra_jumps]
-                else:
-                    moves.append(Move([start, end]))
-        return moves
+            piece = board.get_piece_at(start)
+            was_king = piece.is_king
+            if end.is_end_row():
+                piece.king()
+            # the piece is put back before anything is yielded, so the probe writes tiles directly and leaves
+            # the board's incrementally kept state (hash, value, jumpers) alone
+            board.tiles[start.row][start.column] = None
+            board.tiles[end.row][end.column] = piece
+            visited.add(start_index * 64 + end_index)
+            visited.add(end_index * 64 + start_index)
+            extra_jumps = list(self.generate_piece_moves(end, board, True, visited))
+            visited.discard(start_index * 64 + end_index)
+            visited.discard(end_index * 64 + start_index)
+            piece.king() if was_king else piece.unking()
+            board.tiles[start.row][start.column] = piece
+            board.tiles[end.row][end.column] = None
+            if extra_jumps:
+                for extra_jump in extra_jumps:
+                    yield Move([start] + extra_jump.path)
+            else:
+                yield Move([start, end])
+
+    def set_bitboard(self, bitboard: bool):
+        self.bitboard = bitboard
+
+    def set_time_limit(self, time_limit: Optional[float]):
+        self.time_limit = time_limit
+
+    def set_lazy_smp_workers(self, lazy_smp_workers: int):
+        self.lazy_smp_workers = lazy_smp_workers
+
+    def set_collect_stats(self, collect_stats: bool):
+        self.collect_stats = collect_stats
+
+    def set_quiescence_depth(self, quiescence_depth: int):
+        self.quiescence_depth = quiescence_depth
+
+    def set_opening_book(self, opening_book, book_depth: int = 12, book_randomness: float = 0.0):
+        self.opening_book = opening_book
+        self.book_depth = book_depth
+        self.book_randomness = book_randomness
+
+    def set_batch_evaluation(self, batch_evaluation: bool):
+        self.batch_evaluation = batch_evaluation
 
-    def get_best_move(self, executor) -> Optional[Move]:
-        _, move = self.evaluate_tree(None, self.board, 1, executor)
+    def set_evaluator(self, evaluator):
+        self.evaluator = evaluator
+
+    def prepare_batch_evaluator(self, weights: tuple):
+        self.batch_evaluator = self.evaluator
+        if self.evaluator is None and self.batch_evaluation:
+            from model.batch import evaluator_for
+            self.batch_evaluator = evaluator_for(weights)
+
+    def set_tablebase(self, tablebase: Optional[Tablebase]):
+        self.tablebase = tablebase
+
+    def book_move(self, board) -> Optional[Move]:
+        if self.opening_book is None or board.turn_counter >= self.book_depth:
+            return None
+        return self.opening_book.choose(board.zobrist_hash, self.get_available_moves(board), self.book_randomness,
+                                        self.book_random)
+
+    def complete_depth(self, depth: int):
+        self.completed_depth = depth
+        if self.stats is not None:
+            self.stats.record_depth(depth)
+
+    def get_best_move(self, executor, board: Optional[Board] = None, new_search: bool = True) -> Optional[Move]:
+        # searches self.board unless given another board, such as a copy to search on a background thread;
+        # without new_search, what earlier searches stored is kept as current, as for the next depth of an
+        # iterative deepening driven from outside
+        self.stats = SearchStats() if self.collect_stats else None
+        try:
+            return self.search_best_move(executor, self.board if board is None else board, new_search)
+        finally:
+            if self.stats is not None:
+                self.stats.finish()
+            self.last_stats, self.stats = self.stats, None
+
+    def search_best_move(self, executor, board: Board, new_search: bool = True) -> Optional[Move]:
+        board.reset_incremental_state()
+        move = self.book_move(board)
+        if move is not None:
+            self.completed_depth = 0
+            return move
+        if self.tablebase is not None and self.tablebase.probe(board) is not None:
+            # exact values already make progress, and taking back the last move may be the best defence
+            self.last_move = None
+        if new_search or self.search_id is None:
+            self.search_id = (os.getpid(), next(_search_ids))
+            if self.transposition_table is not None:
+                self.transposition_table.new_search()
+            self.ordering.new_search()
+        self.prepare_batch_evaluator(board.get_weights())
+        search_board = BitBoard.from_board(board) if self.bitboard else board
+        if executor is not None and self.lazy_smp_workers:
+            return self.get_best_move_lazy_smp(executor, search_board)
+        if self.time_limit is not None:
+            return self.get_best_move_timed(executor, search_board)
+        _, move = self.evaluate_tree(None, search_board, 1, executor)
+        self.complete_depth(self.depth)
         return move
 
-    def evaluate_tree(self, parent_move, board, depth, thread_pool: ThreadPoolExecutor) -> (float, Move):
+    def get_best_move_timed(self, executor, board) -> Optional[Move]:
+        # iterative deepening: each finished depth replaces the answer until the time budget runs out
         moves = self.get_available_moves(board)
-        if not moves or depth > self.depth:
-            return board.get_value(), parent_move
+        if len(moves) <= 1:
+            self.completed_depth = 0
+            return moves[0] if moves else None
+        start = time.time()
+        fixed_depth = self.depth
+        best_move = None
+        self.completed_depth = 0
+        try:
+            for depth in range(1, Ai.MAX_SEARCH_DEPTH + 1):
+                self.depth = depth
+                self.root_move_hint = best_move
+                self.depth_limited = False
+                # depth 1 always completes so there is a move to return however small the budget
+                self.deadline = start + self.time_limit if depth > 1 else None
+                try:
+                    _, best_move = self.evaluate_tree(None, board, 1, executor)
+                except SearchTimeout:
+                    break
+                self.complete_depth(depth)
+                if not self.depth_limited or time.time() >= start + self.time_limit:
+                    break
+        finally:
+            self.depth = fixed_depth
+            self.deadline = None
+            self.root_move_hint = None
+        return best_move
+
+    def get_best_move_lazy_smp(self, executor, board) -> Optional[Move]:
+        # Lazy SMP: helpers search the same root with staggered depths and root orderings, and all of
+        # them share one transposition table; only this process's own result is used
+        table = self.transposition_table
+        if table is None or not table.shared:
+            raise Exception("Lazy SMP needs a SharedTranspositionTable")
+        table.set_stopped(False)
+        settings = self.worker_settings()
+        snapshot = board.snapshot()
+        started = time.perf_counter()
+        helpers = [executor.submit(search_snapshot, (settings, snapshot, helper_index))
+                   for helper_index in range(1, self.lazy_smp_workers + 1)]
+        try:
+            if self.time_limit is not None:
+                return self.get_best_move_timed(None, board)
+            _, move = self.evaluate_tree(None, board, 1, None)
+            self.complete_depth(self.depth)
+            return move
+        finally:
+            table.set_stopped(True)
+            futures.wait(helpers)
+            if self.stats is not None:
+                self.stats.executor_seconds += time.perf_counter() - started
+                for helper in helpers:
+                    if helper.exception() is None:
+                        _, task_stats = helper.result()
+                        self.stats.record_worker(*task_stats)
+
+    def evaluate_tree(self, parent_move, board, depth, thread_pool: ThreadPoolExecutor,
+                      alpha: float = float("-inf"), beta: float = float("inf")) -> (float, Move):
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+        if self.tablebase is not None and parent_move is not None:
+            value = self.tablebase.value(board)
+            if value is not None:
+                if stats is not None:
+                    stats.tablebase_hits += 1
+                return value, parent_move
+        # past the search depth only forced captures are followed, so leaves are never mid-exchange
+        quiescent = depth > self.depth
+        horizon = quiescent and not (board.must_jump and depth <= self.depth + self.quiescence_depth)
+        # a leaf at the horizon only needs to know whether the game goes on, which the first move answers,
+        # and only until one leaf has shown that the search was cut short by its depth
+        moves = [] if horizon else self.get_available_moves(board)
+        if horizon or not moves:
+            if horizon and not self.depth_limited and next(self.generate_moves(board), None) is not None:
+                self.depth_limited = True
+            if stats is not None:
+                stats.leaves += 1
+            return self.leaf_value(board), parent_move
+        if quiescent and stats is not None:
+            stats.quiescence_nodes += 1
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise SearchTimeout()
+        if self.stop_signal is not None and self.stop_signal.stopped():
+            raise SearchTimeout()
+        entry = None
+        # capture sequences below the search depth are short and not worth a table slot
+        if self.transposition_table is not None and not quiescent:
+            entry = self.transposition_table.probe(board.zobrist_hash)
+            if stats is not None:
+                stats.table_probes += 1
+                stats.table_hits += entry is not None
+            if entry is not None and parent_move is not None and entry.depth > self.depth - depth:
+                if entry.bound == Bound.EXACT or \
+                        (entry.bound == Bound.LOWER and entry.value >= beta) or \
+                        (entry.bound == Bound.UPPER and entry.value <= alpha):
+                    self.depth_limited = True
+                    if stats is not None:
+                        stats.table_cutoffs += 1
+                    return entry.value, parent_move
+        if stats is not None:
+            stats.record_expansion(depth - 1, len(moves))
+        if self.alpha_beta and thread_pool is None:
+            hash_move = entry.best_move if entry is not None else None
+            if parent_move is None and self.root_move_hint is not None:
+                hash_move = self.root_move_hint
+            return self.evaluate_tree_pruned(parent_move, board, depth, moves, alpha, beta, hash_move)
         if thread_pool is not None:
-            children = thread_pool.map(self.evaluate_move, [(move, copy.deepcopy(board), depth, None, len(moves))
-                                                            for move in moves])
+            settings = self.worker_settings()
+            snapshot = board.snapshot()
+            started = time.perf_counter()
+            results = list(thread_pool.map(evaluate_snapshot, [(settings, snapshot, tile_pairs(move), depth,
+                                                                len(moves)) for move in moves]))
+            if stats is not None:
+                stats.executor_seconds += time.perf_counter() - started
+            children = []
+            for move, result in zip(moves, results):
+                if result is not None:
+                    value, depth_limited, task_stats = result
+                    self.depth_limited = self.depth_limited or depth_limited
+                    if stats is not None:
+                        stats.record_worker(*task_stats)
+                    children.append((value, move))
         else:
-            children = map(self.evaluate_move, [(move, board, depth, None, len(moves)) for move in moves])
+            leaf_values = self.batch_leaf_values(board, moves, depth)
+            children = [(leaf_values[index], move) if index in leaf_values else
+                        self.evaluate_move((move, board, depth, None, len(moves), alpha, beta))
+                        for index, move in enumerate(moves)]
         children = filter(lambda item: item is not None, children)
         if board.turn == Color.RED:
-            max_value, child_move = max(children, key=self.get_value_from_child)
-            if parent_move is not None:
-                return max_value, parent_move
-            else:
-                return max_value, child_move
+            value, child_move = max(children, key=self.get_value_from_child)
+        else:
+            value, child_move = min(children, key=self.get_value_from_child)
+        if self.transposition_table is not None and not quiescent:
+            self.transposition_table.store(board.zobrist_hash, self.depth - depth + 1, value, Bound.EXACT,
+                                           child_move)
+        if parent_move is not None:
+            return value, parent_move
         else:
-            min_value, child_move = min(children, key=self.get_value_from_child)
-            if parent_move is not None:
-                return min_value, parent_move
+            return value, child_move
+
+    def evaluate_tree_pruned(self, parent_move, board, depth, moves: List[Move], alpha: float,
+                             beta: float, hash_move: Optional[Move] = None) -> (float, Move):
+        maximizing = board.turn == Color.RED
+        is_root = parent_move is None
+        original_alpha, original_beta = alpha, beta
+        # the best move stored for this position is searched first, whatever its priority
+        indexed_moves = self.ordering.order(moves, depth - 1, lambda move: self.move_priority(move, board), hash_move)
+        if is_root and self.helper_index:
+            # Lazy SMP helpers start from different root moves so they fill the table with different lines
+            offset = self.helper_index % len(indexed_moves)
+            indexed_moves = indexed_moves[offset:] + indexed_moves[:offset]
+        best_value, best_move, best_index = None, None, None
+        first_move = None
+        leaf_values = self.batch_leaf_values(board, moves, depth)
+        for index, move in indexed_moves:
+            child_alpha, child_beta = alpha, beta
+            if is_root and best_index is not None and index < best_index:
+                # widen the window by one ulp so a tie with the current best comes back exact:
+                # ties then resolve to the earliest generated move, like max()/min() in the minimax
+                if maximizing:
+                    child_alpha = math.nextafter(alpha, float("-inf"))
+                else:
+                    child_beta = math.nextafter(beta, float("inf"))
+            if index in leaf_values:
+                child = leaf_values[index], move
             else:
-                return min_value, child_move
+                child = self.evaluate_move((move, board, depth, None, len(moves), child_alpha, child_beta))
+            if child is None:
+                continue
+            value, _ = child
+            if first_move is None:
+                first_move = move
+            if best_value is None or (value > best_value if maximizing else value < best_value) or \
+                    (is_root and value == best_value and index < best_index):
+                best_value, best_move, best_index = value, move, index
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.ordering.record_cutoff(move, depth - 1, self.depth - depth + 1)
+                if self.stats is not None:
+                    self.stats.cutoffs += 1
+                break
+        if self.stats is not None and len(moves) > 1:
+            self.stats.ordered_nodes += 1
+            self.stats.first_move_best += best_move is first_move
+        if self.transposition_table is not None and depth <= self.depth:
+            if best_value <= original_alpha:
+                bound = Bound.UPPER
+            elif best_value >= original_beta:
+                bound = Bound.LOWER
+            else:
+                bound = Bound.EXACT
+            self.transposition_table.store(board.zobrist_hash, self.depth - depth + 1, best_value, bound, best_move)
+        if is_root:
+            return best_value, best_move
+        return best_value, parent_move
+
+    def batch_leaf_values(self, board, moves: List[Move], depth: int) -> dict:
+        # for a node at the last ply before the horizon: each child that will be a leaf is made, encoded
+        # and taken back, then all of them are scored in one call; by move index, the others being searched
+        if self.batch_evaluator is None or depth != self.depth:
+            return {}
+        from model.batch import codes_from_keys, codes_from_masks
+        indices, masks, keys, turn_counters = [], [], [], []
+        for index, move in enumerate(moves):
+            if self.last_move is not None and move == self.last_move.inverse():
+                continue
+            must_jump = board.must_jump
+            jumped_pieces, was_king = self.do_move(move, board)
+            try:
+                if board.must_jump and self.quiescence_depth > 0:
+                    continue
+                if self.tablebase is not None and self.tablebase.probe(board) is not None:
+                    continue
+                if not self.depth_limited and next(self.generate_moves(board), None) is not None:
+                    self.depth_limited = True
+                indices.append(index)
+                if isinstance(board, BitBoard):
+                    masks.append((board.black, board.red, board.kings))
+                else:
+                    keys.append(board.piece_codes)
+                turn_counters.append(board.turn_counter)
+            finally:
+                self.undo_move(move, jumped_pieces, must_jump, was_king, board)
+        if not indices:
+            return {}
+        if self.stats is not None:
+            self.stats.nodes += len(indices)
+            self.stats.leaves += len(indices)
+        codes = codes_from_masks(*zip(*masks)) if masks else codes_from_keys(keys)
+        return dict(zip(indices, self.batch_evaluator.evaluate(codes, turn_counters).tolist()))
+
+    def leaf_value(self, board) -> float:
+        if self.evaluator is None:
+            return board.get_value()
+        return float(self.evaluator.evaluate_boards([board])[0])
 
     def evaluate_move(self, params):
-        move, board, depth, thread_pool, move_count = params
+        move, board, depth, thread_pool, move_count, alpha, beta = params
         if self.last_move is not None and move == self.last_move.inverse():
             if move_count == 1:
                 return 0, move
             return None
         must_jump = board.must_jump
         jumped_pieces, was_king = self.do_move(move, board)
-        val, child_move = self.evaluate_tree(move, board, depth + 1, thread_pool)
-        self.undo_move(move, jumped_pieces, must_jump, was_king, board)
+        try:
+            val, child_move = self.evaluate_tree(move, board, depth + 1, thread_pool, alpha, beta)
+        finally:
+            # a timed-out search unwinds through here, so the board is restored either way
+            self.undo_move(move, jumped_pieces, must_jump, was_king, board)
         return val, child_move
 
     def get_value_from_child(self, child):
@@ -194,3 +630,76 @@ class Ai:
     #             best_value = value
     #             best_move = child.move
     #     return best_move
+
+
+def tile_pairs(move: Move) -> tuple:
+    return tuple((tile.row, tile.column) for tile in move.path)
+
+
+def move_from_pairs(pairs) -> Move:
+    return Move([Tile(row, column) for row, column in pairs])
+
+
+_worker_ai = None  # type: Optional[Ai]
+
+
+def worker_ai(settings: dict) -> Ai:
+    # one Ai per worker process, reconfigured for every task so its private table stays warm
+    global _worker_ai
+    if _worker_ai is None:
+        _worker_ai = Ai(Board(True), Color(settings["color"]))
+    _worker_ai.apply_worker_settings(settings)
+    _worker_ai.depth_limited = False
+    _worker_ai.helper_index = 0
+    _worker_ai.stop_signal = None
+    _worker_ai.stats = SearchStats() if settings["collect_stats"] else None
+    return _worker_ai
+
+
+def worker_stats(ai: Ai) -> Optional[tuple]:
+    # what a worker task sends back for SearchStats.record_worker, or None when stats are off
+    if ai.stats is None:
+        return None
+    ai.stats.finish()
+    return os.getpid(), ai.stats.elapsed, ai.stats.to_dict()
+
+
+def board_from_snapshot(ai: Ai, snapshot: bytes, settings: dict):
+    if ai.bitboard:
+        return BitBoard.from_snapshot(snapshot, settings["weights"])
+    return Board.from_snapshot(snapshot, settings["weights"])
+
+
+def evaluate_snapshot(params) -> Optional[tuple]:
+    # executor entry point: rebuilds the position from its snapshot and searches one root move
+    settings, snapshot, move_pairs, depth, move_count = params
+    ai = worker_ai(settings)
+    board = board_from_snapshot(ai, snapshot, settings)
+    child = ai.evaluate_move((move_from_pairs(move_pairs), board, depth, None, move_count,
+                              float("-inf"), float("inf")))
+    if child is None:
+        return None
+    value, _ = child
+    return value, ai.depth_limited, worker_stats(ai)
+
+
+def search_snapshot(params) -> tuple:
+    # Lazy SMP helper entry point: deepens from the snapshot's root until the shared table's stop flag
+    # is raised, returning the deepest depth it completed and its statistics
+    settings, snapshot, helper_index = params
+    ai = worker_ai(settings)
+    ai.helper_index = helper_index
+    ai.stop_signal = ai.transposition_table
+    board = board_from_snapshot(ai, snapshot, settings)
+    completed_depth = 0
+    for depth in range(1 + helper_index % 2, Ai.MAX_SEARCH_DEPTH + 1):
+        ai.depth = depth
+        ai.depth_limited = False
+        try:
+            ai.evaluate_tree(None, board, 1, None)
+        except SearchTimeout:
+            break
+        completed_depth = depth
+        if not ai.depth_limited:
+            break
+    return completed_depth, worker_stats(ai)
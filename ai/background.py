@@ -0,0 +1,114 @@
+import threading
+from concurrent import futures
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Optional
+
+from ai.ai import Ai, Move, SearchTimeout
+from model.model import Board
+
+
+class StopFlag:
+    # the stopped() half of SharedTranspositionTable's interface, so it can serve as an Ai's stop_signal
+    def __init__(self):
+        self.event = threading.Event()
+
+    def stopped(self) -> bool:
+        return self.event.is_set()
+
+    def set_stopped(self, stopped: bool):
+        if stopped:
+            self.event.set()
+        else:
+            self.event.clear()
+
+
+class BackgroundSearch:
+    # runs an Ai's searches on a worker thread, one at a time, so an event loop can poll for the move
+    # instead of blocking on it; every search works on its own copy of the position
+    def __init__(self, ai: Ai, executor=None, ponder_depth: int = 2):
+        self.ai = ai
+        self.executor = executor
+        # how deep the opponent's reply is searched to guess what to ponder on
+        self.ponder_depth = ponder_depth
+        self.thread_pool = ThreadPoolExecutor(1)
+        self.future = None
+        self.stop_flag = None  # type: Optional[StopFlag]
+        self.position = None  # the snapshot of the position the running search is answering
+        self.pondering = False
+        # set when the last search finished with no move at all, which searching again would not change
+        self.no_move = False
+
+    def start(self, board: Board):
+        # board has the ai to move
+        self.cancel()
+        self.pondering = False
+        self.submit(board.copy())
+
+    def ponder(self, board: Board):
+        # board has the opponent to move: guess their reply and start answering it while they think
+        self.cancel()
+        predicted = board.copy()
+        guess = Ai(predicted, predicted.turn, self.ponder_depth, alpha_beta=True).get_best_move(None)
+        if guess is None:
+            return
+        Ai.do_move(guess, predicted)
+        self.pondering = True
+        self.submit(predicted)
+
+    def resume(self, board: Board) -> bool:
+        # board has the ai to move: a ponder search of this very position carries on as the real search,
+        # anything else is cancelled and replaced; returns whether the ponder search was kept
+        if self.future is not None and self.position == board.snapshot():
+            self.pondering = False
+            return True
+        self.start(board)
+        return False
+
+    def running(self) -> bool:
+        return self.future is not None
+
+    def has_no_move(self, board: Board) -> bool:
+        # whether a finished search already found board to have no legal move
+        return self.future is None and self.no_move and self.position == board.snapshot()
+
+    def poll(self) -> Optional[Move]:
+        # the move of a finished search, handed out once; None while searching, pondering or after a cancel
+        if self.future is None or self.pondering or not self.future.done():
+            return None
+        future, self.future = self.future, None
+        try:
+            move = future.result()
+        except SearchTimeout:
+            return None
+        self.no_move = move is None
+        return move
+
+    def cancel(self, wait: bool = False):
+        # with wait, returns only once the cancelled search has let go of the Ai, so its board and last move
+        # can be replaced
+        if self.future is not None:
+            self.stop_flag.set_stopped(True)
+            future, self.future = self.future, None
+            self.pondering = False
+            if wait:
+                futures.wait([future])
+
+    def shutdown(self):
+        self.cancel()
+        self.thread_pool.shutdown(wait=True)
+
+    def submit(self, board: Board):
+        self.stop_flag = StopFlag()
+        self.no_move = False
+        self.position = board.snapshot()
+        self.future = self.thread_pool.submit(self.search, board, self.stop_flag)
+
+    def search(self, board: Board, stop_flag: StopFlag) -> Optional[Move]:
+        if stop_flag.stopped():
+            # cancelled while queued behind the previous search
+            raise SearchTimeout()
+        self.ai.stop_signal = stop_flag
+        try:
+            return self.ai.get_best_move(self.executor, board)
+        finally:
+            self.ai.stop_signal = None
@@ -0,0 +1,175 @@
+import argparse
+import mmap
+import random
+import struct
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ai.ai import Ai, Move
+from ai.notation import move_code, move_from_code, moves_from_text, move_to_text
+from ai.transposition import TranspositionTable
+from model.model import Board, Color
+
+# file layout: a header, then fixed-size (position key, move code, weight) records sorted by key and move
+BOOK_HEADER = struct.Struct("<4sII")  # magic, version, record count
+BOOK_RECORD = struct.Struct("<QQI")
+BOOK_KEY = struct.Struct("<Q")
+BOOK_MAGIC = b"PCOB"
+BOOK_VERSION = 1
+
+# what a move earns each time it is played, by the result for the side that played it
+WIN_WEIGHT = 2
+DRAW_WEIGHT = 1
+LOSS_WEIGHT = 0
+
+RESULTS = {"red": Color.RED, "black": Color.BLACK, "draw": None}
+
+
+class BookBuilder:
+    def __init__(self, max_ply: int = 12):
+        # only the first max_ply plies of each game go into the book
+        self.max_ply = max_ply
+        self.weights = {}  # type: Dict[Tuple[int, int], int]
+
+    def add_game(self, moves: List[Move], winner: Optional[Color]):
+        board = Board()
+        for ply, move in enumerate(moves[:self.max_ply]):
+            if winner is None:
+                weight = DRAW_WEIGHT
+            else:
+                weight = WIN_WEIGHT if winner == board.turn else LOSS_WEIGHT
+            entry = board.zobrist_hash, move_code(move)
+            self.weights[entry] = self.weights.get(entry, 0) + weight
+            Ai.do_move(move, board)
+
+    def add_games_text(self, lines: Iterable[str]):
+        # one game per line: moves in notation, optionally followed by the result (red, black or draw)
+        for line in lines:
+            game = parse_game(line)
+            if game is not None:
+                self.add_game(*game)
+
+    def write(self, path: str):
+        entries = sorted(self.weights.items())
+        with open(path, "wb") as file:
+            file.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, len(entries)))
+            for (key, code), weight in entries:
+                file.write(BOOK_RECORD.pack(key, code, weight))
+
+
+def parse_game(line: str) -> Optional[Tuple[List[Move], Optional[Color]]]:
+    # a line of a games file as its moves and winner, or None for a blank or comment line
+    tokens = line.split()
+    if not tokens or tokens[0].startswith("#"):
+        return None
+    winner = None
+    if tokens[-1] in RESULTS:
+        winner = RESULTS[tokens.pop()]
+    return moves_from_text(" ".join(tokens)), winner
+
+
+def self_play_game(depth: int, random_plies: int, max_plies: int,
+                   rng: random.Random) -> Tuple[List[Move], Optional[Color]]:
+    # the first random_plies moves are picked at random so games spread over different openings
+    board = Board()
+    ais = {color: Ai(board, color, depth, alpha_beta=True, bitboard=True, quiescence_depth=8,
+                     transposition_table=TranspositionTable()) for color in Color}
+    moves = []
+    while len(moves) < max_plies and board.winner() is None:
+        ai = ais[board.turn]
+        if len(moves) < random_plies:
+            legal_moves = ai.get_available_moves(board)
+            move = rng.choice(legal_moves) if legal_moves else None
+        else:
+            move = ai.get_best_move(None)
+        if move is None:
+            # a side that cannot move loses
+            return moves, Color(-board.turn.value)
+        ai.play(move)
+        moves.append(move)
+    return moves, board.winner()
+
+
+class OpeningBook:
+    # a book file mapped into memory; probes binary-search the records in place without loading them
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = BOOK_HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            self.close()
+            raise ValueError("Not an opening book: " + path)
+        if len(self.data) != BOOK_HEADER.size + self.count * BOOK_RECORD.size:
+            self.close()
+            raise ValueError("Truncated opening book: " + path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def key_at(self, index: int) -> int:
+        return BOOK_KEY.unpack_from(self.data, BOOK_HEADER.size + index * BOOK_RECORD.size)[0]
+
+    def probe(self, key: int) -> List[Tuple[Move, int]]:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        for index in range(low, self.count):
+            record_key, code, weight = BOOK_RECORD.unpack_from(self.data, BOOK_HEADER.size + index * BOOK_RECORD.size)
+            if record_key != key:
+                break
+            entries.append((move_from_code(code), weight))
+        return entries
+
+    def choose(self, key: int, legal_moves: List[Move], randomness: float = 0.0,
+               rng: Optional[random.Random] = None) -> Optional[Move]:
+        # randomness 0 plays the heaviest move; above that, moves are drawn with probability growing with
+        # weight ** (1 / randomness), so 1 is proportional to weight and larger values flatten the choice
+        candidates = [(move, weight) for move, weight in self.probe(key) if weight > 0 and move in legal_moves]
+        if not candidates:
+            return None
+        if randomness <= 0:
+            return max(candidates, key=lambda candidate: candidate[1])[0]
+        rng = rng if rng is not None else random
+        moves, weights = zip(*candidates)
+        return rng.choices(moves, [weight ** (1 / randomness) for weight in weights])[0]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build an opening book from self-play and imported games")
+    parser.add_argument("output")
+    parser.add_argument("--games", type=int, default=20, help="self-play games to add")
+    parser.add_argument("--depth", type=int, default=4, help="search depth of the self-play engines")
+    parser.add_argument("--random-plies", type=int, default=4, help="random moves at the start of each game")
+    parser.add_argument("--max-plies", type=int, default=150, help="self-play games longer than this are draws")
+    parser.add_argument("--book-plies", type=int, default=12, help="plies of each game kept in the book")
+    parser.add_argument("--import", dest="imports", action="append", default=[],
+                        help="a text file of games, one per line, to add as well")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    builder = BookBuilder(args.book_plies)
+    for path in args.imports:
+        with open(path) as file:
+            builder.add_games_text(file)
+    rng = random.Random(args.seed)
+    for game in range(args.games):
+        moves, winner = self_play_game(args.depth, args.random_plies, args.max_plies, rng)
+        builder.add_game(moves, winner)
+        print("game {}: {} plies, {}".format(game + 1, len(moves), "draw" if winner is None else winner.name.lower()),
+              " ".join(move_to_text(move) for move in moves[:args.book_plies]))
+    builder.write(args.output)
+    print("{} positions and moves written to {}".format(len(builder.weights), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,284 @@
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures.process import ProcessPoolExecutor
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import List, Optional
+
+from ai.ai import Ai, SearchTimeout
+from ai.background import StopFlag
+from ai.notation import move_from_text, move_to_text
+from ai.options import parse_bool, parse_optional_float, parse_weights
+from ai.tablebase import open_tablebase
+from ai.transposition import TranspositionTable
+from model.model import Board
+
+# A line-based protocol on stdin and stdout, for running the engine as a long-lived subprocess:
+#
+#   isready                                  answered by readyok once earlier commands are done
+#   newgame                                  forgets what earlier searches learnt and sets up the start
+#   position startpos|<key> [moves <move>...]  the start or a Board.to_key in hex, then moves in notation
+#   setoption <name> <value>                 one of OPTIONS
+#   go [depth <plies>] [time <seconds>]      searches, the options' depth and time unless given here,
+#                                            writing "info" for every finished depth, then "bestmove"
+#   stop                                     ends the search, which answers with its deepest finished move
+#   quit
+#
+# Searches run on a thread of their own, so stop and isready are read while one runs. The transposition
+# table, the opening book, the tablebase and the worker processes all stay loaded between commands.
+# Problems are reported as "error <message>" lines.
+OPTIONS = {
+    "depth": int,
+    "time": parse_optional_float,
+    "quiescence_depth": int,
+    "alpha_beta": parse_bool,
+    "bitboard": parse_bool,
+    "weights": parse_weights,
+    "hash": int,  # megabytes of transposition table
+    "workers": int,  # Lazy SMP helper processes
+    "book": str,
+    "tablebase": str,
+    "network": str,
+}
+
+
+def warm_up(_: int) -> int:
+    # executor entry point, run once per process so the first search does not wait for them to start
+    return 0
+
+
+class Engine:
+    def __init__(self, out=None):
+        self.out = sys.stdout if out is None else out
+        self.output_lock = threading.Lock()
+        self.board = Board()
+        self.depth = 6
+        self.time_limit = None  # type: Optional[float]
+        self.weights = None  # type: Optional[tuple]
+        self.hash_megabytes = 64
+        self.ai = Ai(self.board, self.board.turn, self.depth, alpha_beta=True, bitboard=True,
+                     transposition_table=TranspositionTable(self.hash_megabytes * 1024 * 1024),
+                     collect_stats=True, quiescence_depth=8)
+        self.executor = None  # type: Optional[ProcessPoolExecutor]
+        self.opening_book = None
+        self.thread_pool = ThreadPoolExecutor(1)
+        self.search = None
+        self.stop_flag = None  # type: Optional[StopFlag]
+        self.commands = {
+            "isready": self.is_ready,
+            "newgame": self.new_game,
+            "position": self.set_position,
+            "setoption": self.set_option,
+            "go": self.go,
+            "stop": self.stop,
+        }
+
+    def send(self, line: str):
+        # the search thread writes too
+        with self.output_lock:
+            print(line, file=self.out, flush=True)
+
+    def handle(self, line: str) -> bool:
+        # False once the engine should quit
+        tokens = line.split()
+        if not tokens:
+            return True
+        if tokens[0] == "quit":
+            return False
+        if tokens[0] not in self.commands:
+            self.send("error unknown command " + tokens[0])
+            return True
+        try:
+            self.commands[tokens[0]](tokens[1:])
+        except ValueError as error:
+            self.send("error " + str(error))
+        return True
+
+    def is_ready(self, _: List[str]):
+        self.send("readyok")
+
+    def new_game(self, _: List[str]):
+        self.wait_for_search()
+        self.ai.transposition_table.clear()
+        self.ai.ordering.clear()
+        self.set_board(Board())
+
+    def set_position(self, tokens: List[str]):
+        self.wait_for_search()
+        if not tokens:
+            raise ValueError("position needs startpos or a key")
+        board = Board() if tokens[0] == "startpos" else Board.from_key(int(tokens[0], 16))
+        if len(tokens) > 1:
+            if tokens[1] != "moves":
+                raise ValueError("expected moves after the position, not " + tokens[1])
+            for text in tokens[2:]:
+                move = move_from_text(text)
+                if move not in self.ai.get_available_moves(board):
+                    raise ValueError("illegal move " + text)
+                Ai.do_move(move, board)
+        self.set_board(board)
+
+    def set_board(self, board: Board):
+        if self.weights is not None:
+            board.set_weights(self.weights)
+        self.board = board
+        self.ai.board = board
+        # positions come from outside, so the engine has no move of its own it should not take back
+        self.ai.last_move = None
+
+    def set_option(self, tokens: List[str]):
+        self.wait_for_search()
+        if len(tokens) != 2 or tokens[0] not in OPTIONS:
+            raise ValueError("setoption takes one of {} and a value".format(", ".join(OPTIONS)))
+        name, value = tokens[0], OPTIONS[tokens[0]](tokens[1])
+        if name == "depth":
+            self.depth = value
+        elif name == "time":
+            self.time_limit = value
+        elif name == "quiescence_depth":
+            self.ai.set_quiescence_depth(value)
+        elif name == "alpha_beta":
+            self.ai.set_alpha_beta(value)
+        elif name == "bitboard":
+            self.ai.set_bitboard(value)
+        elif name == "weights":
+            self.weights = value
+            self.board.set_weights(value)
+        elif name == "hash":
+            self.hash_megabytes = value
+            self.set_workers(self.ai.lazy_smp_workers)
+        elif name == "workers":
+            self.set_workers(value)
+        elif name == "book":
+            from ai.book import OpeningBook
+            if self.opening_book is not None:
+                self.opening_book.close()
+            self.opening_book = OpeningBook(value)
+            self.ai.set_opening_book(self.opening_book)
+        elif name == "tablebase":
+            self.ai.set_tablebase(open_tablebase(value))
+        elif name == "network":
+            from ai.network import open_network
+            self.ai.set_evaluator(open_network(value))
+
+    def set_workers(self, workers: int):
+        # Lazy SMP helpers need a table they can all reach, and the processes are started here rather
+        # than on the first go
+        self.close_table()
+        memory_bytes = self.hash_megabytes * 1024 * 1024
+        if workers:
+            from ai.shared_table import SharedTranspositionTable
+            self.ai.transposition_table = SharedTranspositionTable(memory_bytes)
+            if self.executor is None or self.ai.lazy_smp_workers != workers:
+                self.close_executor()
+                self.executor = ProcessPoolExecutor(workers)
+                list(self.executor.map(warm_up, range(workers)))
+        else:
+            self.ai.transposition_table = TranspositionTable(memory_bytes)
+            self.close_executor()
+        self.ai.set_lazy_smp_workers(workers)
+
+    def go(self, tokens: List[str]):
+        self.wait_for_search()
+        depth, time_limit = None, self.time_limit
+        for name, value in zip(tokens[::2], tokens[1::2]):
+            if name == "depth":
+                depth = int(value)
+            elif name == "time":
+                time_limit = parse_optional_float(value)
+            else:
+                raise ValueError("go takes depth and time, not " + name)
+        if depth is None:
+            # with a time limit, the search deepens for as long as the time lasts
+            depth = self.depth if time_limit is None else Ai.MAX_SEARCH_DEPTH
+        self.stop_flag = StopFlag()
+        self.search = self.thread_pool.submit(self.run_search, self.board.copy(), depth, time_limit,
+                                              self.stop_flag)
+
+    def stop(self, _: List[str]):
+        if self.stop_flag is not None:
+            self.stop_flag.set_stopped(True)
+        self.wait_for_search()
+
+    def wait_for_search(self):
+        if self.search is not None:
+            self.search.result()
+            self.search = None
+
+    def run_search(self, board: Board, depth: int, time_limit: Optional[float], stop_flag: StopFlag):
+        # iterative deepening, each depth a fixed-depth search on the warm table, so both a depth and a
+        # time limit can end it and every finished depth can be reported
+        ai = self.ai
+        ai.color = board.turn
+        started = time.time()
+        deadline = None if time_limit is None else started + time_limit
+        nodes = 0
+        best_move = None
+        try:
+            moves = ai.get_available_moves(board)
+            if len(moves) <= 1:
+                best_move = moves[0] if moves else None
+                return
+            for current in range(1, depth + 1):
+                ai.set_depth(current)
+                ai.depth_limited = False
+                # depth 1 always completes so there is a move to answer with however soon it is stopped
+                ai.deadline = deadline if current > 1 else None
+                ai.stop_signal = stop_flag if current > 1 else None
+                try:
+                    # the table and move ordering age once per go, so each depth starts from the last
+                    move = ai.get_best_move(self.executor, board.copy(), new_search=current == 1)
+                except SearchTimeout:
+                    break
+                best_move = move
+                nodes += ai.last_stats.nodes
+                elapsed = time.time() - started
+                self.send("info depth {} nodes {} nps {:.0f} time {:.0f} move {}".format(
+                    current, nodes, nodes / elapsed if elapsed > 0 else 0, 1000 * elapsed,
+                    "none" if move is None else move_to_text(move)))
+                if ai.completed_depth == 0 or not ai.depth_limited:
+                    # a book move, or the whole game tree fits in this depth
+                    break
+                if stop_flag.stopped() or (deadline is not None and time.time() >= deadline):
+                    break
+        except Exception as error:
+            self.send("error search failed: {}".format(error))
+        finally:
+            ai.stop_signal = None
+            ai.deadline = None
+            self.send("bestmove " + ("none" if best_move is None else move_to_text(best_move)))
+
+    def close_table(self):
+        if self.ai.transposition_table.shared:
+            self.ai.transposition_table.close()
+
+    def close_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def close(self):
+        self.stop([])
+        self.thread_pool.shutdown()
+        self.close_executor()
+        self.close_table()
+        if self.opening_book is not None:
+            self.opening_book.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the engine on a text protocol over stdin and stdout")
+    parser.parse_args(argv)
+    engine = Engine()
+    try:
+        for line in sys.stdin:
+            if not engine.handle(line):
+                break
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
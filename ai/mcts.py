@@ -0,0 +1,302 @@
+import math
+import os
+import random
+import time
+from array import array
+from typing import List, Optional
+
+from ai.ai import Ai, Move
+from ai.notation import move_code, move_from_code
+from ai.stats import SearchStats
+from model.bitboard import BitBoard
+from model.model import Board, Color
+
+UNEXPANDED = -1
+
+
+def score_of(value: float, scale: float) -> float:
+    # a get_value from red's side as red's expected score, between 0 and 1
+    return 1 / (1 + math.exp(max(-60.0, min(60.0, -scale * value))))
+
+
+def rollout(board, plies: int, scale: float, rng: random.Random) -> float:
+    # red's expected score after up to plies random moves, which it changes the board by
+    mover = Ai(board, board.turn)
+    for _ in range(plies):
+        moves = mover.get_available_moves(board)
+        if not moves:
+            # a side that cannot move loses
+            return 0.0 if board.turn == Color.RED else 1.0
+        Ai.do_move(rng.choice(moves), board)
+    return score_of(board.get_value(), scale)
+
+
+def rollout_snapshot(params) -> float:
+    # executor entry point
+    snapshot, weights, bitboard, plies, scale, seed = params
+    board = BitBoard.from_snapshot(snapshot, weights) if bitboard else Board.from_snapshot(snapshot, weights)
+    return rollout(board, plies, scale, random.Random(seed))
+
+
+class Mcts:
+    # Monte Carlo tree search with UCT, played like an Ai. The tree is a set of parallel arrays indexed by
+    # node, a node's children being consecutive, and carries over from one move to the next. Each round
+    # selects batch_size leaves, a virtual loss on every node on the way down steering the later ones
+    # elsewhere; the leaves are then scored together, by random rollouts of rollout_plies moves spread over
+    # the executor's processes, or with no rollout plies by one batched evaluation in this process
+    def __init__(self, board: Board, color: Color, time_limit: Optional[float] = None, playouts: int = 2000,
+                 exploration: float = 1.0, rollout_plies: int = 0, batch_size: int = 8, bitboard: bool = True,
+                 scale: float = 0.3, max_nodes: int = 1 << 20, collect_stats: bool = False,
+                 seed: Optional[int] = None):
+        self.board = board
+        self.color = color
+        # the search stops at whichever of the two comes first
+        self.time_limit = time_limit
+        self.playouts = playouts
+        self.exploration = exploration
+        self.rollout_plies = rollout_plies
+        self.batch_size = batch_size
+        self.bitboard = bitboard
+        # turns get_value into an expected score, as the tuner's scale does
+        self.scale = scale
+        self.max_nodes = max_nodes
+        self.collect_stats = collect_stats
+        self.rng = random.Random(seed)
+        # an evaluator scores leaves in place of get_value when there are no rollout plies, as in Ai
+        self.evaluator = None
+        self.last_move = None
+        self.stats = None  # type: Optional[SearchStats]
+        self.last_stats = None  # type: Optional[SearchStats]
+        self.mover = Ai(board, color)
+        self.clear_tree()
+
+    def clear_tree(self):
+        self.parents = array("i")
+        self.first_children = array("i")
+        self.child_counts = array("h")
+        self.visits = array("i")
+        self.virtual_losses = array("i")
+        # summed scores of the side that made the move into the node
+        self.values = array("d")
+        self.move_codes = array("q")
+        self.red_to_move = array("b")
+        self.root = None  # type: Optional[int]
+        # the position at the root, to find the new root in after the moves played since
+        self.root_board = None  # type: Optional[Board]
+
+    def add_node(self, parent: int, code: int, red_to_move: bool) -> int:
+        self.parents.append(parent)
+        self.first_children.append(0)
+        self.child_counts.append(UNEXPANDED)
+        self.visits.append(0)
+        self.virtual_losses.append(0)
+        self.values.append(0.0)
+        self.move_codes.append(code)
+        self.red_to_move.append(red_to_move)
+        return len(self.parents) - 1
+
+    def node_count(self) -> int:
+        return len(self.parents)
+
+    def set_time_limit(self, time_limit: Optional[float]):
+        self.time_limit = time_limit
+
+    def set_playouts(self, playouts: int):
+        self.playouts = playouts
+
+    def set_evaluator(self, evaluator):
+        self.evaluator = evaluator
+
+    def set_collect_stats(self, collect_stats: bool):
+        self.collect_stats = collect_stats
+
+    def next_move(self, executor):
+        move = self.get_best_move(executor)
+        if move is not None:
+            self.play(move)
+
+    def play(self, move: Move):
+        Ai.do_move(move, self.board)
+        self.last_move = move
+
+    def get_available_moves(self, board) -> List[Move]:
+        return self.mover.get_available_moves(board)
+
+    def get_best_move(self, executor, board: Optional[Board] = None) -> Optional[Move]:
+        self.stats = SearchStats() if self.collect_stats else None
+        try:
+            return self.search_best_move(executor, self.board if board is None else board)
+        finally:
+            if self.stats is not None:
+                self.stats.finish()
+            self.last_stats, self.stats = self.stats, None
+
+    def search_best_move(self, executor, board: Board) -> Optional[Move]:
+        board.reset_incremental_state()
+        self.find_root(board)
+        search_board = BitBoard.from_board(board) if self.bitboard else board.copy()
+        if self.child_counts[self.root] == UNEXPANDED:
+            self.expand(self.root, search_board)
+        children = self.root_children()
+        if len(children) <= 1:
+            return move_from_code(self.move_codes[children[0]]) if children else None
+        deadline = None if self.time_limit is None else time.time() + self.time_limit
+        weights = board.get_weights()
+        evaluator = self.evaluator
+        if evaluator is None and not self.rollout_plies:
+            from model.batch import evaluator_for
+            evaluator = evaluator_for(weights)
+        played = 0
+        while played < self.playouts and (deadline is None or time.time() < deadline):
+            self.search_round(search_board, min(self.batch_size, self.playouts - played), executor, weights,
+                              evaluator)
+            played += min(self.batch_size, self.playouts - played)
+        best = max(children, key=lambda child: self.visits[child])
+        return move_from_code(self.move_codes[best])
+
+    def root_children(self) -> List[int]:
+        # an Ai does not take back its own last move unless it has to, and neither does this
+        first = self.first_children[self.root]
+        children = list(range(first, first + max(0, self.child_counts[self.root])))
+        if self.last_move is not None and len(children) > 1:
+            inverse = move_code(self.last_move.inverse())
+            children = [child for child in children if self.move_codes[child] != inverse] or children
+        return children
+
+    def find_root(self, board: Board):
+        # the old tree is kept when the position is its root or two plies below it, which covers this
+        # side's move and the opponent's reply; a full tree is dropped rather than compacted
+        key = board.to_key()
+        if self.root is not None and self.node_count() < self.max_nodes:
+            if self.root_board.to_key() == key:
+                return
+            node = self.find_descendant(self.root, self.root_board, key, 2)
+            if node is not None:
+                self.root = node
+                self.root_board = board.copy()
+                return
+        self.clear_tree()
+        self.root = self.add_node(-1, 0, board.turn == Color.RED)
+        self.root_board = board.copy()
+
+    def find_descendant(self, node: int, board: Board, key: int, plies: int) -> Optional[int]:
+        if plies == 0 or self.child_counts[node] <= 0:
+            return None
+        first = self.first_children[node]
+        for child in range(first, first + self.child_counts[node]):
+            move = move_from_code(self.move_codes[child])
+            must_jump = board.must_jump
+            jumped_pieces, was_king = Ai.do_move(move, board)
+            try:
+                if board.to_key() == key:
+                    return child
+                found = self.find_descendant(child, board, key, plies - 1)
+                if found is not None:
+                    return found
+            finally:
+                self.mover.undo_move(move, jumped_pieces, must_jump, was_king, board)
+        return None
+
+    def expand(self, node: int, board) -> bool:
+        # False when the tree is full, the node then being scored as a leaf again
+        moves = list(self.mover.generate_moves(board))
+        if self.node_count() + len(moves) > self.max_nodes:
+            return False
+        self.first_children[node] = self.node_count()
+        self.child_counts[node] = len(moves)
+        red_to_move = not self.red_to_move[node]
+        for move in moves:
+            self.add_node(node, move_code(move), red_to_move)
+        return True
+
+    def select_child(self, node: int) -> int:
+        first, count = self.first_children[node], self.child_counts[node]
+        children = self.root_children() if node == self.root else range(first, first + count)
+        visits, virtual_losses, values = self.visits, self.virtual_losses, self.values
+        log_total = math.log(max(1, visits[node] + virtual_losses[node]))
+        best, best_score = None, float("-inf")
+        for child in children:
+            tries = visits[child] + virtual_losses[child]
+            if tries == 0:
+                return child
+            # a virtual loss counts as a try that scored nothing
+            score = values[child] / tries + self.exploration * math.sqrt(log_total / tries)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def search_round(self, board, leaf_count: int, executor, weights: tuple, evaluator):
+        paths, scores, pending, leaves = [], [], [], []
+        for _ in range(leaf_count):
+            path, score, leaf = self.select_leaf(board)
+            paths.append(path)
+            scores.append(score)
+            if score is None:
+                pending.append(len(paths) - 1)
+                leaves.append(leaf)
+        if pending:
+            if self.rollout_plies:
+                tasks = [(snapshot, weights, self.bitboard, self.rollout_plies, self.scale,
+                          self.rng.randrange(2 ** 32)) for snapshot in leaves]
+                if executor is not None:
+                    # one chunk per process, as single rollouts are too short to be worth a round trip each
+                    chunk_size = max(1, len(tasks) // (os.cpu_count() or 1))
+                    results = list(executor.map(rollout_snapshot, tasks, chunksize=chunk_size))
+                else:
+                    results = list(map(rollout_snapshot, tasks))
+            else:
+                results = [score_of(value, self.scale) for value in self.leaf_values(leaves, evaluator)]
+            for index, result in zip(pending, results):
+                scores[index] = result
+        for path, score in zip(paths, scores):
+            self.backpropagate(path, score)
+        if self.stats is not None:
+            self.stats.nodes += leaf_count
+            self.stats.leaves += len(pending)
+
+    def select_leaf(self, board) -> tuple:
+        # walks down from the root, expanding the first node met that has been scored before, and comes
+        # back with the path, the score when the leaf is the end of the game, and what scoring it needs
+        node = self.root
+        path = [node]
+        self.virtual_losses[node] += 1
+        undo = []
+        try:
+            while True:
+                if self.child_counts[node] == UNEXPANDED:
+                    if (node != self.root and self.visits[node] == 0) or not self.expand(node, board):
+                        break
+                if self.child_counts[node] == 0:
+                    # a side that cannot move loses
+                    return path, 0.0 if self.red_to_move[node] else 1.0, None
+                node = self.select_child(node)
+                path.append(node)
+                self.virtual_losses[node] += 1
+                move = move_from_code(self.move_codes[node])
+                must_jump = board.must_jump
+                undo.append((move, must_jump) + tuple(Ai.do_move(move, board)))
+            if self.rollout_plies:
+                return path, None, board.snapshot()
+            if isinstance(board, BitBoard):
+                return path, None, (board.black, board.red, board.kings, board.turn_counter)
+            return path, None, (board.piece_codes, board.turn_counter)
+        finally:
+            for move, must_jump, jumped_pieces, was_king in reversed(undo):
+                self.mover.undo_move(move, jumped_pieces, must_jump, was_king, board)
+
+    def leaf_values(self, leaves: list, evaluator) -> List[float]:
+        from model.batch import codes_from_keys, codes_from_masks
+        if len(leaves[0]) == 4:
+            black, red, kings, turn_counters = zip(*leaves)
+            codes = codes_from_masks(list(black), list(red), list(kings))
+        else:
+            keys, turn_counters = zip(*leaves)
+            codes = codes_from_keys(list(keys))
+        return evaluator.evaluate(codes, list(turn_counters)).tolist()
+
+    def backpropagate(self, path: List[int], score: float):
+        # score is red's; each node keeps the score of the side that moved into it
+        for node in path:
+            self.visits[node] += 1
+            self.virtual_losses[node] -= 1
+            self.values[node] += 1 - score if self.red_to_move[node] else score
@@ -0,0 +1,233 @@
+import argparse
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ai.tuning import Dataset, fit_scale, read_dataset
+from model.batch import codes_from_boards, keys_from_codes, piece_counts, score_finished_games
+from model.model import Board
+
+# inputs are one-hot kind codes: for each of the four piece kinds, 32 squares in PLAYABLE_SQUARES order
+INPUT_SIZE = 4 * 32
+CODE_COLUMNS = np.arange(32) * 4 - 1
+
+
+def network_inputs(codes: np.ndarray) -> np.ndarray:
+    codes = np.asarray(codes, dtype=np.intp)
+    inputs = np.zeros((len(codes), INPUT_SIZE + 1), dtype=np.float32)
+    # empty squares all land in the spare last column, which is then dropped
+    inputs[np.arange(len(codes))[:, None], np.where(codes > 0, codes + CODE_COLUMNS, INPUT_SIZE)] = 1
+    return inputs[:, :INPUT_SIZE]
+
+
+class Network:
+    # a small multilayer perceptron, ReLU between its layers, whose single output is the logit of red's
+    # expected score; dividing it by scale puts it in get_value's units
+    def __init__(self, layers: List[tuple], scale: float = 1.0):
+        self.layers = layers  # (weights, biases) per layer
+        self.scale = scale
+
+    @staticmethod
+    def random(hidden: tuple = (64, 32), scale: float = 1.0, seed: Optional[int] = None) -> 'Network':
+        rng = np.random.default_rng(seed)
+        sizes = (INPUT_SIZE,) + tuple(hidden) + (1,)
+        layers = [((rng.standard_normal((inputs, outputs)) * np.sqrt(2 / inputs)).astype(np.float32),
+                   np.zeros(outputs, dtype=np.float32)) for inputs, outputs in zip(sizes, sizes[1:])]
+        return Network(layers, scale)
+
+    @staticmethod
+    def load(path: str) -> 'Network':
+        with np.load(path) as data:
+            layers = [(data["weights{}".format(index)], data["biases{}".format(index)])
+                      for index in range(int(data["layers"]))]
+            return Network(layers, float(data["scale"]))
+
+    def save(self, path: str):
+        arrays = {"layers": len(self.layers), "scale": self.scale}
+        for index, (weights, biases) in enumerate(self.layers):
+            arrays["weights{}".format(index)] = weights
+            arrays["biases{}".format(index)] = biases
+        with open(path, "wb") as file:
+            np.savez(file, **arrays)
+
+    def forward(self, inputs: np.ndarray, keep_activations: bool = False):
+        activations = [inputs]
+        for index, (weights, biases) in enumerate(self.layers):
+            outputs = activations[-1] @ weights + biases
+            activations.append(outputs if index == len(self.layers) - 1 else np.maximum(outputs, 0))
+        if keep_activations:
+            return activations
+        return activations[-1][:, 0]
+
+    def train(self, dataset: Dataset, epochs: int = 10, batch_size: int = 256, learning_rate: float = 0.001,
+              seed: Optional[int] = None, out=None) -> float:
+        # Adam on the cross-entropy between each game's result and the predicted score of its positions;
+        # returns the last epoch's mean loss
+        rng = np.random.default_rng(seed)
+        inputs = network_inputs(dataset.codes)
+        scores = dataset.scores.astype(np.float32)
+        moments = [[np.zeros_like(array) for array in layer] for layer in self.layers]
+        squares = [[np.zeros_like(array) for array in layer] for layer in self.layers]
+        beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+        step = 0
+        loss = 0.0
+        for epoch in range(epochs):
+            order = rng.permutation(len(scores))
+            total = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                activations = self.forward(inputs[batch], keep_activations=True)
+                predicted = 1 / (1 + np.exp(-activations[-1][:, 0]))
+                target = scores[batch]
+                total += float(-np.sum(target * np.log(predicted + 1e-7) +
+                                       (1 - target) * np.log(1 - predicted + 1e-7)))
+                gradient = ((predicted - target) / len(batch))[:, None]
+                step += 1
+                for index in range(len(self.layers) - 1, -1, -1):
+                    weights, biases = self.layers[index]
+                    gradients = (activations[index].T @ gradient, gradient.sum(axis=0))
+                    if index:
+                        gradient = (gradient @ weights.T) * (activations[index] > 0)
+                    for array, grad, moment, square in zip((weights, biases), gradients, moments[index],
+                                                           squares[index]):
+                        moment *= beta1
+                        moment += (1 - beta1) * grad
+                        square *= beta2
+                        square += (1 - beta2) * grad * grad
+                        array -= (learning_rate * (moment / (1 - beta1 ** step)) /
+                                  (np.sqrt(square / (1 - beta2 ** step)) + epsilon)).astype(np.float32)
+            loss = total / max(1, len(scores))
+            if out is not None:
+                print("epoch {}: loss {:.5f}".format(epoch + 1, loss), file=out)
+        return loss
+
+
+class NetworkEvaluator:
+    # scores positions with a Network, like BatchEvaluator: evaluate takes rows of kind codes and gives
+    # values from red's side in get_value's units; positions already scored are answered from an LRU
+    # cache keyed by their codes, and only the rest go through the network, in one forward pass
+    def __init__(self, network: Network, cache_size: int = 1 << 16, path: Optional[str] = None):
+        self.network = network
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # type: OrderedDict
+        # where the network was loaded from, so executor workers can load it too
+        self.path = path
+        self.inferences = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+
+    def evaluate(self, codes: np.ndarray, turn_counters=None) -> np.ndarray:
+        # the network does not look at the turn counter, so turn_counters is only there to match
+        # BatchEvaluator
+        codes = np.ascontiguousarray(codes, dtype=np.int8)
+        values = np.empty(len(codes))
+        missing, missing_keys = [], []
+        for index, row in enumerate(codes):
+            key = row.tobytes()
+            value = self.cache.get(key)
+            if value is None:
+                missing.append(index)
+                missing_keys.append(key)
+            else:
+                self.cache.move_to_end(key)
+                values[index] = value
+        self.cache_hits += len(codes) - len(missing)
+        if missing:
+            started = time.perf_counter()
+            inferred = self.network.forward(network_inputs(codes[missing])) / self.network.scale
+            self.seconds += time.perf_counter() - started
+            self.inferences += len(missing)
+            values[missing] = inferred
+            for key, value in zip(missing_keys, inferred.tolist()):
+                self.cache[key] = value
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        score_finished_games(values, *piece_counts(codes))
+        return values
+
+    def evaluate_boards(self, boards) -> np.ndarray:
+        # Boards and BitBoards, which must be all one or all the other
+        return self.evaluate(codes_from_boards(boards))
+
+    def inferences_per_second(self) -> float:
+        return self.inferences / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        lookups = self.inferences + self.cache_hits
+        return "{} inferences at {:.0f} per second, {:.1%} of {} lookups answered from the cache".format(
+            self.inferences, self.inferences_per_second(), self.cache_hits / lookups if lookups else 0.0, lookups)
+
+
+_opened_networks = {}  # type: Dict[str, NetworkEvaluator]
+
+
+def open_network(path: str) -> NetworkEvaluator:
+    # one evaluator, and so one cache, per process and file, shared by every Ai in it
+    if path not in _opened_networks:
+        _opened_networks[path] = NetworkEvaluator(Network.load(path), path=path)
+    return _opened_networks[path]
+
+
+def benchmark(evaluator: NetworkEvaluator, dataset: Dataset, batch_size: int = 8, out=None) -> dict:
+    # positions per second from get_value one at a time and from the network in batches of batch_size,
+    # the size of a node's leaf children, with the cache cleared so every position is inferred
+    boards = [Board.from_key(key) for key in keys_from_codes(dataset.codes)]
+    for board, turn_counter in zip(boards, dataset.turn_counters.tolist()):
+        board.turn_counter = turn_counter
+    started = time.perf_counter()
+    for board in boards:
+        board.get_value()
+    get_value_rate = len(boards) / (time.perf_counter() - started)
+    evaluator.cache.clear()
+    started = time.perf_counter()
+    for start in range(0, len(dataset), batch_size):
+        evaluator.evaluate(dataset.codes[start:start + batch_size])
+    network_rate = len(dataset) / (time.perf_counter() - started)
+    result = {"get_value": get_value_rate, "network": network_rate,
+              "inference": evaluator.inferences_per_second()}
+    if out is not None:
+        print("get_value: {:.0f} positions per second".format(get_value_rate), file=out)
+        print("network: {:.0f} positions per second in batches of {}, {:.0f} inferences per second in the "
+              "forward passes alone".format(network_rate, batch_size, result["inference"]), file=out)
+    return result
+
+
+def main(argv=None) -> int:
+    positions = argparse.ArgumentParser(add_help=False)
+    positions.add_argument("inputs", nargs="+",
+                           help="saved datasets (.npz), tournament results (.jsonl) or games files, one game per line")
+    positions.add_argument("--skip-plies", type=int, default=8, help="opening plies of each game left out")
+    parser = argparse.ArgumentParser(description="Train and benchmark a neural network evaluator")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", parents=[positions], help="train a network on game results")
+    train.add_argument("--output", required=True)
+    train.add_argument("--hidden", default="64:32", help="hidden layer sizes separated by colons")
+    train.add_argument("--epochs", type=int, default=10)
+    train.add_argument("--learning-rate", type=float, default=0.001)
+    train.add_argument("--seed", type=int, default=None)
+    bench = commands.add_parser("bench", parents=[positions], help="compare a network's speed with get_value's")
+    bench.add_argument("--network", required=True)
+    bench.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args(argv)
+    dataset = Dataset.concatenate([read_dataset(path, args.skip_plies) for path in args.inputs])
+    if not len(dataset):
+        print("No positions")
+        return 1
+    if args.command == "bench":
+        benchmark(open_network(args.network), dataset, args.batch_size, sys.stdout)
+        return 0
+    # the output is scaled like the tuned weights are, so network values and get_value's compare directly
+    scale = fit_scale(dataset, Board(True).get_weights())
+    network = Network.random(tuple(int(size) for size in args.hidden.split(":")), scale, args.seed)
+    network.train(dataset, args.epochs, learning_rate=args.learning_rate, seed=args.seed, out=sys.stdout)
+    network.save(args.output)
+    print("{} positions, network written to {}".format(len(dataset), os.path.abspath(args.output)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+from typing import List
+
+from ai.ai import Move
+from model.bitboard import square_of, SQUARE_TILES
+
+# squares are numbered 1 to 32 row by row from the top left of the board as the window draws it; a
+# move is written as its squares joined by "-" for a step or "x" for a jump, e.g. "22-18" or "9x18x27"
+MAX_CODED_SQUARES = 12
+
+
+def move_to_text(move: Move) -> str:
+    separator = "x" if move.path[0].distance_from(move.path[1]) == 2 else "-"
+    return separator.join(str(square_of(tile) + 1) for tile in move.path)
+
+
+def move_from_text(text: str) -> Move:
+    numbers = text.strip().replace("x", "-").split("-")
+    if len(numbers) < 2:
+        raise ValueError("Not a move: " + text)
+    squares = [int(number) - 1 for number in numbers]
+    if any(not 0 <= square < 32 for square in squares):
+        raise ValueError("Square out of range in move: " + text)
+    return Move([SQUARE_TILES[square] for square in squares])
+
+
+def moves_from_text(text: str) -> List[Move]:
+    return [move_from_text(token) for token in text.split()]
+
+
+def move_code(move: Move) -> int:
+    # the path packed into 64 bits for binary files: its length in the low 4 bits, then 5 bits per square
+    if len(move.path) > MAX_CODED_SQUARES:
+        raise ValueError("Move too long to encode: " + move_to_text(move))
+    code = len(move.path)
+    for index, tile in enumerate(move.path):
+        code |= square_of(tile) << (4 + 5 * index)
+    return code
+
+
+def move_from_code(code: int) -> Move:
+    return Move([SQUARE_TILES[code >> (4 + 5 * index) & 31] for index in range(code & 15)])
@@ -0,0 +1,30 @@
+import os
+from typing import Optional
+
+from model.model import WEIGHT_NAMES, read_weights
+
+# parsers of option values written as text, shared by the tournament's engine descriptions and the
+# engine protocol's setoption
+
+
+def parse_bool(text: str) -> bool:
+    if text.lower() in ("1", "true", "yes", "on"):
+        return True
+    if text.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError("Not a boolean: " + text)
+
+
+def parse_weights(text: str) -> tuple:
+    # a weights file, or the values of Board.get_weights separated by colons, the last two (the endgame
+    # thresholds) being optional
+    if os.path.exists(text):
+        return read_weights(text)
+    values = text.split(":")
+    if len(values) not in (len(WEIGHT_NAMES) - 2, len(WEIGHT_NAMES)):
+        raise ValueError("Expected a weights file or four or six weights separated by colons: " + text)
+    return tuple(float(value) for value in values[:4]) + tuple(int(value) for value in values[4:])
+
+
+def parse_optional_float(text: str) -> Optional[float]:
+    return None if text.lower() == "none" else float(text)
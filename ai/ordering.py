@@ -0,0 +1,59 @@
+from typing import List, Tuple
+
+from model.bitboard import square_of
+
+
+class MoveOrdering:
+    # killer moves: per ply, the last quiet moves that caused a cutoff there, tried early in sibling nodes
+    # history: per (from, to) square pair, how much cutoff work quiet moves between them have saved
+    KILLERS_PER_PLY = 2
+
+    def __init__(self):
+        self.killers = []  # type: List[List[list]]
+        self.history = [[0] * 32 for _ in range(32)]
+
+    def new_search(self):
+        # killers belong to the plies of one search; history carries over but fades
+        self.killers = []
+        for row in self.history:
+            for index in range(32):
+                row[index] //= 2
+
+    def clear(self):
+        self.killers = []
+        self.history = [[0] * 32 for _ in range(32)]
+
+    def order(self, moves, ply: int, priority, hash_move=None) -> List[Tuple[int, object]]:
+        # (generation index, move) pairs, best first: the hash move, then priority (captures and
+        # promotions), then killers, then history; ties keep generation order
+        killers = self.killers[ply] if ply < len(self.killers) else []
+        history = self.history
+
+        def key(item):
+            move = item[1]
+            path = move.path
+            killer_rank = 0
+            for rank, killer in enumerate(killers):
+                if path == killer:
+                    killer_rank = len(killers) - rank
+                    break
+            return priority(move), killer_rank, history[square_of(path[0])][square_of(path[-1])]
+
+        ordered = sorted(enumerate(moves), key=key, reverse=True)
+        if hash_move is not None:
+            # a shared table only keeps a move's first step, so the hash move is matched on that
+            ordered.sort(key=lambda item: item[1].path[:2] != hash_move.path[:2])
+        return ordered
+
+    def record_cutoff(self, move, ply: int, remaining_depth: int):
+        path = move.path
+        if path[0].distance_from(path[1]) == 2:
+            # captures are forced and already ordered by how much they take
+            return
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if path not in killers:
+            killers.insert(0, path)
+            del killers[MoveOrdering.KILLERS_PER_PLY:]
+        self.history[square_of(path[0])][square_of(path[-1])] += remaining_depth * remaining_depth
@@ -0,0 +1,153 @@
+import argparse
+import sys
+import time
+from typing import Dict, List, Optional
+
+from ai.ai import Ai
+from model.bitboard import BitBoard
+from model.model import Board, Color, Piece, PLAYABLE_TILES
+
+
+class PerftPosition:
+    def __init__(self, name: str, diagram: str, turn: Color, counts: List[int]):
+        # diagram rows use the glyphs Board prints: "-" empty, "r"/"b" men, "R"/"B" kings
+        self.name = name
+        self.diagram = diagram
+        self.turn = turn
+        # counts[depth - 1] is the number of leaf nodes depth plies below the position
+        self.counts = counts
+
+    def board(self) -> Board:
+        return board_from_diagram(self.diagram, self.turn)
+
+
+START_POSITION = PerftPosition("start", None, Color.BLACK, [7, 49, 302, 1469, 7361, 36768, 179740, 845931])
+
+# the start counts are the published perft figures for English draughts; the others were produced by
+# the Board and BitBoard generators in agreement, and include men that are crowned mid-jump and keep
+# jumping as kings, which is how this game plays
+TEST_POSITIONS = [
+    START_POSITION,
+    PerftPosition("kings", """
+-R------
+--------
+---b-b--
+--------
+-----r--
+--b-----
+-r---B--
+--------
+""", Color.RED, [6, 33, 145, 920, 4002, 25660, 116907, 716078]),
+    PerftPosition("multi-jump", """
+--------
+--------
+-----r--
+--------
+---r-r--
+--------
+---r----
+--b---b-
+""", Color.BLACK, [2, 6, 24, 64, 193, 543, 1679, 4506]),
+    PerftPosition("crowning jump", """
+-B------
+--------
+--------
+--------
+--------
+r-------
+-b-b----
+--------
+""", Color.RED, [1, 2, 8, 24, 96, 273, 928, 2859]),
+]
+
+
+def board_from_diagram(diagram: Optional[str], turn: Color) -> Board:
+    if diagram is None:
+        return Board()
+    board = Board(True)
+    board.red_checkers = 0
+    board.black_checkers = 0
+    rows = diagram.split()
+    for tile in PLAYABLE_TILES:
+        glyph = rows[tile.row][tile.column]
+        if glyph == "-":
+            continue
+        piece = Piece(Color.RED if glyph.lower() == "r" else Color.BLACK)
+        if glyph.isupper():
+            piece.king()
+        board.tiles[tile.row][tile.column] = piece
+        if piece.color == Color.RED:
+            board.red_checkers += 1
+        else:
+            board.black_checkers += 1
+    board.turn = turn
+    board.reset_incremental_state()
+    board.must_jump = board.has_jump()
+    return board
+
+
+def perft(ai: Ai, board, depth: int) -> int:
+    if depth == 0:
+        return 1
+    moves = ai.get_available_moves(board)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        must_jump = board.must_jump
+        jumped_pieces, was_king = ai.do_move(move, board)
+        nodes += perft(ai, board, depth - 1)
+        ai.undo_move(move, jumped_pieces, must_jump, was_king, board)
+    return nodes
+
+
+def divide(ai: Ai, board, depth: int) -> Dict[str, int]:
+    # leaf counts per root move, for tracking down which branch a generator bug is in
+    result = {}
+    for move in ai.get_available_moves(board):
+        must_jump = board.must_jump
+        jumped_pieces, was_king = ai.do_move(move, board)
+        result[str(move)] = perft(ai, board, depth - 1)
+        ai.undo_move(move, jumped_pieces, must_jump, was_king, board)
+    return result
+
+
+def run_suite(depth: int, bitboard: bool = False, positions: List[PerftPosition] = None, out=sys.stdout) -> bool:
+    # counts every position to depth (or as deep as its reference goes) and reports speed and mismatches
+    passed = True
+    for position in positions if positions is not None else TEST_POSITIONS:
+        board = position.board()
+        ai = Ai(board, board.turn)
+        if bitboard:
+            board = BitBoard.from_board(board)
+        position_depth = min(depth, len(position.counts)) if position.counts else depth
+        start = time.perf_counter()
+        nodes = perft(ai, board, position_depth)
+        elapsed = time.perf_counter() - start
+        if position.counts and nodes != position.counts[position_depth - 1]:
+            status = "MISMATCH (expected {})".format(position.counts[position_depth - 1])
+            passed = False
+        else:
+            status = "ok" if position.counts else "no reference"
+        print("{:<14} depth {} {:>10} nodes {:>8.2f}s {:>12.0f} nodes/s  {}".format(
+            position.name, position_depth, nodes, elapsed, nodes / max(elapsed, 1e-9), status), file=out)
+    return passed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Count move-generator leaf nodes and check them against references")
+    parser.add_argument("depth", type=int, nargs="?", default=5)
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard move generator")
+    parser.add_argument("--divide", action="store_true", help="print the start position's counts per root move")
+    args = parser.parse_args(argv)
+    if args.divide:
+        board = Board()
+        ai = Ai(board, board.turn)
+        for move, nodes in divide(ai, BitBoard.from_board(board) if args.bitboard else board, args.depth).items():
+            print(move, nodes)
+        return 0
+    return 0 if run_suite(args.depth, args.bitboard) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
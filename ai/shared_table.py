@@ -0,0 +1,116 @@
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+from ai.ai import Move
+from ai.transposition import Bound, TableEntry
+from model.bitboard import square_of, SQUARE_TILES
+
+DOUBLE_FORMAT = struct.Struct("<d")
+SLOT_WORDS = 3
+HEADER_WORDS = 2  # stop flag, search generation
+BOUNDS = [Bound.EXACT, Bound.LOWER, Bound.UPPER]
+
+_attached_tables = {}
+
+
+def encode_entry(depth: int, bound: Bound, best_move, generation: int) -> int:
+    # depth (bits 32-39), bound (40-41), generation (42-49) and the first step of the best move as two
+    # square numbers plus a presence bit (50-60); the value has a word of its own
+    move_bits = 0
+    if best_move is not None:
+        move_bits = 1 << 10 | square_of(best_move.path[0]) << 5 | square_of(best_move.path[1])
+    return min(depth, 255) << 32 | bound.value << 40 | (generation & 0xFF) << 42 | move_bits << 50
+
+
+def value_bits(value: float) -> int:
+    # the double itself, so a value comes back exactly as the search compared it against alpha and beta
+    return int.from_bytes(DOUBLE_FORMAT.pack(value), "little")
+
+
+def decode_entry(key: int, data: int, value_word: int) -> TableEntry:
+    value, = DOUBLE_FORMAT.unpack(value_word.to_bytes(8, "little"))
+    move_bits = data >> 50
+    best_move = None
+    if move_bits >> 10 & 1:
+        best_move = Move([SQUARE_TILES[move_bits >> 5 & 31], SQUARE_TILES[move_bits & 31]])
+    return TableEntry(key, data >> 32 & 0xFF, value, BOUNDS[data >> 40 & 3], best_move, data >> 42 & 0xFF)
+
+
+class SharedTranspositionTable:
+    # each slot is three 64-bit words, (key ^ data ^ value, data, value); a slot torn by two processes
+    # writing at once fails the key check on probe instead of returning a mixed entry, so no lock is needed
+    ENTRY_BYTES = 8 * SLOT_WORDS
+    shared = True
+
+    def __init__(self, memory_bytes: int = 16 * 1024 * 1024, name: Optional[str] = None):
+        self.size = max(1, memory_bytes // SharedTranspositionTable.ENTRY_BYTES)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=(HEADER_WORDS + SLOT_WORDS * self.size) * 8)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.words = self.memory.buf.cast("Q")
+        self.hits = 0
+        self.probes = 0
+
+    @staticmethod
+    def attach(name: str, memory_bytes: int) -> "SharedTranspositionTable":
+        # one attachment per process, reused by every task that process runs on the same table; a task on
+        # another table detaches the old one, which its owner may have replaced, rather than keep it mapped
+        if name not in _attached_tables:
+            for table in _attached_tables.values():
+                table.close()
+            _attached_tables.clear()
+            _attached_tables[name] = SharedTranspositionTable(memory_bytes, name)
+        return _attached_tables[name]
+
+    def spec(self) -> tuple:
+        return self.memory.name, self.size * SharedTranspositionTable.ENTRY_BYTES
+
+    @property
+    def generation(self) -> int:
+        return self.words[1]
+
+    def new_search(self):
+        self.words[1] = (self.words[1] + 1) & 0xFF
+
+    def clear(self):
+        # one copy over the whole block rather than a word at a time
+        self.memory.buf[:] = bytes(len(self.memory.buf))
+
+    def stopped(self) -> bool:
+        return self.words[0] != 0
+
+    def set_stopped(self, stopped: bool):
+        self.words[0] = int(stopped)
+
+    def probe(self, key: int) -> Optional[TableEntry]:
+        self.probes += 1
+        index = HEADER_WORDS + SLOT_WORDS * (key % self.size)
+        data, value_word = self.words[index + 1], self.words[index + 2]
+        if self.words[index] ^ data ^ value_word != key:
+            return None
+        self.hits += 1
+        return decode_entry(key, data, value_word)
+
+    def store(self, key: int, depth: int, value: float, bound: Bound, best_move):
+        index = HEADER_WORDS + SLOT_WORDS * (key % self.size)
+        old_data = self.words[index + 1]
+        old_key = self.words[index] ^ old_data ^ self.words[index + 2]
+        generation = self.generation
+        # same depth-preferred policy as TranspositionTable
+        if old_data and old_key != key and old_data >> 42 & 0xFF == generation and depth < old_data >> 32 & 0xFF:
+            return
+        data = encode_entry(depth, bound, best_move, generation)
+        value_word = value_bits(value)
+        self.words[index] = key ^ data ^ value_word
+        self.words[index + 1] = data
+        self.words[index + 2] = value_word
+
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,105 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+
+class SearchStats:
+    # counters for one call to Ai.get_best_move; an Ai only creates one when collect_stats is set, so
+    # a search without it pays a single "is None" check per node
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.nodes = 0
+        self.leaves = 0
+        self.quiescence_nodes = 0
+        self.cutoffs = 0
+        self.table_cutoffs = 0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.tablebase_hits = 0
+        # nodes with a choice of moves, and those where the first move searched turned out best
+        self.ordered_nodes = 0
+        self.first_move_best = 0
+        # expanded_per_ply[ply] / children_per_ply[ply] is the branching factor at that ply, the root being ply 0
+        self.expanded_per_ply = []  # type: List[int]
+        self.children_per_ply = []  # type: List[int]
+        # (depth, seconds since the search started, nodes so far) for every completed iteration
+        self.depth_times = []  # type: List[tuple]
+        self.completed_depth = 0
+        self.executor_seconds = 0.0
+        self.worker_seconds = {}  # type: Dict[int, float]
+
+    def record_expansion(self, ply: int, move_count: int, expanded: int = 1):
+        while len(self.expanded_per_ply) <= ply:
+            self.expanded_per_ply.append(0)
+            self.children_per_ply.append(0)
+        self.expanded_per_ply[ply] += expanded
+        self.children_per_ply[ply] += move_count
+
+    def record_depth(self, depth: int):
+        self.completed_depth = depth
+        self.depth_times.append((depth, time.perf_counter() - self.started, self.nodes))
+
+    def record_worker(self, pid: int, seconds: float, worker_stats: dict):
+        # folds in the counters a worker process collected for one task
+        self.worker_seconds[pid] = self.worker_seconds.get(pid, 0.0) + seconds
+        for name in ("nodes", "leaves", "quiescence_nodes", "cutoffs", "table_cutoffs", "table_probes",
+                     "table_hits", "tablebase_hits", "ordered_nodes", "first_move_best"):
+            setattr(self, name, getattr(self, name) + worker_stats[name])
+        for ply, (expanded, children) in enumerate(zip(worker_stats["expanded_per_ply"],
+                                                       worker_stats["children_per_ply"])):
+            self.record_expansion(ply, children, expanded)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def first_move_best_rate(self) -> Optional[float]:
+        # how often move ordering put the best move first, the usual measure of ordering quality
+        return self.first_move_best / self.ordered_nodes if self.ordered_nodes else None
+
+    def branching_factors(self) -> List[float]:
+        return [children / expanded if expanded else 0.0
+                for expanded, children in zip(self.expanded_per_ply, self.children_per_ply)]
+
+    def worker_utilization(self) -> Optional[float]:
+        # share of the time spent waiting on the executor that its workers were busy; None without one
+        if not self.worker_seconds or self.executor_seconds <= 0:
+            return None
+        return sum(self.worker_seconds.values()) / (len(self.worker_seconds) * self.executor_seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "elapsed": self.elapsed,
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "quiescence_nodes": self.quiescence_nodes,
+            "nodes_per_second": self.nodes_per_second(),
+            "cutoffs": self.cutoffs,
+            "table_cutoffs": self.table_cutoffs,
+            "table_probes": self.table_probes,
+            "table_hits": self.table_hits,
+            "tablebase_hits": self.tablebase_hits,
+            "ordered_nodes": self.ordered_nodes,
+            "first_move_best": self.first_move_best,
+            "first_move_best_rate": self.first_move_best_rate(),
+            "expanded_per_ply": self.expanded_per_ply,
+            "children_per_ply": self.children_per_ply,
+            "branching_factors": self.branching_factors(),
+            "completed_depth": self.completed_depth,
+            "depth_times": [list(entry) for entry in self.depth_times],
+            "workers": len(self.worker_seconds),
+            "worker_utilization": self.worker_utilization(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def write_json_line(self, path: str, **labels):
+        # appends one JSON object per search, plus any labels (engine version, position...) passed in
+        record = dict(labels)
+        record.update(self.to_dict())
+        with open(path, "a") as file:
+            file.write(json.dumps(record, sort_keys=True) + "\n")
@@ -0,0 +1,526 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures.process import ProcessPoolExecutor
+from itertools import combinations
+from math import comb
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from model.bitboard import BitBoard, JUMP_TABLE, STEP_TABLE, TOP_ROW, BOTTOM_ROW, SQUARE_TILES, KING_DIRECTIONS, \
+    RED_DIRECTIONS, BLACK_DIRECTIONS, squares_of
+from model.model import Color
+
+# one table per material (red men, red kings, black men, black kings); an entry per placement of those
+# pieces and side to move, indexed by the combination rank of each kind's squares. Men never stand on
+# their crowning row, so red men take squares 0-27 and black men squares 4-31. Placements where two
+# pieces share a square are never probed and stay 0.
+#
+# an entry is the result for the side to move: d > 0 wins in d plies, -(d + 1) loses in d plies and 0 is
+# a draw. Distances run to the end of the game, which is when a side has no pieces or no move left.
+TABLEBASE_HEADER = struct.Struct("<4sIII")  # magic, version, max pieces, table count
+TABLEBASE_TABLE = struct.Struct("<4BQ")  # material, entry count; the tables follow the directory in order
+TABLEBASE_MAGIC = b"PCTB"
+TABLEBASE_VERSION = 1
+ENTRY_BYTES = 2
+
+# what a won tablebase position is worth to the search, less one per ply to the win so that the engine
+# heads for the quickest one; below the 99999 of a position whose loser has no pieces left
+TABLEBASE_WIN = 90000
+
+MAN_SQUARE_COUNT = 28
+BLACK_MAN_OFFSET = 4
+# the most pieces of one kind the generator ranks, and the placements it generates the moves of at once
+MAX_KIND_PIECES = 12
+TABLEBASE_BATCH = 1 << 18
+
+
+def material_of(black: int, red: int, kings: int) -> tuple:
+    return (bin(red & ~kings).count("1"), bin(red & kings).count("1"),
+            bin(black & ~kings).count("1"), bin(black & kings).count("1"))
+
+
+def materials(max_pieces: int) -> List[tuple]:
+    # every material with at least one piece a side, ordered so that captures (fewer pieces) and
+    # crownings (fewer men) lead only to materials earlier in the list
+    result = []
+    for red_men in range(max_pieces):
+        for red_kings in range(max_pieces):
+            for black_men in range(max_pieces):
+                for black_kings in range(max_pieces):
+                    if red_men + red_kings and black_men + black_kings and \
+                            red_men + red_kings + black_men + black_kings <= max_pieces:
+                        result.append((red_men, red_kings, black_men, black_kings))
+    result.sort(key=lambda material: (sum(material), material[0] + material[2], material))
+    return result
+
+
+def table_size(material: tuple) -> int:
+    red_men, red_kings, black_men, black_kings = material
+    return comb(MAN_SQUARE_COUNT, red_men) * comb(32, red_kings) * comb(MAN_SQUARE_COUNT, black_men) * \
+        comb(32, black_kings) * 2
+
+
+def rank(mask: int, offset: int = 0) -> int:
+    return sum(comb(square - offset, count + 1) for count, square in enumerate(squares_of(mask)))
+
+
+def position_index(material: tuple, black: int, red: int, kings: int, red_to_move: bool) -> int:
+    _, red_kings, black_men, black_kings = material
+    index = rank(red & ~kings)
+    index = index * comb(32, red_kings) + rank(red & kings)
+    index = index * comb(MAN_SQUARE_COUNT, black_men) + rank(black & ~kings, BLACK_MAN_OFFSET)
+    index = index * comb(32, black_kings) + rank(black & kings)
+    return index * 2 + red_to_move
+
+
+def placements(squares, count: int) -> List[int]:
+    return [sum(1 << square for square in chosen) for chosen in combinations(squares, count)]
+
+
+def positions(material: tuple) -> Iterator[Tuple[int, int, int]]:
+    # (black, red, kings) for every placement of the material with no two pieces on one square
+    red_men, red_kings, black_men, black_kings = material
+    black_king_masks = placements(range(32), black_kings)
+    black_man_masks = placements(range(BLACK_MAN_OFFSET, 32), black_men)
+    red_king_masks = placements(range(32), red_kings)
+    for red_man_mask in placements(range(MAN_SQUARE_COUNT), red_men):
+        for red_king_mask in red_king_masks:
+            if red_king_mask & red_man_mask:
+                continue
+            red = red_man_mask | red_king_mask
+            for black_man_mask in black_man_masks:
+                if black_man_mask & red:
+                    continue
+                for black_king_mask in black_king_masks:
+                    if black_king_mask & (red | black_man_mask):
+                        continue
+                    yield black_man_mask | black_king_mask, red, red_king_mask | black_king_mask
+
+
+def successor_materials(material: tuple) -> List[tuple]:
+    # the other materials one move leads to with pieces left on both sides, by crowning and by capturing
+    result = set()
+    for red_moves in (True, False):
+        own_men, own_kings, other_men, other_kings = material if red_moves else material[2:] + material[:2]
+        for crowned in range(min(own_men, 1) + 1):
+            for lost_men in range(other_men + 1):
+                for lost_kings in range(other_kings + 1):
+                    if lost_men + lost_kings == other_men + other_kings:
+                        continue
+                    own = (own_men - crowned, own_kings + crowned)
+                    other = (other_men - lost_men, other_kings - lost_kings)
+                    result.add(own + other if red_moves else other + own)
+    result.discard(material)
+    return sorted(result)
+
+
+_mask_tables = None
+
+
+def mask_tables():
+    # for the two 16-bit halves of a mask: the combination rank of its bits given how many lie below the
+    # half, and the bit counts, so a whole array of masks is ranked in a few lookups
+    global _mask_tables
+    if _mask_tables is None:
+        import numpy as np
+        halves = np.arange(1 << 16)
+        combs = np.array([[comb(square, count) for count in range(50)] for square in range(32)], np.int64)
+        ranks = np.zeros((2, 1 << 16, MAX_KIND_PIECES + 1), np.int64)
+        for half in range(2):
+            for below in range(MAX_KIND_PIECES + 1):
+                seen = np.full(1 << 16, below)
+                for bit in range(16):
+                    present = halves >> bit & 1
+                    ranks[half, :, below] += present * combs[16 * half + bit, seen + 1]
+                    seen += present
+        counts = sum(halves >> bit & 1 for bit in range(16))
+        _mask_tables = ranks, counts
+    return _mask_tables
+
+
+def bit_counts(masks):
+    _, counts = mask_tables()
+    return counts[masks & 0xFFFF] + counts[masks >> 16]
+
+
+def mask_ranks(masks):
+    # rank() of every mask in an array
+    ranks, counts = mask_tables()
+    low = masks & 0xFFFF
+    return ranks[0, low, 0] + ranks[1, masks >> 16, counts[low]]
+
+
+def position_indices(material: tuple, black, red, kings, red_to_move: bool):
+    # position_index() of arrays of masks
+    _, red_kings, black_men, black_kings = material
+    index = mask_ranks(red & ~kings)
+    index = index * comb(32, red_kings) + mask_ranks(red & kings)
+    index = index * comb(MAN_SQUARE_COUNT, black_men) + mask_ranks((black & ~kings) >> BLACK_MAN_OFFSET)
+    index = index * comb(32, black_kings) + mask_ranks(black & kings)
+    return index * 2 + red_to_move
+
+
+def ranked_squares(count: int, square_count: int, offset: int = 0):
+    # the squares of every placement of count pieces, a row per placement in rank order
+    import numpy as np
+    chosen = list(combinations(range(square_count), count))
+    chosen = np.array(chosen, np.int64).reshape(len(chosen), count)
+    ranks = sum(np.array([comb(square, slot + 1) for square in range(square_count)])[chosen[:, slot]]
+                for slot in range(count))
+    squares = np.empty_like(chosen)
+    squares[ranks] = chosen + offset
+    return squares
+
+
+class MoveTables:
+    # STEP_TABLE and JUMP_TABLE as arrays, -1 off the board, with a mask per square
+    def __init__(self):
+        import numpy as np
+        self.bits = np.array([1 << square for square in range(32)], np.uint32)
+        self.steps = np.array(STEP_TABLE, np.int64)
+        self.overs = np.array([[-1 if jump is None else jump[0] for jump in table] for table in JUMP_TABLE])
+        self.landings = np.array([[-1 if jump is None else jump[1] for jump in table] for table in JUMP_TABLE])
+        self.crowning = np.array([bool((1 << square) & (TOP_ROW | BOTTOM_ROW)) for square in range(32)])
+
+
+def jump_moves(tables: MoveTables, pieces: list, black, red, kings, red_to_move: bool) -> tuple:
+    # every capture of the side to move, by the rules of BitBoard.jump_chains, as (position, start, end,
+    # crowned, captured) arrays; pieces holds a (squares, is_king) pair of arrays per piece of that side
+    import numpy as np
+    forward = RED_DIRECTIONS if red_to_move else BLACK_DIRECTIONS
+    opponent = black if red_to_move else red
+    occupied = black | red
+    rows = np.arange(len(black))
+    states = [np.concatenate(columns) for columns in zip(*[
+        (rows, squares, squares, is_king, np.zeros(len(rows), np.uint32)) for squares, is_king in pieces])]
+    finished = []
+    first = True
+    while len(states[0]):
+        position, start, square, is_king, captured = states
+        continued = np.zeros(len(position), bool)
+        children = []
+        for direction in KING_DIRECTIONS:
+            over, landing = tables.overs[direction][square], tables.landings[direction][square]
+            legal = (over >= 0) if direction in forward else (over >= 0) & is_king
+            over, landing = np.maximum(over, 0), np.maximum(landing, 0)
+            # the moving piece leaves its square, and captured pieces block until the move ends
+            legal &= (opponent[position] & ~captured) >> over.astype(np.uint32) & 1 == 1
+            legal &= (occupied[position] & ~tables.bits[start]) >> landing.astype(np.uint32) & 1 == 0
+            continued |= legal
+            children.append((position[legal], start[legal], landing[legal],
+                             is_king[legal] | tables.crowning[landing[legal]],
+                             captured[legal] | tables.bits[over[legal]]))
+        if not first:
+            finished.append([column[~continued] for column in states])
+        first = False
+        states = [np.concatenate(columns) for columns in zip(*children)]
+    if not finished:
+        return tuple(column[:0] for column in states)
+    return tuple(np.concatenate(columns) for columns in zip(*finished))
+
+
+def simple_moves(tables: MoveTables, pieces: list, black, red, red_to_move: bool) -> tuple:
+    # every non-capturing move as (position, start, end, crowned) arrays
+    import numpy as np
+    forward = RED_DIRECTIONS if red_to_move else BLACK_DIRECTIONS
+    empty = ~(black | red)
+    rows = np.arange(len(black))
+    moves = []
+    for squares, is_king in pieces:
+        for direction in KING_DIRECTIONS:
+            end = tables.steps[direction][squares]
+            legal = (end >= 0) if direction in forward else (end >= 0) & is_king
+            legal &= empty >> np.maximum(end, 0).astype(np.uint32) & 1 == 1
+            moves.append((rows[legal], squares[legal], end[legal], is_king[legal] | tables.crowning[end[legal]]))
+    return tuple(np.concatenate(columns) for columns in zip(*moves))
+
+
+def move_edges(material: tuple, placement_indices, squares: list, red_to_move: bool, tables: MoveTables):
+    # the parent index and child masks of every move from a batch of placements; squares holds the
+    # squares of each kind of piece as in material
+    import numpy as np
+    bits = tables.bits
+    masks = [np.bitwise_or.reduce(bits[kind_squares], axis=1) if kind_squares.shape[1] else
+             np.zeros(len(placement_indices), np.uint32) for kind_squares in squares]
+    red, black, kings = masks[0] | masks[1], masks[2] | masks[3], masks[1] | masks[3]
+    own_kinds = (0, 1) if red_to_move else (2, 3)
+    pieces = [(squares[kind][:, slot], np.full(len(placement_indices), kind % 2 == 1))
+              for kind in own_kinds for slot in range(squares[kind].shape[1])]
+    position, start, end, crowned, captured = jump_moves(tables, pieces, black, red, kings, red_to_move)
+    # a side that can capture must
+    jumping = np.zeros(len(placement_indices), bool)
+    jumping[position] = True
+    simple = simple_moves(tables, pieces, black, red, red_to_move)
+    keep = ~jumping[simple[0]]
+    position = np.concatenate([position, simple[0][keep]])
+    start = np.concatenate([start, simple[1][keep]])
+    end = np.concatenate([end, simple[2][keep]])
+    crowned = np.concatenate([crowned, simple[3][keep]])
+    captured = np.concatenate([captured, np.zeros(keep.sum(), np.uint32)])
+    moved = ~bits[start]
+    own = (red if red_to_move else black)[position] & moved | bits[end]
+    other = (black if red_to_move else red)[position] & ~captured
+    child_kings = kings[position] & moved & ~captured | np.where(crowned, bits[end], 0).astype(np.uint32)
+    parents = placement_indices[position] * 2 + red_to_move
+    if red_to_move:
+        return parents, other, own, child_kings
+    return parents, own, other, child_kings
+
+
+def solve(material: tuple, tables: dict):
+    # retrograde analysis of one material; every material a capture or crowning leads to must be in tables.
+    # Moves within the material are kept as (parent, child) index arrays, sorted by child so that the
+    # parents of the positions settled at each distance are found in one pass
+    import numpy as np
+    size = table_size(material)
+    index_type = np.int32 if size < 2 ** 31 else np.int64
+    never = np.iinfo(np.int32).max
+    move_tables = MoveTables()
+    red_men, red_kings, black_men, black_kings = material
+    kind_squares = [ranked_squares(red_men, MAN_SQUARE_COUNT), ranked_squares(red_kings, 32),
+                    ranked_squares(black_men, MAN_SQUARE_COUNT, BLACK_MAN_OFFSET), ranked_squares(black_kings, 32)]
+    counts = [len(squares) for squares in kind_squares]
+    # per position: the nearest win through another material, the longest of its losses there, and the
+    # moves that do not settle it yet: within the material, to drawn positions, plus one for any win
+    win_at = np.full(size, never, np.int32)
+    longest = np.full(size, -1, np.int32)
+    remaining = np.zeros(size, np.int32)
+    valid = np.zeros(size, bool)
+    parents, children = [], []
+    for batch in range(0, size // 2, TABLEBASE_BATCH):
+        placement_indices = np.arange(batch, min(batch + TABLEBASE_BATCH, size // 2), dtype=np.int64)
+        ranks, rest = [], placement_indices
+        for count in reversed(counts[1:]):
+            rest, kind_rank = np.divmod(rest, count)
+            ranks.insert(0, kind_rank)
+        ranks.insert(0, rest)
+        squares = [kind[rank] for kind, rank in zip(kind_squares, ranks)]
+        occupied = np.concatenate(squares, axis=1)
+        occupied.sort(axis=1)
+        # no two pieces on one square
+        distinct = (occupied[:, 1:] != occupied[:, :-1]).all(axis=1)
+        placement_indices = placement_indices[distinct]
+        squares = [kind[distinct] for kind in squares]
+        for red_to_move in (False, True):
+            valid[placement_indices * 2 + red_to_move] = True
+            edge_parents, black, red, kings = move_edges(material, placement_indices, squares, red_to_move,
+                                                         move_tables)
+            other = black if red_to_move else red
+            taken_all = other == 0
+            win_at[edge_parents[taken_all]] = 1
+            edge_parents, black, red, kings = (column[~taken_all] for column in (edge_parents, black, red, kings))
+            codes = (((bit_counts(red & ~kings) * 16 + bit_counts(red & kings)) * 16 +
+                      bit_counts(black & ~kings)) * 16 + bit_counts(black & kings))
+            for code in np.unique(codes):
+                child_material = (int(code) >> 12 & 15, int(code) >> 8 & 15, int(code) >> 4 & 15, int(code) & 15)
+                selected = codes == code
+                edge_child = position_indices(child_material, black[selected], red[selected], kings[selected],
+                                              not red_to_move)
+                edge_parent = edge_parents[selected]
+                if child_material == material:
+                    parents.append(edge_parent.astype(index_type))
+                    children.append(edge_child.astype(index_type))
+                    continue
+                child_values = np.asarray(tables[child_material])[edge_child].astype(np.int32)
+                lost = child_values < 0
+                np.minimum.at(win_at, edge_parent[lost], -child_values[lost])
+                won = child_values > 0
+                np.maximum.at(longest, edge_parent[won], child_values[won])
+                np.add.at(remaining, edge_parent[child_values == 0], 1)
+    parents = np.concatenate(parents) if parents else np.zeros(0, index_type)
+    children = np.concatenate(children) if children else np.zeros(0, index_type)
+    remaining += np.bincount(parents, minlength=size).astype(np.int32)
+    order = np.argsort(children, kind="stable")
+    parents = parents[order]
+    offsets = np.zeros(size + 1, np.int64)
+    np.cumsum(np.bincount(children, minlength=size), out=offsets[1:])
+    del children, order
+    winning = win_at < never
+    remaining += winning
+    # the distance each position is due to be settled at, once every shorter one has been
+    due = np.where(winning, win_at, np.where(valid & (remaining == 0), longest + 1, never)).astype(np.int32)
+    del win_at
+    settled = np.zeros(size, bool)
+    values = np.zeros(size, np.int16)
+    while True:
+        distance = int(due.min())
+        if distance == never:
+            break
+        new = np.flatnonzero(due == distance)
+        won = winning[new]
+        values[new] = np.where(won, distance, -(distance + 1))
+        settled[new] = True
+        due[new] = never
+        for child_won in (False, True):
+            settled_children = new[won == child_won]
+            starts = offsets[settled_children]
+            lengths = offsets[settled_children + 1] - starts
+            total = int(lengths.sum())
+            if not total:
+                continue
+            found = parents[np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)]
+            found = found[~settled[found]]
+            if not child_won:
+                due[found] = np.minimum(due[found], distance + 1)
+                winning[found] = True
+                continue
+            found, found_counts = np.unique(found, return_counts=True)
+            remaining[found] -= found_counts.astype(np.int32)
+            longest[found] = np.maximum(longest[found], distance)
+            lost = found[remaining[found] == 0]
+            due[lost] = longest[lost] + 1
+    # whatever is left unsettled can be held forever by both sides: a draw, which is already 0
+    return values
+
+
+def solve_task(task: tuple) -> tuple:
+    # executor entry point: a material and the tables it leads to, back with its table and the time taken
+    material, tables = task
+    started = time.perf_counter()
+    values = solve(material, tables)
+    return material, values, time.perf_counter() - started
+
+
+def generate(max_pieces: int, out=None, workers: int = 0) -> dict:
+    # materials with as many pieces and men as each other cannot lead to one another, so each such group
+    # is solved at once across the worker processes after the groups it leads to
+    tables = {}
+    groups = {}
+    for material in materials(max_pieces):
+        groups.setdefault((sum(material), material[0] + material[2]), []).append(material)
+    executor = ProcessPoolExecutor(workers) if workers else None
+    try:
+        for group in groups.values():
+            tasks = [(material, {successor: tables[successor] for successor in successor_materials(material)})
+                     for material in group]
+            results = executor.map(solve_task, tasks) if executor is not None else map(solve_task, tasks)
+            for material, values, seconds in results:
+                tables[material] = values
+                if out is not None:
+                    print("{}: {} entries in {:.1f}s".format(material_name(material), len(values), seconds),
+                          file=out)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    # in materials() order, which is the order of the file's directory
+    return {material: tables[material] for material in materials(max_pieces)}
+
+
+def material_name(material: tuple) -> str:
+    red_men, red_kings, black_men, black_kings = material
+    return "red {}m{}k black {}m{}k".format(red_men, red_kings, black_men, black_kings)
+
+
+def write(path: str, max_pieces: int, tables: dict):
+    with open(path, "wb") as file:
+        file.write(TABLEBASE_HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, max_pieces, len(tables)))
+        for material, values in tables.items():
+            file.write(TABLEBASE_TABLE.pack(*material, len(values)))
+        for values in tables.values():
+            values.astype("<i2").tofile(file)
+
+
+class Tablebase:
+    # a tablebase file mapped into memory; each table is read in place through a memoryview
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, count = TABLEBASE_HEADER.unpack_from(self.data, 0)
+        if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION:
+            self.close()
+            raise ValueError("Not a tablebase: " + path)
+        self.tables = {}  # type: Dict[tuple, memoryview]
+        offset = TABLEBASE_HEADER.size + count * TABLEBASE_TABLE.size
+        for table in range(count):
+            *material, entries = TABLEBASE_TABLE.unpack_from(self.data, TABLEBASE_HEADER.size +
+                                                              table * TABLEBASE_TABLE.size)
+            end = offset + entries * ENTRY_BYTES
+            if end > len(self.data):
+                self.close()
+                raise ValueError("Truncated tablebase: " + path)
+            self.tables[tuple(material)] = memoryview(self.data)[offset:end].cast("h")
+            offset = end
+
+    def probe(self, board) -> Optional[int]:
+        # the raw entry for a Board or BitBoard, or None when the position is not in the tablebase
+        if board.black_checkers is None or board.red_checkers is None or \
+                board.black_checkers + board.red_checkers > self.max_pieces:
+            return None
+        if isinstance(board, BitBoard):
+            black, red, kings = board.black, board.red, board.kings
+        else:
+            black, red, kings = board_masks(board)
+        if (red & ~kings & BOTTOM_ROW) or (black & ~kings & TOP_ROW):
+            # an uncrowned man on its crowning row is only possible in hand-made positions
+            return None
+        material = material_of(black, red, kings)
+        table = self.tables.get(material)
+        if table is None:
+            return None
+        return table[position_index(material, black, red, kings, board.turn == Color.RED)]
+
+    def value(self, board) -> Optional[float]:
+        # the probe as a search value, from red's side like Board.get_value
+        entry = self.probe(board)
+        if entry is None:
+            return None
+        if entry > 0:
+            value = TABLEBASE_WIN - entry
+        elif entry < 0:
+            value = -(TABLEBASE_WIN + entry + 1)
+        else:
+            return 0.0
+        return value if board.turn == Color.RED else -value
+
+    def close(self):
+        for table in getattr(self, "tables", {}).values():
+            table.release()
+        self.tables = {}
+        self.data.close()
+        self.file.close()
+
+
+_opened_tablebases = {}
+
+
+def open_tablebase(path: str) -> Tablebase:
+    # one mapping per process and file, shared by every Ai in it, such as those of executor workers
+    if path not in _opened_tablebases:
+        _opened_tablebases[path] = Tablebase(path)
+    return _opened_tablebases[path]
+
+
+def board_masks(board) -> Tuple[int, int, int]:
+    black, red, kings = 0, 0, 0
+    for square, tile in enumerate(SQUARE_TILES):
+        piece = board.get_piece_at(tile)
+        if piece is None:
+            continue
+        if piece.color == Color.BLACK:
+            black |= 1 << square
+        else:
+            red |= 1 << square
+        if piece.is_king:
+            kings |= 1 << square
+    return black, red, kings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis")
+    parser.add_argument("output")
+    parser.add_argument("--pieces", type=int, default=4, help="largest number of pieces on the board")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes solving materials at once, 0 to solve them in this process")
+    args = parser.parse_args(argv)
+    tables = generate(args.pieces, sys.stdout, args.workers)
+    write(args.output, args.pieces, tables)
+    print("{} tables written to {}".format(len(tables), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import as_completed
+from concurrent.futures.process import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from ai.ai import Ai, Move
+from ai.mcts import Mcts
+from ai.notation import move_to_text, moves_from_text
+from ai.options import parse_bool, parse_optional_float, parse_weights
+from ai.tablebase import open_tablebase
+from ai.transposition import TranspositionTable
+from model.model import Board, Color
+
+ENGINE_NAMES = ("a", "b")
+
+
+# what an engine is made of, written on the command line as name=value pairs separated by commas,
+# e.g. "depth=6,quiescence_depth=0,weights=1:2:1:3" or "weights=tuned.json"
+ENGINE_OPTIONS = {
+    "depth": int,
+    "alpha_beta": parse_bool,
+    "bitboard": parse_bool,
+    "transposition_table": parse_bool,
+    "quiescence_depth": int,
+    "time_limit": parse_optional_float,
+    "weights": parse_weights,
+    "tablebase": str,
+    "network": str,
+    "mcts": parse_bool,
+    "playouts": int,
+    "rollout_plies": int,
+}
+DEFAULT_ENGINE = {
+    "depth": 4,
+    "alpha_beta": True,
+    "bitboard": True,
+    "transposition_table": True,
+    "quiescence_depth": 8,
+    "time_limit": None,
+    "weights": None,
+    "tablebase": None,
+    "network": None,
+    "mcts": False,
+    "playouts": 2000,
+    "rollout_plies": 0,
+}
+
+
+def parse_engine(text: str) -> dict:
+    engine = dict(DEFAULT_ENGINE)
+    for option in filter(None, text.split(",")):
+        name, _, value = option.partition("=")
+        if name not in ENGINE_OPTIONS:
+            raise ValueError("Unknown engine option: " + name)
+        engine[name] = ENGINE_OPTIONS[name](value)
+    return engine
+
+
+def build_ai(board: Board, color: Color, engine: dict):
+    if engine["mcts"]:
+        # depth and the minimax options do not apply; time_limit and playouts bound each search
+        ai = Mcts(board, color, engine["time_limit"], engine["playouts"], rollout_plies=engine["rollout_plies"],
+                  bitboard=engine["bitboard"], collect_stats=True)
+        if engine["network"] is not None:
+            from ai.network import open_network
+            ai.set_evaluator(open_network(engine["network"]))
+        return ai
+    ai = Ai(board, color, engine["depth"], alpha_beta=engine["alpha_beta"], bitboard=engine["bitboard"],
+            transposition_table=TranspositionTable() if engine["transposition_table"] else None,
+            time_limit=engine["time_limit"], collect_stats=True, quiescence_depth=engine["quiescence_depth"])
+    if engine["tablebase"] is not None:
+        ai.set_tablebase(open_tablebase(engine["tablebase"]))
+    if engine["network"] is not None:
+        from ai.network import open_network
+        ai.set_evaluator(open_network(engine["network"]))
+    return ai
+
+
+def random_opening(plies: int, rng: random.Random) -> List[Move]:
+    board = Board()
+    ai = Ai(board, Color.RED)
+    moves = []
+    while len(moves) < plies and board.winner() is None:
+        legal_moves = ai.get_available_moves(board)
+        if not legal_moves:
+            break
+        move = rng.choice(legal_moves)
+        Ai.do_move(move, board)
+        moves.append(move)
+    return moves
+
+
+def play_game(params) -> dict:
+    # executor entry point: one game between the two engines from the given opening, as a record for the
+    # results file; engines are indexed 0 for a and 1 for b, and red_engine says which one plays red
+    game, engines, red_engine, opening, max_plies = params
+    board = Board()
+    default_weights = board.get_weights()
+    engine_of = {Color.RED: red_engine, Color.BLACK: 1 - red_engine}
+    ais = {color: build_ai(board, color, engines[engine_of[color]]) for color in Color}
+    seconds, moves, nodes = [0.0, 0.0], [0, 0], [0, 0]
+    for move in moves_from_text(opening):
+        ais[board.turn].play(move)
+    plies = len(opening.split())
+    winner = None
+    played = []
+    while plies < max_plies:
+        if board.winner() is not None:
+            winner = engine_of[board.winner()]
+            break
+        engine = engine_of[board.turn]
+        ai = ais[board.turn]
+        # evaluation weights belong to the board, so each engine's are put in place before it searches
+        weights = engines[engine]["weights"] or ()
+        board.set_weights(tuple(weights) + default_weights[len(weights):])
+        started = time.perf_counter()
+        move = ai.get_best_move(None)
+        seconds[engine] += time.perf_counter() - started
+        moves[engine] += 1
+        nodes[engine] += ai.last_stats.nodes
+        if move is None:
+            # a side that cannot move loses
+            winner = 1 - engine
+            break
+        ai.play(move)
+        played.append(move_to_text(move))
+        plies += 1
+    if winner is None and plies >= max_plies:
+        # the last allowed ply can still end the game
+        if board.winner() is not None:
+            winner = engine_of[board.winner()]
+        elif next(Ai(board, board.turn).generate_moves(board), None) is None:
+            winner = 1 - engine_of[board.turn]
+    return {
+        "game": game,
+        "opening": opening,
+        "moves_played": " ".join(played),
+        "red": ENGINE_NAMES[red_engine],
+        "winner": None if winner is None else ENGINE_NAMES[winner],
+        "plies": plies,
+        "moves": moves,
+        "seconds": seconds,
+        "nodes": nodes,
+    }
+
+
+def elo_difference(wins: int, draws: int, losses: int) -> Tuple[float, float]:
+    # the Elo difference the score implies and the half-width of its 95% confidence interval
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float("inf")
+    score = (wins + draws / 2) / games
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games)
+    if deviation == 0:
+        # every game ended the same way, a perfect score among them, which bounds nothing
+        return score_to_elo(score), float("inf")
+    error = 1.96 * deviation / math.sqrt(games)
+    return score_to_elo(score), (score_to_elo(score + error) - score_to_elo(score - error)) / 2
+
+
+def score_to_elo(score: float) -> float:
+    if score <= 0:
+        return float("-inf")
+    if score >= 1:
+        return float("inf")
+    return -400 * math.log10(1 / score - 1)
+
+
+class TournamentResult:
+    def __init__(self):
+        # from a's side
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.seconds = [0.0, 0.0]
+        self.moves = [0, 0]
+        self.nodes = [0, 0]
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def add(self, record: dict):
+        if record["winner"] is None:
+            self.draws += 1
+        elif record["winner"] == ENGINE_NAMES[0]:
+            self.wins += 1
+        else:
+            self.losses += 1
+        for engine in range(2):
+            self.seconds[engine] += record["seconds"][engine]
+            self.moves[engine] += record["moves"][engine]
+            self.nodes[engine] += record["nodes"][engine]
+
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games() if self.games() else 0.0
+
+    def report(self) -> str:
+        elo, margin = elo_difference(self.wins, self.draws, self.losses)
+        lines = ["a vs b: +{} ={} -{} in {} games, score {:.1%}, Elo {:+.1f} +/- {:.1f}".format(
+            self.wins, self.draws, self.losses, self.games(), self.score(), elo, margin)]
+        for engine, name in enumerate(ENGINE_NAMES):
+            moves, seconds = self.moves[engine], self.seconds[engine]
+            lines.append("{}: {:.1f} ms per move, {:.0f} nodes per second".format(
+                name, 1000 * seconds / moves if moves else 0.0, self.nodes[engine] / seconds if seconds else 0.0))
+        return "\n".join(lines)
+
+
+def run_tournament(engines: tuple, games: int, workers: int = 0, random_plies: int = 4, max_plies: int = 150,
+                   seed: Optional[int] = None, output: Optional[str] = None, out=None) -> TournamentResult:
+    # games are played in pairs from the same random opening, each engine taking red once, and written to
+    # output as one JSON line per game as they finish; workers 0 plays them in this process
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    tasks = []
+    for game in range(games):
+        pair = game // 2
+        opening = random_opening(random_plies, random.Random(seed * 1000003 + pair))
+        tasks.append((game, engines, game % 2, " ".join(move_to_text(move) for move in opening), max_plies))
+    result = TournamentResult()
+    results_file = open(output, "a") if output is not None else None
+    try:
+        if workers:
+            with ProcessPoolExecutor(workers) as executor:
+                records = (future.result() for future in as_completed([executor.submit(play_game, task)
+                                                                      for task in tasks]))
+                record_results(records, result, results_file, out)
+        else:
+            record_results(map(play_game, tasks), result, results_file, out)
+    finally:
+        if results_file is not None:
+            results_file.close()
+    return result
+
+
+def record_results(records, result: TournamentResult, results_file, out):
+    for record in records:
+        result.add(record)
+        if results_file is not None:
+            results_file.write(json.dumps(record, sort_keys=True) + "\n")
+            results_file.flush()
+        if out is not None:
+            print("game {}: {} after {} plies, {}".format(
+                record["game"] + 1, "draw" if record["winner"] is None else record["winner"] + " wins",
+                record["plies"], result.report().splitlines()[0]), file=out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Play games between two engine configurations")
+    parser.add_argument("--a", type=parse_engine, default=parse_engine(""),
+                        help="engine a as name=value pairs, e.g. depth=6,quiescence_depth=0; options: " +
+                             ", ".join(ENGINE_OPTIONS))
+    parser.add_argument("--b", type=parse_engine, default=parse_engine(""), help="engine b, like --a")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes playing games at once, 0 to play them in this process")
+    parser.add_argument("--random-plies", type=int, default=4, help="random moves opening each pair of games")
+    parser.add_argument("--max-plies", type=int, default=150, help="games longer than this are draws")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="file to append one JSON line per game to")
+    args = parser.parse_args(argv)
+    result = run_tournament((args.a, args.b), args.games, args.workers, args.random_plies, args.max_plies,
+                            args.seed, args.output, sys.stdout)
+    print(result.report())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
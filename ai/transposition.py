@@ -0,0 +1,55 @@
+from enum import Enum
+from typing import List, Optional
+
+
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+
+class TableEntry:
+    __slots__ = ("key", "depth", "value", "bound", "best_move", "generation")
+
+    def __init__(self, key: int, depth: int, value: float, bound: Bound, best_move, generation: int):
+        self.key = key
+        self.depth = depth
+        self.value = value
+        self.bound = bound
+        self.best_move = best_move
+        self.generation = generation
+
+
+class TranspositionTable:
+    # rough footprint of one stored entry: the slotted object, its key int, its value float and the list slot
+    ENTRY_BYTES = 160
+    shared = False
+
+    def __init__(self, memory_bytes: int = 16 * 1024 * 1024):
+        self.size = max(1, memory_bytes // TranspositionTable.ENTRY_BYTES)
+        self.entries = [None] * self.size  # type: List[Optional[TableEntry]]
+        self.generation = 0
+        self.hits = 0
+        self.probes = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key: int) -> Optional[TableEntry]:
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, value: float, bound: Bound, best_move):
+        index = key % self.size
+        entry = self.entries[index]
+        # depth-preferred: a deeper entry from the current search survives shallower results for other positions
+        if entry is None or entry.key == key or entry.generation != self.generation or depth >= entry.depth:
+            self.entries[index] = TableEntry(key, depth, value, bound, best_move, self.generation)
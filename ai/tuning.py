@@ -0,0 +1,219 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures.process import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ai.ai import Ai, Move
+from ai.book import parse_game
+from ai.notation import moves_from_text
+from model.batch import BatchEvaluator, codes_from_keys
+from model.model import Board, Color, WEIGHT_NAMES, read_weights, write_weights
+
+# a game's result from red's side, which each of its positions' predicted score is fitted to
+RED_SCORES = {Color.RED: 1.0, None: 0.5, Color.BLACK: 0.0}
+# the first step tried for each weight and the smallest it is halved down to; the endgame thresholds
+# are whole numbers of pieces and turns
+INITIAL_STEPS = (0.02, 0.02, 0.02, 0.2, 1, 8)
+MIN_STEPS = (0.0025, 0.0025, 0.0025, 0.0125, 1, 1)
+INTEGER_WEIGHTS = (False, False, False, False, True, True)
+
+
+class Dataset:
+    # quiet positions as rows of kind codes (see model.batch), with their turn counters and the score
+    # red went on to get in the game they came from
+    def __init__(self, codes: np.ndarray, turn_counters: np.ndarray, scores: np.ndarray):
+        self.codes = codes
+        self.turn_counters = turn_counters
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @staticmethod
+    def from_games(games: Iterable[Tuple[List[Move], Optional[Color]]], skip_plies: int = 8) -> 'Dataset':
+        # positions in the middle of a jump and the first skip_plies of each game, which are mostly
+        # opening theory, are left out
+        keys, turn_counters, scores = [], [], []
+        for moves, winner in games:
+            board = Board()
+            for ply, move in enumerate(moves):
+                Ai.do_move(move, board)
+                if ply + 1 < skip_plies or board.must_jump or board.winner() is not None:
+                    continue
+                keys.append(board.piece_codes)
+                turn_counters.append(board.turn_counter)
+                scores.append(RED_SCORES[winner])
+        return Dataset(codes_from_keys(keys) if keys else np.zeros((0, 32), dtype=np.int8),
+                       np.array(turn_counters, dtype=np.int32), np.array(scores, dtype=np.float64))
+
+    @staticmethod
+    def load(path: str) -> 'Dataset':
+        with np.load(path) as data:
+            return Dataset(data["codes"], data["turn_counters"], data["scores"])
+
+    def save(self, path: str):
+        np.savez_compressed(path, codes=self.codes, turn_counters=self.turn_counters, scores=self.scores)
+
+    @staticmethod
+    def concatenate(datasets: List['Dataset']) -> 'Dataset':
+        return Dataset(np.concatenate([dataset.codes for dataset in datasets]),
+                       np.concatenate([dataset.turn_counters for dataset in datasets]),
+                       np.concatenate([dataset.scores for dataset in datasets]))
+
+
+def games_from_records(lines: Iterable[str]) -> List[Tuple[List[Move], Optional[Color]]]:
+    # the results file python -m ai.tournament writes, one JSON record per game
+    games = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        winner = None
+        if record["winner"] is not None:
+            winner = Color.RED if record["winner"] == record["red"] else Color.BLACK
+        games.append((moves_from_text(record["opening"] + " " + record.get("moves_played", "")), winner))
+    return games
+
+
+def read_dataset(path: str, skip_plies: int = 8) -> Dataset:
+    # a saved dataset (.npz), tournament results (.jsonl) or a games file as the opening book imports
+    if path.endswith(".npz"):
+        return Dataset.load(path)
+    with open(path) as file:
+        if path.endswith(".jsonl"):
+            games = games_from_records(file)
+        else:
+            games = list(filter(None, map(parse_game, file)))
+    return Dataset.from_games(games, skip_plies)
+
+
+def predicted_scores(values: np.ndarray, scale: float) -> np.ndarray:
+    return 1 / (1 + np.exp(-scale * values))
+
+
+def evaluation_loss(dataset: Dataset, weights: tuple, scale: float) -> float:
+    # mean squared error between each game's result and the score its positions' values predict
+    values = BatchEvaluator(weights).evaluate(dataset.codes, dataset.turn_counters)
+    return float(np.mean((dataset.scores - predicted_scores(values, scale)) ** 2))
+
+
+def fit_scale(dataset: Dataset, weights: tuple, low: float = 0.001, high: float = 10.0,
+              iterations: int = 60) -> float:
+    # golden-section search, over the logarithm of the scale, for the one the weights fit best with; it
+    # then stays fixed while the weights are tuned, so their overall size cannot drift instead
+    values = BatchEvaluator(weights).evaluate(dataset.codes, dataset.turn_counters)
+
+    def loss(log_scale: float) -> float:
+        return float(np.mean((dataset.scores - predicted_scores(values, math.exp(log_scale))) ** 2))
+    ratio = (math.sqrt(5) - 1) / 2
+    low, high = math.log(low), math.log(high)
+    for _ in range(iterations):
+        left, right = high - ratio * (high - low), low + ratio * (high - low)
+        if loss(left) < loss(right):
+            high = right
+        else:
+            low = left
+    return math.exp((low + high) / 2)
+
+
+def valid_weights(weights: tuple) -> bool:
+    return all(weight > 0 for weight in weights[:4]) and weights[4] >= 1 and weights[5] >= 0
+
+
+def neighbours(weights: tuple, steps: List[float]) -> List[tuple]:
+    candidates = []
+    for index in range(len(WEIGHT_NAMES)):
+        for sign in (1, -1):
+            candidate = list(weights)
+            candidate[index] += sign * steps[index]
+            if INTEGER_WEIGHTS[index]:
+                candidate[index] = int(round(candidate[index]))
+            else:
+                candidate[index] = round(candidate[index], 6)
+            if valid_weights(tuple(candidate)):
+                candidates.append(tuple(candidate))
+    return candidates
+
+
+_dataset = None  # type: Optional[Dataset]
+_scale = 1.0
+
+
+def init_worker(codes: np.ndarray, turn_counters: np.ndarray, scores: np.ndarray, scale: float):
+    # executor initializer: each worker process gets the dataset once rather than with every candidate
+    global _dataset, _scale
+    _dataset = Dataset(codes, turn_counters, scores)
+    _scale = scale
+
+
+def candidate_loss(weights: tuple) -> float:
+    # executor entry point
+    return evaluation_loss(_dataset, weights, _scale)
+
+
+def tune(dataset: Dataset, weights: tuple, scale: float, workers: int = 0, iterations: int = 100,
+         out=None) -> Tuple[tuple, float]:
+    # local search: every iteration moves each weight a step up and a step down, those candidates being
+    # scored at once across the worker processes, and takes the best if it beats the current weights;
+    # when none does, the steps are halved, and the search ends once they cannot shrink any more
+    steps = list(INITIAL_STEPS)
+    init_worker(dataset.codes, dataset.turn_counters, dataset.scores, scale)
+    executor = None
+    if workers:
+        executor = ProcessPoolExecutor(workers, initializer=init_worker,
+                                       initargs=(dataset.codes, dataset.turn_counters, dataset.scores, scale))
+    try:
+        loss = candidate_loss(weights)
+        for iteration in range(iterations):
+            candidates = neighbours(weights, steps)
+            losses = list(executor.map(candidate_loss, candidates) if executor else map(candidate_loss, candidates))
+            best = min(range(len(candidates)), key=losses.__getitem__, default=None)
+            if best is not None and losses[best] < loss:
+                weights, loss = candidates[best], losses[best]
+            elif steps == list(MIN_STEPS):
+                break
+            else:
+                steps = [max(step / 2, min_step) for step, min_step in zip(steps, MIN_STEPS)]
+            if out is not None:
+                print("iteration {}: loss {:.6f}, weights {}".format(iteration + 1, loss, weights), file=out)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return weights, loss
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights to game results")
+    parser.add_argument("output", help="weights file to write, which Board.load_weights reads")
+    parser.add_argument("inputs", nargs="+",
+                        help="saved datasets (.npz), tournament results (.jsonl) or games files, one game per line")
+    parser.add_argument("--start", default=None, help="weights file to start from instead of the defaults")
+    parser.add_argument("--skip-plies", type=int, default=8, help="opening plies of each game left out")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes scoring candidate weights at once, 0 to score them in this process")
+    parser.add_argument("--save-dataset", default=None, help="save the positions read as a .npz to reuse")
+    args = parser.parse_args(argv)
+    dataset = Dataset.concatenate([read_dataset(path, args.skip_plies) for path in args.inputs])
+    if not len(dataset):
+        print("No positions to tune on")
+        return 1
+    if args.save_dataset is not None:
+        dataset.save(args.save_dataset)
+    weights = read_weights(args.start) if args.start is not None else Board(True).get_weights()
+    scale = fit_scale(dataset, weights)
+    print("{} positions, scale {:.4f}, loss {:.6f}".format(len(dataset), scale,
+                                                           evaluation_loss(dataset, weights, scale)))
+    weights, loss = tune(dataset, weights, scale, args.workers, args.iterations, sys.stdout)
+    write_weights(args.output, weights)
+    print("loss {:.6f}, weights written to {}".format(loss, args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
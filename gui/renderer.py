@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Tuple
+
+import pygame
+from pygame.font import Font
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+from gui.settings import Settings
+from model.model import Board, Color, Tile
+
+
+class TextLine:
+    def __init__(self, content: str, size: int, position: Tuple[int, int], color: Tuple[int, int, int]):
+        self.content = content
+        self.size = size
+        self.position = position
+        self.color = color
+
+    def key(self) -> tuple:
+        return self.content, self.size, self.color
+
+
+class Renderer:
+    # draws the game from surfaces built once: the board background, one sprite per kind of piece and
+    # text rendered only when it changes; each frame only the tiles and text that changed are redrawn and
+    # pushed to the display
+    def __init__(self, screen: Surface, settings: Settings):
+        self.screen = screen
+        self.settings = settings
+        self.tile_size = settings.screen_width // 8
+        self.fonts = {}  # type: Dict[int, Font]
+        # one cache entry per text slot, replaced when that slot's content changes
+        self.text_surfaces = {}  # type: Dict[int, Tuple[tuple, Surface]]
+        self.background = self.build_background()
+        self.selected_sprite = self.build_selected_sprite()
+        self.sprites = {(color, is_king): self.build_sprite(color, is_king)
+                        for color in Color for is_king in (False, True)}
+        # what is on screen now: a sprite key or None per tile, the selected tile and the text lines
+        self.drawn_tiles = None  # type: Optional[List[List[Optional[tuple]]]]
+        self.drawn_selection = None  # type: Optional[Tile]
+        self.drawn_lines = []  # type: List[Tuple[tuple, Rect]]
+        self.drawn_winner = None  # type: Optional[Color]
+        self.lines = []  # type: List[Tuple[Surface, Rect]]
+
+    def build_background(self) -> Surface:
+        background = Surface(self.screen.get_size())
+        background.fill(self.settings.white_tile_color)
+        for row in range(8):
+            for col in range(8):
+                if (row + col) % 2 == 1:
+                    pygame.draw.rect(background, self.settings.black_tile_color, self.tile_rect(row, col))
+        return background
+
+    def build_selected_sprite(self) -> Surface:
+        sprite = Surface((self.tile_size, self.tile_size))
+        sprite.fill(self.settings.selected_tile_color)
+        return sprite
+
+    def build_sprite(self, color: Color, is_king: bool) -> Surface:
+        sprite = Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+        piece_color = self.settings.red_piece_color if color == Color.RED else self.settings.black_piece_color
+        center = self.tile_size // 2
+        pygame.draw.circle(sprite, piece_color, (center, center), self.settings.piece_radius, 0)
+        if is_king:
+            pygame.draw.rect(sprite, self.settings.white_tile_color, (center - 10, center - 10, 20, 20))
+        return sprite
+
+    def tile_rect(self, row: int, col: int) -> Rect:
+        return Rect(col * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+
+    def font(self, size: int) -> Font:
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont(None, size, bold=True, italic=False)
+        return self.fonts[size]
+
+    def text(self, slot: int, line: TextLine) -> Surface:
+        cached = self.text_surfaces.get(slot)
+        if cached is None or cached[0] != line.key():
+            cached = line.key(), self.font(line.size).render(line.content, True, line.color)
+            self.text_surfaces[slot] = cached
+        return cached[1]
+
+    def invalidate(self):
+        # forget what is on screen so the next frame is drawn in full
+        self.drawn_tiles = None
+        self.drawn_winner = None
+
+    def draw(self, board: Board, selected_tile: Optional[Tile], lines: List[TextLine]):
+        winner = board.winner()
+        if winner is not None:
+            self.draw_win_screen(winner)
+            return
+        tiles = [[None if piece is None else (piece.color, piece.is_king) for piece in row] for row in board.tiles]
+        self.lines = []
+        for slot, line in enumerate(lines):
+            surface = self.text(slot, line)
+            self.lines.append((surface, surface.get_rect(topleft=line.position)))
+        line_keys = [(line.key(), rect) for line, (_, rect) in zip(lines, self.lines)]
+        if self.drawn_tiles is None or self.drawn_winner is not None:
+            dirty = [self.screen.get_rect()]
+        else:
+            dirty = [self.tile_rect(row, col) for row in range(8) for col in range(8)
+                     if tiles[row][col] != self.drawn_tiles[row][col]]
+            if selected_tile is not self.drawn_selection:
+                dirty += [self.tile_rect(tile.row, tile.column) for tile in (selected_tile, self.drawn_selection)
+                          if tile is not None]
+            if line_keys != self.drawn_lines:
+                dirty += [rect for _, rect in self.drawn_lines] + [rect for _, rect in line_keys]
+        for rect in dirty:
+            self.redraw_area(rect, tiles, selected_tile)
+        self.drawn_tiles = tiles
+        self.drawn_selection = selected_tile
+        self.drawn_lines = line_keys
+        self.drawn_winner = None
+        if dirty:
+            pygame.display.update(dirty)
+
+    def redraw_area(self, area: Rect, tiles, selected_tile: Optional[Tile]):
+        # paints everything that overlaps area, in layer order, without touching the rest of the screen
+        self.screen.set_clip(area)
+        self.screen.blit(self.background, area, area)
+        first_row, last_row = area.top // self.tile_size, (area.bottom - 1) // self.tile_size
+        first_col, last_col = area.left // self.tile_size, (area.right - 1) // self.tile_size
+        for row in range(max(0, first_row), min(7, last_row) + 1):
+            for col in range(max(0, first_col), min(7, last_col) + 1):
+                if selected_tile is not None and (selected_tile.row, selected_tile.column) == (row, col):
+                    self.screen.blit(self.selected_sprite, self.tile_rect(row, col))
+                if tiles[row][col] is not None:
+                    self.screen.blit(self.sprites[tiles[row][col]], self.tile_rect(row, col))
+        for surface, rect in self.lines:
+            if rect.colliderect(area):
+                self.screen.blit(surface, rect)
+        self.screen.set_clip(None)
+
+    def draw_win_screen(self, winner: Color):
+        if winner == self.drawn_winner:
+            return
+        color = self.settings.red_piece_color if winner == Color.RED else self.settings.black_piece_color
+        text = self.text(-1, TextLine("{winner} wins!".format(winner=winner.name), 72, (0, 0), color))
+        self.screen.fill(self.settings.white_tile_color)
+        center_x, center_y = self.screen.get_rect().center
+        self.screen.blit(text, (center_x - text.get_width() // 2, center_y - text.get_height() // 2))
+        self.drawn_winner = winner
+        self.drawn_tiles = None
+        pygame.display.flip()
@@ -9,3 +9,12 @@ class Settings:
         self.text_color = (10, 10, 230)
         self.selected_tile_color = (125, 125, 125)
         self.piece_radius = 42
+        self.frame_rate = 30
+        # loaded when present; build one with python -m ai.book
+        self.opening_book_path = "opening_book.bin"
+        self.book_plies = 12
+        self.book_randomness = 0.5
+        # loaded when present; build one with python -m ai.tablebase
+        self.tablebase_path = "endgame.tb"
+        # loaded when present; tune one with python -m ai.tuning
+        self.weights_path = "weights.json"
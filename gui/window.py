@@ -1,14 +1,21 @@
 import multiprocessing
+import os
 import sys
 import time
 import logging
 from concurrent.futures.process import ProcessPoolExecutor
+from typing import List
 
 import pygame
 from pygame.event import Event
 from pygame.surface import Surface
 
 from ai.ai import Ai
+from ai.background import BackgroundSearch
+from ai.book import OpeningBook
+from ai.shared_table import SharedTranspositionTable
+from ai.tablebase import open_tablebase
+from gui.renderer import Renderer, TextLine
 from gui.settings import Settings
 from model.model import Board, Color, Tile, MoveType
 
@@ -21,11 +28,33 @@ class PyCheckers:
         self.screen = pygame.display.set_mode((self.settings.screen_width,
                                                self.settings.screen_height))  # type: Surface
         pygame.display.set_caption("PyCheckers")
-        self.board = Board()
+        self.renderer = Renderer(self.screen, self.settings)
+        self.clock = pygame.time.Clock()
+        self.board = self.new_board()
         self.selected_tile = None
         self.executor = ProcessPoolExecutor()
-        self.red_ai = Ai(self.board, Color.RED, 6)
-        self.black_ai = Ai(self.board, Color.BLACK, 6)
+        # this process searches too, so one helper fewer than there are cores
+        helpers = max(1, (os.cpu_count() or 1) - 1)
+        self.red_table = SharedTranspositionTable(64 * 1024 * 1024)
+        self.black_table = SharedTranspositionTable(64 * 1024 * 1024)
+        self.red_ai = Ai(self.board, Color.RED, 6, alpha_beta=True, transposition_table=self.red_table,
+                         bitboard=True, lazy_smp_workers=helpers, quiescence_depth=8)
+        self.black_ai = Ai(self.board, Color.BLACK, 6, alpha_beta=True, transposition_table=self.black_table,
+                           bitboard=True, lazy_smp_workers=helpers, quiescence_depth=8)
+        self.opening_book = None
+        if os.path.exists(self.settings.opening_book_path):
+            self.opening_book = OpeningBook(self.settings.opening_book_path)
+            for ai in (self.red_ai, self.black_ai):
+                ai.set_opening_book(self.opening_book, self.settings.book_plies, self.settings.book_randomness)
+        self.tablebase = None
+        if os.path.exists(self.settings.tablebase_path):
+            self.tablebase = open_tablebase(self.settings.tablebase_path)
+            for ai in (self.red_ai, self.black_ai):
+                ai.set_tablebase(self.tablebase)
+        # the AIs think on background threads so the window keeps handling events while they search
+        self.red_search = BackgroundSearch(self.red_ai, self.executor)
+        self.black_search = BackgroundSearch(self.black_ai, self.executor)
+        self.ponder = False
         self.first = True
         self.num_AIs = 0
 
@@ -33,81 +62,98 @@ class PyCheckers:
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    self.red_search.shutdown()
+                    self.black_search.shutdown()
                     self.executor.shutdown()
+                    self.red_table.close()
+                    self.black_table.close()
+                    if self.opening_book is not None:
+                        self.opening_book.close()
+                    if self.tablebase is not None:
+                        self.tablebase.close()
                     sys.exit()
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    if self.num_AIs != 2:
+                    if self.search_for_turn() is None:
                         self.handle_click()
                 if event.type == pygame.KEYDOWN:
+                    if event.key in (pygame.K_0, pygame.K_1, pygame.K_2):
+                        self.cancel_searches()
                     if event.key == pygame.K_0:
                         self.num_AIs = 2
                     elif event.key == pygame.K_1:
                         self.num_AIs = 1
                     elif event.key == pygame.K_2:
                         self.num_AIs = 0
-            if self.num_AIs == 2:
-                self.black_ai.next_move(self.executor)
-                self.draw_board()
-                pygame.display.flip()
-                self.red_ai.next_move(self.executor)
+                    elif event.key == pygame.K_r:
+                        self.reset_game()
+                    elif event.key == pygame.K_p:
+                        self.ponder = not self.ponder
+                        if not self.ponder:
+                            self.red_search.cancel()
+            self.update_ai()
             self.draw_board()
-            pygame.display.flip()
+            # the cap leaves the CPU, and the interpreter, to the searches while the window is idle
+            self.clock.tick(self.settings.frame_rate)
+
+    def search_for_turn(self):
+        # the background search of the AI whose turn it is, or None when a human is to move
+        if self.board.winner() is not None:
+            return None
+        if self.num_AIs == 2:
+            return self.red_search if self.board.turn == Color.RED else self.black_search
+        if self.num_AIs == 1 and self.board.turn == Color.RED:
+            return self.red_search
+        return None
+
+    def update_ai(self):
+        search = self.search_for_turn()
+        if search is None or search.has_no_move(self.board):
+            return
+        if not search.running() or search.pondering:
+            # a ponder search that guessed the human's move right carries on, anything else starts over
+            search.resume(self.board)
+        move = search.poll()
+        if move is not None:
+            search.ai.play(move)
+            if self.ponder and self.num_AIs == 1 and self.board.winner() is None:
+                self.red_search.ponder(self.board)
+
+    def cancel_searches(self, wait: bool = False):
+        self.red_search.cancel(wait)
+        self.black_search.cancel(wait)
+
+    def new_board(self) -> Board:
+        board = Board()
+        if os.path.exists(self.settings.weights_path):
+            board.load_weights(self.settings.weights_path)
+        return board
+
+    def reset_game(self):
+        # the searches must be over before their Ais are pointed at the new board
+        self.cancel_searches(wait=True)
+        self.board = self.new_board()
+        for ai in (self.red_ai, self.black_ai):
+            ai.board = self.board
+            ai.last_move = None
+        self.selected_tile = None
+        self.first = True
+        self.renderer.invalidate()
 
     def draw_board(self):
-        if self.board.winner() is None:
-            self.draw_tiles()
-            self.draw_pieces()
-            self.draw_text()
-        else:
-            self.draw_win_screen()
-
-    def draw_tiles(self):
-        self.screen.fill(self.settings.white_tile_color)
-        for row in range(8):
-            for col in range(8):
-                if (row + col) % 2 == 1:
-                    pygame.draw.rect(self.screen, self.settings.black_tile_color, (row * 100, col * 100, 100, 100))
-        if self.selected_tile is not None:
-            pygame.draw.rect(self.screen, self.settings.selected_tile_color, (self.selected_tile.column * 100,
-                                                                              self.selected_tile.row * 100,
-                                                                              100, 100))
-
-    def draw_pieces(self):
-        y = 0
-        for row in self.board.tiles:
-            x = 0
-            for piece in row:
-                if piece is not None:
-                    color = self.settings.red_piece_color if piece.color == Color.RED else self.settings.black_piece_color
-                    pygame.draw.circle(self.screen, color, (x * 100 + 50, y * 100 + 50), self.settings.piece_radius, 0)
-                    if piece.is_king:
-                        pygame.draw.rect(self.screen, self.settings.white_tile_color, (x * 100 + 40, y * 100 + 40, 20, 20))
-                x += 1
-            y += 1
-
-    def draw_text(self):
-        font = pygame.font.SysFont(None, 20, bold=True, italic=False)
-        small_font = pygame.font.SysFont(None, 14, bold=True, italic=False)
-        color = self.settings.text_color
-        player_text = font.render("{num_players} player".format(num_players=(2 - self.num_AIs)), True, color)
-        instruction_text = small_font.render("0, 1, or 2 to change", True, color)
-        turn_text = small_font.render("{turn}'s turn".format(turn=self.board.turn.name), True, color)
-        counter_text = small_font.render("{turn_count} moves".format(turn_count=self.board.turn_counter), True, color)
-        self.screen.blit(player_text, (5, 10))
-        self.screen.blit(instruction_text, (5, 30))
-        self.screen.blit(turn_text, (5, 44))
-        self.screen.blit(counter_text, (5, 58))
-
-    def draw_win_screen(self):
-        if self.first:
+        if self.board.winner() is not None and self.first:
             print(self.board)
             self.first = False
-        font = pygame.font.SysFont(None, 72, bold=True, italic=False)
-        color = self.settings.red_piece_color if self.board.winner() == Color.RED else self.settings.black_piece_color
-        text = font.render("{winner} wins!".format(winner=self.board.winner().name), True, color)
-        self.screen.fill(self.settings.white_tile_color)
-        self.screen.blit(text, (400 - text.get_width() // 2, 400 - text.get_height() // 2))
-        # self.executor.shutdown()
+        self.renderer.draw(self.board, self.selected_tile, self.text_lines())
+
+    def text_lines(self) -> List[TextLine]:
+        color = self.settings.text_color
+        return [
+            TextLine("{num_players} player".format(num_players=(2 - self.num_AIs)), 20, (5, 10), color),
+            TextLine("0, 1, or 2 to change, r to reset, p to ponder ({ponder})".format(
+                ponder="on" if self.ponder else "off"), 14, (5, 30), color),
+            TextLine("{turn}'s turn".format(turn=self.board.turn.name), 14, (5, 44), color),
+            TextLine("{turn_count} moves".format(turn_count=self.board.turn_counter), 14, (5, 58), color),
+        ]
 
     def handle_click(self):
         (x, y) = pygame.mouse.get_pos()
@@ -130,10 +176,6 @@ class PyCheckers:
                 self.selected_tile = clicked_tile
             else:
                 self.selected_tile = None
-        if self.board.turn == Color.RED and self.num_AIs == 1:
-            self.draw_board()
-            pygame.display.flip()
-            self.red_ai.next_move(self.executor)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,100 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from model.model import Board, VALUE_SCALE, PLAYABLE_SQUARES, WEIGHT_CACHE_SIZE
+
+# positions are encoded as one row of 32 kind codes per position, in PLAYABLE_SQUARES order (which is
+# also BitBoard's square order): 0 for an empty square, piece_kind + 1 otherwise, as in snapshots
+BLACK_CODES = (1, 3)
+RED_CODES = (2, 4)
+SQUARES = np.arange(32)
+KEY_BYTES = 12
+BIT_SHIFTS = np.arange(32, dtype=np.uint32)
+
+
+def codes_from_masks(black: List[int], red: List[int], kings: List[int]) -> np.ndarray:
+    # BitBoard masks, one entry per position
+    def bits(masks: List[int]) -> np.ndarray:
+        return (np.array(masks, dtype=np.uint32)[:, None] >> BIT_SHIFTS & 1).astype(np.int8)
+    red_bits, king_bits = bits(red), bits(kings)
+    return (bits(black) | red_bits) + red_bits + 2 * king_bits
+
+
+def codes_from_keys(keys: List[int]) -> np.ndarray:
+    # Board.to_key values, or just their piece codes
+    packed = np.frombuffer(b"".join((key & (1 << 96) - 1).to_bytes(KEY_BYTES, "little") for key in keys),
+                           dtype=np.uint8).reshape(len(keys), KEY_BYTES)
+    bits = np.unpackbits(packed, axis=1, bitorder="little").reshape(len(keys), 32, 3).astype(np.int8)
+    return bits[:, :, 0] + 2 * bits[:, :, 1] + 4 * bits[:, :, 2]
+
+
+def keys_from_codes(codes: np.ndarray) -> List[int]:
+    # the other way: the piece codes of Board.to_key, which Board.from_key takes
+    bits = (np.asarray(codes, dtype=np.uint8)[:, :, None] >> np.arange(3, dtype=np.uint8) & 1).reshape(len(codes), 96)
+    return [int.from_bytes(row.tobytes(), "little") for row in np.packbits(bits, axis=1, bitorder="little")]
+
+
+def codes_from_boards(boards) -> np.ndarray:
+    # Boards and BitBoards, which must be all one or all the other
+    if boards and hasattr(boards[0], "kings"):
+        return codes_from_masks([board.black for board in boards], [board.red for board in boards],
+                                [board.kings for board in boards])
+    return codes_from_keys([board.piece_codes for board in boards])
+
+
+def piece_counts(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # black's and red's pieces in each row of codes
+    black = np.count_nonzero((codes == BLACK_CODES[0]) | (codes == BLACK_CODES[1]), axis=1)
+    red = np.count_nonzero((codes == RED_CODES[0]) | (codes == RED_CODES[1]), axis=1)
+    return black, red
+
+
+def score_finished_games(values: np.ndarray, black: np.ndarray, red: np.ndarray):
+    # like get_value, a side with nothing left has lost, whatever the scores made of the position
+    values[red == 0] = -99999
+    values[black == 0] = 99999
+
+
+class BatchEvaluator:
+    # Board.get_value for many positions in one call, from the same fixed-point piece-square tables, so
+    # every score is exactly the one get_value gives
+    def __init__(self, weights: Optional[tuple] = None):
+        board = Board(True)
+        if weights is not None:
+            board.set_weights(weights)
+        self.weights = board.get_weights()
+        self.endgame_pieces = board.endgame_pieces
+        self.endgame_turn = board.endgame_turn
+        self.opening_values = self.square_values(board.opening_values)
+        self.endgame_values = self.square_values(board.endgame_values)
+
+    @staticmethod
+    def square_values(values) -> np.ndarray:
+        # [code][square], code 0 being an empty square worth nothing
+        table = np.zeros((5, 32), dtype=np.int64)
+        for kind in range(4):
+            table[kind + 1] = [values[kind][row][col] for row, col in PLAYABLE_SQUARES]
+        return table
+
+    def evaluate(self, codes: np.ndarray, turn_counters=None) -> np.ndarray:
+        # codes is (N, 32); turn_counters, one per position, only matters past the endgame turn and
+        # defaults to 0
+        codes = np.asarray(codes, dtype=np.intp)
+        black, red = piece_counts(codes)
+        endgame = (black < self.endgame_pieces) | (red < self.endgame_pieces)
+        if turn_counters is not None:
+            endgame |= np.asarray(turn_counters) > self.endgame_turn
+        scores = np.where(endgame, self.endgame_values[codes, SQUARES].sum(axis=1),
+                          self.opening_values[codes, SQUARES].sum(axis=1)) / VALUE_SCALE
+        score_finished_games(scores, black, red)
+        return scores
+
+    def evaluate_boards(self, boards) -> np.ndarray:
+        return self.evaluate(codes_from_boards(boards), [board.turn_counter for board in boards])
+
+
+@lru_cache(maxsize=WEIGHT_CACHE_SIZE)
+def evaluator_for(weights: tuple) -> BatchEvaluator:
+    return BatchEvaluator(weights)
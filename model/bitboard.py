@@ -0,0 +1,335 @@
+from functools import lru_cache
+from typing import Iterator, List, Optional
+
+from model.model import Board, Tile, Piece, Color, ZOBRIST_PIECE_KEYS, ZOBRIST_RED_TURN_KEY, \
+    ZOBRIST_LATE_GAME_KEY, VALUE_SCALE, SNAPSHOT_FORMAT, WEIGHT_CACHE_SIZE, value_tables
+
+# The 32 playable squares are numbered row by row, four per row: square = row * 4 + column // 2.
+FULL_MASK = 0xFFFFFFFF
+EVEN_ROWS = sum(0xF << (row * 4) for row in range(0, 8, 2))
+ODD_ROWS = sum(0xF << (row * 4) for row in range(1, 8, 2))
+LEFT_EDGE = sum(1 << (row * 4) for row in range(1, 8, 2))  # column 0
+RIGHT_EDGE = sum(1 << (row * 4 + 3) for row in range(0, 8, 2))  # column 7
+TOP_ROW = 0xF
+BOTTOM_ROW = 0xF << 28
+
+UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT = range(4)
+DIRECTION_OFFSETS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+BLACK_DIRECTIONS = (UP_LEFT, UP_RIGHT)
+RED_DIRECTIONS = (DOWN_LEFT, DOWN_RIGHT)
+KING_DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+OPPOSITE_DIRECTIONS = (DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT)
+
+
+def square_of(tile: Tile) -> int:
+    return tile.row * 4 + tile.column // 2
+
+
+def _build_tables():
+    tiles = [Tile(square // 4, 2 * (square % 4) + (1 - (square // 4) % 2)) for square in range(32)]
+    steps = [[-1] * 32 for direction in range(4)]
+    jumps = [[None] * 32 for direction in range(4)]
+    for square, tile in enumerate(tiles):
+        for direction, (row_offset, col_offset) in enumerate(DIRECTION_OFFSETS):
+            step = Tile(tile.row + row_offset, tile.column + col_offset)
+            landing = Tile(tile.row + 2 * row_offset, tile.column + 2 * col_offset)
+            if step.is_valid():
+                steps[direction][square] = square_of(step)
+            if landing.is_valid():
+                jumps[direction][square] = (square_of(step), square_of(landing))
+    return tiles, steps, jumps
+
+
+SQUARE_TILES, STEP_TABLE, JUMP_TABLE = _build_tables()
+# zobrist keys of Board, re-indexed by square so both engines hash a position identically
+SQUARE_ZOBRIST_KEYS = [[ZOBRIST_PIECE_KEYS[kind][tile.row][tile.column] for tile in SQUARE_TILES]
+                       for kind in range(4)]
+
+
+def shift(mask: int, direction: int) -> int:
+    # moves every bit of mask one step diagonally; bits that would leave the board are dropped
+    if direction == UP_LEFT:
+        return ((mask & EVEN_ROWS) >> 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) >> 5)
+    if direction == UP_RIGHT:
+        return ((mask & EVEN_ROWS & ~RIGHT_EDGE) >> 3) | ((mask & ODD_ROWS) >> 4)
+    if direction == DOWN_LEFT:
+        return (((mask & EVEN_ROWS) << 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) << 3)) & FULL_MASK
+    return (((mask & EVEN_ROWS & ~RIGHT_EDGE) << 5) | ((mask & ODD_ROWS) << 4)) & FULL_MASK
+
+
+def squares_of(mask: int):
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class SquarePiece(Piece):
+    # what BitBoard.get_piece_at hands out: one shared piece per kind, which therefore cannot be changed
+    def __init__(self, kind: int):
+        super().__init__(Color.BLACK if kind % 2 == 0 else Color.RED)
+        self.is_king = kind >= 2
+
+    def king(self):
+        raise TypeError("BitBoard pieces cannot be changed; the board's masks hold the position")
+
+    def unking(self):
+        raise TypeError("BitBoard pieces cannot be changed; the board's masks hold the position")
+
+
+# by kind, as kind_at numbers them
+SQUARE_PIECES = tuple(SquarePiece(kind) for kind in range(4))
+
+
+@lru_cache(maxsize=WEIGHT_CACHE_SIZE)
+def square_value_tables(row_multiplier: float, end_row_multiplier: float, end_col_multiplier: float,
+                        king_value: float) -> tuple:
+    # Board's fixed-point value tables, re-indexed [kind][square]
+    return tuple([[values[kind][tile.row][tile.column] for tile in SQUARE_TILES] for kind in range(4)]
+                 for values in value_tables(row_multiplier, end_row_multiplier, end_col_multiplier, king_value))
+
+
+class BitBoard:
+    def __init__(self, weights_board: Optional[Board] = None):
+        self.black = 0
+        self.red = 0
+        self.kings = 0
+        self.turn = Color.BLACK
+        self.must_jump = False
+        self.turn_counter = 0
+        self.black_checkers = 0
+        self.red_checkers = 0
+        self.zobrist_hash = 0
+        weights_board = weights_board or Board(True)
+        self.opening_values, self.endgame_values = square_value_tables(*weights_board.get_weights()[:4])
+        self.endgame_pieces = weights_board.endgame_pieces
+        self.endgame_turn = weights_board.endgame_turn
+
+    @staticmethod
+    def from_board(board: Board) -> "BitBoard":
+        bit_board = BitBoard(board)
+        for square, tile in enumerate(SQUARE_TILES):
+            piece = board.get_piece_at(tile)
+            if piece is None:
+                continue
+            if piece.color == Color.BLACK:
+                bit_board.black |= 1 << square
+            else:
+                bit_board.red |= 1 << square
+            if piece.is_king:
+                bit_board.kings |= 1 << square
+        bit_board.turn = board.turn
+        bit_board.turn_counter = board.turn_counter
+        bit_board.reset_incremental_state()
+        return bit_board
+
+    def to_board(self) -> Board:
+        board = Board(True)
+        for square in squares_of(self.black | self.red):
+            piece = Piece(Color.BLACK if self.black >> square & 1 else Color.RED)
+            if self.kings >> square & 1:
+                piece.king()
+            board.set_piece_at(SQUARE_TILES[square], piece)
+        board.turn = self.turn
+        board.must_jump = self.must_jump
+        board.turn_counter = self.turn_counter
+        board.black_checkers = self.black_checkers
+        board.red_checkers = self.red_checkers
+        board.reset_incremental_state()
+        return board
+
+    def snapshot(self) -> bytes:
+        codes = bytes(0 if not (self.black | self.red) >> square & 1 else self.kind_at(square) + 1
+                      for square in range(32))
+        return SNAPSHOT_FORMAT.pack(codes, self.turn == Color.RED, self.must_jump, self.turn_counter,
+                                    self.black_checkers, self.red_checkers)
+
+    @staticmethod
+    def from_snapshot(snapshot: bytes, weights: Optional[tuple] = None) -> "BitBoard":
+        codes, red_turn, _, turn_counter, _, _ = SNAPSHOT_FORMAT.unpack(snapshot)
+        weights_board = Board(True)
+        if weights is not None:
+            weights_board.set_weights(weights)
+        bit_board = BitBoard(weights_board)
+        for square, code in enumerate(codes):
+            if code:
+                if (code - 1) % 2 == 0:
+                    bit_board.black |= 1 << square
+                else:
+                    bit_board.red |= 1 << square
+                if code > 2:
+                    bit_board.kings |= 1 << square
+        bit_board.turn = Color.RED if red_turn else Color.BLACK
+        bit_board.turn_counter = turn_counter
+        bit_board.reset_incremental_state()
+        return bit_board
+
+    def reset_incremental_state(self):
+        self.black_checkers = bin(self.black).count("1")
+        self.red_checkers = bin(self.red).count("1")
+        self.must_jump = self.has_jump()
+        self.zobrist_hash = ZOBRIST_RED_TURN_KEY if self.turn == Color.RED else 0
+        if self.turn_counter > self.endgame_turn:
+            self.zobrist_hash ^= ZOBRIST_LATE_GAME_KEY
+        for square in squares_of(self.black | self.red):
+            self.zobrist_hash ^= SQUARE_ZOBRIST_KEYS[self.kind_at(square)][square]
+
+    def kind_at(self, square: int) -> int:
+        return (0 if self.black >> square & 1 else 1) + (2 if self.kings >> square & 1 else 0)
+
+    def get_piece_at(self, tile: Tile) -> Optional[Piece]:
+        square = square_of(tile)
+        if not (self.black | self.red) >> square & 1:
+            return None
+        return SQUARE_PIECES[self.kind_at(square)]
+
+    def is_king_at(self, tile: Tile) -> bool:
+        return bool(self.kings >> square_of(tile) & 1)
+
+    def winner(self) -> Optional[Color]:
+        if self.black_checkers == 0:
+            return Color.RED
+        elif self.red_checkers == 0:
+            return Color.BLACK
+        else:
+            return None
+
+    def get_value(self) -> float:
+        if self.black_checkers == 0:
+            return 99999
+        if self.red_checkers == 0:
+            return -99999
+        if self.black_checkers < self.endgame_pieces or self.red_checkers < self.endgame_pieces or \
+                self.turn_counter > self.endgame_turn:
+            values = self.endgame_values
+        else:
+            values = self.opening_values
+        value = 0
+        black, kings = self.black, self.kings
+        for square in squares_of(self.black | self.red):
+            value += values[(0 if black >> square & 1 else 1) + (2 if kings >> square & 1 else 0)][square]
+        return value / VALUE_SCALE
+
+    def side_masks(self, color: Color) -> (int, int, tuple):
+        if color == Color.BLACK:
+            return self.black, self.red, BLACK_DIRECTIONS
+        return self.red, self.black, RED_DIRECTIONS
+
+    def movable_masks(self, color: Color) -> (int, int, list):
+        own, opponent, forward = self.side_masks(color)
+        own_kings = own & self.kings
+        return own, opponent, [own if direction in forward else own_kings for direction in KING_DIRECTIONS]
+
+    def jumper_masks(self, color: Color) -> List[int]:
+        # per direction, the squares of pieces that can capture in that direction
+        _, opponent, movers = self.movable_masks(color)
+        empty = ~(self.black | self.red) & FULL_MASK
+        jumpers = []
+        for direction in KING_DIRECTIONS:
+            if not movers[direction]:
+                jumpers.append(0)
+                continue
+            landings = shift(shift(movers[direction], direction) & opponent, direction) & empty
+            opposite = OPPOSITE_DIRECTIONS[direction]
+            jumpers.append(shift(shift(landings, opposite), opposite))
+        return jumpers
+
+    def has_jump(self, color: Optional[Color] = None) -> bool:
+        return any(self.jumper_masks(self.turn if color is None else color))
+
+    def get_available_paths(self) -> List[List[int]]:
+        return list(self.generate_paths())
+
+    def generate_paths(self) -> Iterator[List[int]]:
+        # the paths of get_available_paths one at a time; the masks must be as they were whenever it resumes
+        if self.must_jump:
+            return self.generate_jump_paths()
+        return self.generate_simple_paths()
+
+    def generate_simple_paths(self) -> Iterator[List[int]]:
+        _, _, movers = self.movable_masks(self.turn)
+        empty = ~(self.black | self.red) & FULL_MASK
+        sources = [shift(shift(movers[direction], direction) & empty, OPPOSITE_DIRECTIONS[direction])
+                   for direction in KING_DIRECTIONS]
+        # square then direction order, which is the order Ai.get_available_moves produces for a Board
+        for square in squares_of(sources[0] | sources[1] | sources[2] | sources[3]):
+            for direction in KING_DIRECTIONS:
+                if sources[direction] >> square & 1:
+                    yield [square, STEP_TABLE[direction][square]]
+
+    def generate_jump_paths(self) -> Iterator[List[int]]:
+        _, opponent, forward = self.side_masks(self.turn)
+        jumpers = self.jumper_masks(self.turn)
+        for square in squares_of(jumpers[0] | jumpers[1] | jumpers[2] | jumpers[3]):
+            # the moving piece leaves its square, so a chain may pass back over it
+            occupied = (self.black | self.red) & ~(1 << square)
+            for chain in self.jump_chains(square, bool(self.kings >> square & 1), forward, opponent, occupied, 0):
+                yield [square] + chain
+
+    def jump_chains(self, square: int, is_king: bool, forward: tuple, opponent: int, occupied: int,
+                    captured: int) -> List[List[int]]:
+        chains = []
+        for direction in KING_DIRECTIONS:
+            if not is_king and direction not in forward:
+                continue
+            jump = JUMP_TABLE[direction][square]
+            if jump is None:
+                continue
+            over, landing = jump
+            # captured pieces stay on the board until the move ends, so they block but cannot be jumped again
+            if not (opponent & ~captured) >> over & 1 or occupied >> landing & 1:
+                continue
+            promoted = is_king or (1 << landing) & (TOP_ROW | BOTTOM_ROW) != 0
+            continuations = self.jump_chains(landing, promoted, forward, opponent, occupied,
+                                             captured | 1 << over)
+            if continuations:
+                chains += [[landing] + chain for chain in continuations]
+            else:
+                chains.append([landing])
+        return chains
+
+    def do_move(self, move) -> (tuple, bool):
+        saved_state = (self.black, self.red, self.kings, self.turn, self.must_jump, self.turn_counter,
+                       self.black_checkers, self.red_checkers, self.zobrist_hash)
+        squares = [square_of(tile) for tile in move.path]
+        start, end = squares[0], squares[-1]
+        was_king = bool(self.kings >> start & 1)
+        own_is_black = self.turn == Color.BLACK
+        kind = (0 if own_is_black else 1) + (2 if was_king else 0)
+        start_bit, end_bit = 1 << start, 1 << end
+        zobrist_hash = self.zobrist_hash ^ SQUARE_ZOBRIST_KEYS[kind][start]
+        captured = 0
+        promoted = was_king
+        for step_start, step_end in zip(squares, squares[1:]):
+            if abs(step_end - step_start) > 5:
+                over = square_of(SQUARE_TILES[step_start].midpoint(SQUARE_TILES[step_end]))
+                captured |= 1 << over
+                zobrist_hash ^= SQUARE_ZOBRIST_KEYS[self.kind_at(over)][over]
+            if (1 << step_end) & (TOP_ROW | BOTTOM_ROW):
+                promoted = True
+        if own_is_black:
+            self.black = self.black & ~start_bit | end_bit
+            self.red &= ~captured
+            self.red_checkers -= bin(captured).count("1")
+        else:
+            self.red = self.red & ~start_bit | end_bit
+            self.black &= ~captured
+            self.black_checkers -= bin(captured).count("1")
+        self.kings &= ~(start_bit | captured)
+        if promoted:
+            self.kings |= end_bit
+        zobrist_hash ^= SQUARE_ZOBRIST_KEYS[(0 if own_is_black else 1) + (2 if promoted else 0)][end]
+        self.turn = Color.RED if own_is_black else Color.BLACK
+        self.turn_counter += 1
+        if self.turn_counter == self.endgame_turn + 1:
+            zobrist_hash ^= ZOBRIST_LATE_GAME_KEY
+        self.zobrist_hash = zobrist_hash ^ ZOBRIST_RED_TURN_KEY
+        self.must_jump = self.has_jump()
+        return saved_state, was_king
+
+    def undo_move(self, move, saved_state: tuple, must_jump: bool, was_king: bool):
+        (self.black, self.red, self.kings, self.turn, self.must_jump, self.turn_counter,
+         self.black_checkers, self.red_checkers, self.zobrist_hash) = saved_state
+
+    def __str__(self):
+        return str(self.to_board())
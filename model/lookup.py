@@ -0,0 +1,30 @@
+# Board geometry precomputed once, as plain (row, column) coordinates indexed by [row][column].
+# Directions are always listed in the order up-left, up-right, down-left, down-right.
+
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+PLAYABLE_SQUARES = [(row, col) for row in range(8) for col in range((row + 1) % 2, 8, 2)]
+
+
+def on_board(row: int, col: int) -> bool:
+    return 0 <= row <= 7 and 0 <= col <= 7
+
+
+def _diagonals(distance: int):
+    return [[[(row + row_offset * distance, col + col_offset * distance)
+              for row_offset, col_offset in DIRECTIONS
+              if on_board(row + row_offset * distance, col + col_offset * distance)]
+             for col in range(8)] for row in range(8)]
+
+
+# DIAGONALS[distance][row][col]: the tiles distance steps away on each diagonal
+DIAGONALS = {distance: _diagonals(distance) for distance in (1, 2)}
+
+# STEPS[row][col]: (row_offset, target_row, target_col) for every one-step move
+STEPS = [[[(row_offset, row + row_offset, col + col_offset)
+           for row_offset, col_offset in DIRECTIONS if on_board(row + row_offset, col + col_offset)]
+          for col in range(8)] for row in range(8)]
+
+# JUMPS[row][col]: (row_offset, over_row, over_col, landing_row, landing_col) for every jump
+JUMPS = [[[(row_offset, row + row_offset, col + col_offset, row + 2 * row_offset, col + 2 * col_offset)
+           for row_offset, col_offset in DIRECTIONS if on_board(row + 2 * row_offset, col + 2 * col_offset)]
+          for col in range(8)] for row in range(8)]
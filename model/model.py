@@ -1,13 +1,40 @@
+import json
 import os
 import logging
+import random
+import struct
 from enum import Enum
+from functools import lru_cache
 from typing import List, Optional
 
+from model.lookup import DIAGONALS, JUMPS, PLAYABLE_SQUARES
+
 
 class Tile:
-    def __init__(self, row: int, column: int):
-        self.column = column
-        self.row = row
+    # tiles are interned: Tile(row, column) always returns the same instance, so searching never allocates them
+    __slots__ = ("row", "column")
+    _interned = {}
+
+    def __new__(cls, row: int, column: int):
+        tile = Tile._interned.get((row, column))
+        if tile is None:
+            tile = object.__new__(cls)
+            tile.row = row
+            tile.column = column
+            Tile._interned[(row, column)] = tile
+        return tile
+
+    def __reduce__(self):
+        return Tile, (self.row, self.column)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __hash__(self):
+        return self.row * 8 + self.column
 
     def __add__(self, other):
         row = self.row + other.row
@@ -18,7 +45,7 @@ class Tile:
         return Tile((self.row + other.row) // 2, (self.column + other.column) // 2)
 
     def __eq__(self, other):
-        return self.row == other.row and self.column == other.column
+        return self is other or (self.row == other.row and self.column == other.column)
 
     def __str__(self):
         return "(" + str(self.row) + ", " + str(self.column) + ")"
@@ -31,11 +58,7 @@ class Tile:
         return (0 <= tile.row <= 7) and (0 <= tile.column <= 7)
 
     def get_valid_diagonal_tiles(self, distance: int):
-        diagonal_tiles = [Tile(-distance, -distance),
-                          Tile(-distance, distance),
-                          Tile(distance, -distance),
-                          Tile(distance, distance)]
-        return filter(Tile.is_valid_tile, [self + tile for tile in diagonal_tiles])
+        return DIAGONAL_TILES[distance][self.row][self.column]
 
     def distance_from(self, other):
         row_dif = abs(other.row - self.row)
@@ -48,6 +71,12 @@ class Tile:
         return self.row == 0 or self.row == 7
 
 
+DIAGONAL_TILES = {distance: [[tuple(Tile(row, col) for row, col in tiles) for tiles in diagonal_row]
+                             for diagonal_row in diagonals]
+                  for distance, diagonals in DIAGONALS.items()}
+PLAYABLE_TILES = [Tile(row, col) for row, col in PLAYABLE_SQUARES]
+
+
 class Color(Enum):
     RED = 1
     BLACK = -1
@@ -79,6 +108,84 @@ class Piece:
         self.is_king = False
 
 
+def piece_kind(piece: Piece) -> int:
+    return (0 if piece.color == Color.BLACK else 1) + (2 if piece.is_king else 0)
+
+
+def copy_piece(piece: Piece) -> Piece:
+    copied = Piece(piece.color)
+    copied.is_king = piece.is_king
+    return copied
+
+
+_zobrist_random = random.Random(0x5EED)
+# one 64-bit key per (piece kind, row, column), indexed as ZOBRIST_PIECE_KEYS[piece_kind(piece)][row][col]
+ZOBRIST_PIECE_KEYS = [[[_zobrist_random.getrandbits(64) for col in range(8)] for row in range(8)] for kind in range(4)]
+ZOBRIST_RED_TURN_KEY = _zobrist_random.getrandbits(64)
+# get_value changes formula once turn_counter passes endgame_turn, so that is part of the position too
+ZOBRIST_LATE_GAME_KEY = _zobrist_random.getrandbits(64)
+# piece-square values are kept as fixed-point integers so running sums are exact whatever the move order
+VALUE_SCALE = 1 << 32
+# how many weight sets each cache of tables built from them keeps, as a tuner tries thousands of them
+WEIGHT_CACHE_SIZE = 16
+
+# snapshot layout: one kind code per playable tile (0 empty, piece_kind + 1 otherwise), then turn,
+# must_jump, turn_counter and the two checker counts (-1 standing for None)
+SNAPSHOT_FORMAT = struct.Struct("<32sBBHbb")
+
+# the evaluation parameters, in Board.get_weights order; a weights file is a JSON object of them
+WEIGHT_NAMES = ("row_multiplier", "end_row_multiplier", "end_col_multiplier", "king_value", "endgame_pieces",
+                "endgame_turn")
+
+# position key layout: the snapshot's kind codes packed 3 bits per playable tile, in PLAYABLE_SQUARES
+# order, then a bit for red to move, one for must_jump and one for turn_counter past endgame_turn
+KEY_SHIFTS = [[3 * PLAYABLE_SQUARES.index((row, col)) if (row, col) in PLAYABLE_SQUARES else 0 for col in range(8)]
+              for row in range(8)]
+KEY_RED_TURN_BIT = 1 << 96
+KEY_MUST_JUMP_BIT = 1 << 97
+KEY_LATE_GAME_BIT = 1 << 98
+
+
+@lru_cache(maxsize=WEIGHT_CACHE_SIZE)
+def value_tables(row_multiplier: float, end_row_multiplier: float, end_col_multiplier: float,
+                 king_value: float) -> tuple:
+    # Board's opening and endgame tables, [kind][row][col], for the weights get_value uses
+    opening_values = []
+    endgame_values = []
+    for kind in range(4):
+        color = Color.BLACK if kind % 2 == 0 else Color.RED
+        is_king = kind >= 2
+        opening_rows = []
+        endgame_rows = []
+        for row in range(8):
+            opening_row = []
+            endgame_row = []
+            for col in range(8):
+                piece_value = color.value
+                if color == Color.RED:
+                    piece_value *= pow(row_multiplier, row)
+                else:
+                    piece_value *= pow(row_multiplier, 7 - row)
+                if is_king:
+                    piece_value *= king_value
+                opening_row.append(round(piece_value * VALUE_SCALE))
+                piece_value = color.value
+                if is_king:
+                    piece_value *= king_value
+                if color == Color.BLACK:
+                    piece_value *= pow(end_row_multiplier, 4 - abs(4 - row))
+                    piece_value *= pow(end_col_multiplier, 4 - abs(4 - col))
+                else:
+                    piece_value *= pow(end_row_multiplier, 4 - abs(3 - row))
+                    piece_value *= pow(end_col_multiplier, 4 - abs(3 - col))
+                endgame_row.append(round(piece_value * VALUE_SCALE))
+            opening_rows.append(tuple(opening_row))
+            endgame_rows.append(tuple(endgame_row))
+        opening_values.append(tuple(opening_rows))
+        endgame_values.append(tuple(endgame_rows))
+    return tuple(opening_values), tuple(endgame_values)
+
+
 class Board:
     def __init__(self, empty=False):
         self.red_checkers = None
@@ -87,13 +194,154 @@ class Board:
         self.end_row_multiplier = 1.1
         self.end_col_multiplier = 1.15
         self.king_value = 2
+        # get_value switches to the endgame formula when a side has fewer pieces or after this many turns
+        self.endgame_pieces = 4
+        self.endgame_turn = 50
         self.tiles = self.initialize_tiles(empty)
         self.turn = Color.BLACK
         self.target_tile = None
         self.must_jump = None
-        self.emptied_tiles = []
         self.end_tile = None
         self.turn_counter = 0
+        self.tile_kinds = None
+        self.red_jumpers = None
+        self.black_jumpers = None
+        self.zobrist_hash = 0
+        self.piece_codes = 0
+        self.opening_values = None
+        self.endgame_values = None
+        self.opening_score = 0
+        self.endgame_score = 0
+        self.reset_incremental_state()
+
+    def reset_incremental_state(self):
+        # rebuilds everything set_piece_at keeps up to date, for boards edited behind its back
+        self.build_value_tables()
+        self.tile_kinds = [[None for i in range(8)] for i in range(8)]
+        # the tiles whose piece could capture right now, per color
+        self.red_jumpers = set()
+        self.black_jumpers = set()
+        self.zobrist_hash = ZOBRIST_RED_TURN_KEY if self.turn == Color.RED else 0
+        if self.is_late_game():
+            self.zobrist_hash ^= ZOBRIST_LATE_GAME_KEY
+        self.piece_codes = 0
+        self.opening_score = 0
+        self.endgame_score = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.tiles[row][col]
+                if piece is not None:
+                    self.place_kind(row, col, piece_kind(piece))
+        for tile in PLAYABLE_TILES:
+            self.update_jumper(tile)
+
+    def place_kind(self, row: int, col: int, kind: Optional[int]):
+        old_kind = self.tile_kinds[row][col]
+        if old_kind is not None:
+            self.zobrist_hash ^= ZOBRIST_PIECE_KEYS[old_kind][row][col]
+            self.opening_score -= self.opening_values[old_kind][row][col]
+            self.endgame_score -= self.endgame_values[old_kind][row][col]
+        if kind is not None:
+            self.zobrist_hash ^= ZOBRIST_PIECE_KEYS[kind][row][col]
+            self.opening_score += self.opening_values[kind][row][col]
+            self.endgame_score += self.endgame_values[kind][row][col]
+        shift = KEY_SHIFTS[row][col]
+        self.piece_codes = self.piece_codes & ~(7 << shift) | (0 if kind is None else kind + 1) << shift
+        self.tile_kinds[row][col] = kind
+
+    def get_weights(self) -> tuple:
+        return tuple(getattr(self, name) for name in WEIGHT_NAMES)
+
+    def set_weights(self, weights: tuple):
+        self.assign_weights(weights)
+        self.reset_incremental_state()
+
+    def assign_weights(self, weights: tuple):
+        # weights in WEIGHT_NAMES order; a shorter tuple leaves the parameters after it as they are
+        for name, value in zip(WEIGHT_NAMES, weights):
+            setattr(self, name, value)
+
+    def load_weights(self, path: str):
+        self.set_weights(read_weights(path))
+
+    def build_value_tables(self):
+        # what each piece kind contributes to get_value on each tile, for both formulas
+        self.opening_values, self.endgame_values = value_tables(self.row_multiplier, self.end_row_multiplier,
+                                                                self.end_col_multiplier, self.king_value)
+
+    def snapshot(self) -> bytes:
+        codes = bytes(0 if self.tiles[row][col] is None else piece_kind(self.tiles[row][col]) + 1
+                      for row, col in PLAYABLE_SQUARES)
+        return SNAPSHOT_FORMAT.pack(codes, self.turn == Color.RED, bool(self.must_jump), self.turn_counter,
+                                    -1 if self.black_checkers is None else self.black_checkers,
+                                    -1 if self.red_checkers is None else self.red_checkers)
+
+    @staticmethod
+    def from_snapshot(snapshot: bytes, weights: Optional[tuple] = None) -> "Board":
+        codes, red_turn, must_jump, turn_counter, black_checkers, red_checkers = SNAPSHOT_FORMAT.unpack(snapshot)
+        board = Board(True)
+        if weights is not None:
+            board.assign_weights(weights)
+        for (row, col), code in zip(PLAYABLE_SQUARES, codes):
+            if code:
+                piece = Piece(Color.BLACK if (code - 1) % 2 == 0 else Color.RED)
+                if code > 2:
+                    piece.king()
+                board.tiles[row][col] = piece
+        board.turn = Color.RED if red_turn else Color.BLACK
+        board.must_jump = bool(must_jump)
+        board.turn_counter = turn_counter
+        board.black_checkers = None if black_checkers < 0 else black_checkers
+        board.red_checkers = None if red_checkers < 0 else red_checkers
+        board.reset_incremental_state()
+        return board
+
+    def to_key(self) -> int:
+        # the position as one integer, kept up to date by set_piece_at; two boards with the same key are equal
+        key = self.piece_codes
+        if self.turn == Color.RED:
+            key |= KEY_RED_TURN_BIT
+        if self.must_jump:
+            key |= KEY_MUST_JUMP_BIT
+        if self.is_late_game():
+            key |= KEY_LATE_GAME_BIT
+        return key
+
+    @staticmethod
+    def from_key(key: int, weights: Optional[tuple] = None) -> "Board":
+        board = Board(True)
+        if weights is not None:
+            board.assign_weights(weights)
+        board.red_checkers = 0
+        board.black_checkers = 0
+        for row, col in PLAYABLE_SQUARES:
+            code = key >> KEY_SHIFTS[row][col] & 7
+            if code:
+                piece = Piece(Color.BLACK if (code - 1) % 2 == 0 else Color.RED)
+                if code > 2:
+                    piece.king()
+                board.tiles[row][col] = piece
+                if piece.color == Color.RED:
+                    board.red_checkers += 1
+                else:
+                    board.black_checkers += 1
+        board.turn = Color.RED if key & KEY_RED_TURN_BIT else Color.BLACK
+        board.must_jump = bool(key & KEY_MUST_JUMP_BIT)
+        if key & KEY_LATE_GAME_BIT:
+            # only which side of endgame_turn the count is on is kept
+            board.turn_counter = board.endgame_turn + 1
+        board.reset_incremental_state()
+        return board
+
+    def copy(self) -> "Board":
+        # a board with its own pieces and incremental state; the value tables are immutable and shared
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.tiles = [[None if piece is None else copy_piece(piece) for piece in row] for row in self.tiles]
+        board.tile_kinds = [list(row) for row in self.tile_kinds]
+        board.red_jumpers = set(self.red_jumpers)
+        board.black_jumpers = set(self.black_jumpers)
+        return board
 
     def initialize_tiles(self, empty) -> List[List[Optional[Piece]]]:
         tiles = [[None for i in range(8)] for i in range(8)]
@@ -113,35 +361,28 @@ class Board:
                     tiles[row][col] = Piece(Color.BLACK)
 
     def get_value(self) -> float:
-        value = 0.0
         if self.black_checkers == 0:
             return 99999
         if self.red_checkers == 0:
             return -99999
-        for row in range(8):
-            for col in range(8):
-                piece = self.tiles[row][col]
-                if piece is not None:
-                    piece_value = piece.color.value
-                    if self.black_checkers is not None and self.red_checkers is not None and \
-                            ((self.black_checkers < 4 or self.red_checkers < 4) or self.turn_counter > 50):
-                        if piece.is_king:
-                            piece_value *= self.king_value
-                        if piece.color == Color.BLACK:
-                            piece_value *= pow(self.end_row_multiplier, 4 - abs(4 - row))
-                            piece_value *= pow(self.end_col_multiplier, 4 - abs(4 - col))
-                        else:
-                            piece_value *= pow(self.end_row_multiplier, 4 - abs(3 - row))
-                            piece_value *= pow(self.end_col_multiplier, 4 - abs(3 - col))
-                    else:
-                        if piece.color == Color.RED:
-                            piece_value *= pow(self.row_multiplier, row)
-                        else:
-                            piece_value *= pow(self.row_multiplier, 7-row)
-                        if piece.is_king:
-                            piece_value *= self.king_value
-                    value += piece_value
-        return value
+        if self.is_endgame():
+            return self.endgame_score / VALUE_SCALE
+        return self.opening_score / VALUE_SCALE
+
+    def is_endgame(self) -> bool:
+        return self.black_checkers is not None and self.red_checkers is not None and \
+            ((self.black_checkers < self.endgame_pieces or self.red_checkers < self.endgame_pieces) or
+             self.is_late_game())
+
+    def is_late_game(self) -> bool:
+        return self.turn_counter > self.endgame_turn
+
+    def count_turn(self, turns: int):
+        # moves turn_counter on (or back) with the hash, which changes as it crosses endgame_turn
+        was_late_game = self.is_late_game()
+        self.turn_counter += turns
+        if self.is_late_game() != was_late_game:
+            self.zobrist_hash ^= ZOBRIST_LATE_GAME_KEY
 
     def move_piece(self, start: Tile, end: Tile) -> (MoveType, Optional[Piece]):
         move_type = self.classify_move(start, end)
@@ -169,17 +410,43 @@ class Board:
     def next_turn(self, end: Tile):
         self.target_tile = None
         self.switch_turn_color()
-        self.must_jump = self.has_jump(end)
-        self.turn_counter += 1
+        self.must_jump = self.has_jump()
+        self.count_turn(1)
 
     def set_piece_at(self, tile: Tile, piece: Optional[Piece]):
         self.tiles[tile.row][tile.column] = piece
-        if piece is None:
-            self.emptied_tiles.append(tile)
+        self.place_kind(tile.row, tile.column, None if piece is None else piece_kind(piece))
+        self.update_jumpers_around(tile)
+
+    def update_jumpers_around(self, tile: Tile):
+        # a change on tile can only affect captures by the piece on it, by a piece jumping over it
+        # (distance 1) or by a piece landing on it (distance 2)
+        self.update_jumper(tile)
+        for neighbor in DIAGONAL_TILES[1][tile.row][tile.column]:
+            self.update_jumper(neighbor)
+        for neighbor in DIAGONAL_TILES[2][tile.row][tile.column]:
+            self.update_jumper(neighbor)
+
+    def update_jumper(self, tile: Tile):
+        piece = self.tiles[tile.row][tile.column]
+        if piece is not None and self.piece_can_jump(tile, piece):
+            if piece.color == Color.RED:
+                self.red_jumpers.add(tile)
+                self.black_jumpers.discard(tile)
+            else:
+                self.black_jumpers.add(tile)
+                self.red_jumpers.discard(tile)
+        else:
+            self.red_jumpers.discard(tile)
+            self.black_jumpers.discard(tile)
 
     def get_piece_at(self, tile):
         return self.tiles[tile.row][tile.column]
 
+    def is_king_at(self, tile: Tile) -> bool:
+        piece = self.tiles[tile.row][tile.column]
+        return piece is not None and piece.is_king
+
     def classify_move(self, start: Tile, end: Tile, piece_at_start=None) -> MoveType:
         if self.target_tile is not None and self.target_tile != start:
             return MoveType.INVALID
@@ -207,36 +474,40 @@ class Board:
                 move_type = MoveType.NORMAL
         if end.row - start.row == 2 * direction:
             if end.column - start.column == 2:
-                jumped_piece = self.get_piece_at(Tile(start.row + 1 * direction, start.column + 1))
+                jumped_piece = self.tiles[start.row + 1 * direction][start.column + 1]
                 if jumped_piece is not None and jumped_piece.color != piece_at_start.color:
                     move_type = MoveType.JUMP
             elif end.column - start.column == -2:
-                jumped_piece = self.get_piece_at(Tile(start.row + 1 * direction, start.column - 1))
+                jumped_piece = self.tiles[start.row + 1 * direction][start.column - 1]
                 if jumped_piece is not None and jumped_piece.color != piece_at_start.color:
                     move_type = MoveType.JUMP
         return move_type
 
     def can_jump(self, tile: Tile) -> bool:
-        tiles_to_check = tile.get_valid_diagonal_tiles(2)
-        for end in tiles_to_check:
-            if end.is_valid():
-                move_type = self.classify_move(tile, end)
-                if move_type == MoveType.JUMP:
+        # same answer as classify_move returning JUMP for some landing tile, read straight off the jump table
+        if self.target_tile is not None and self.target_tile != tile:
+            return False
+        piece = self.tiles[tile.row][tile.column]
+        if piece is None or piece.color != self.turn:
+            return False
+        return self.piece_can_jump(tile, piece)
+
+    def piece_can_jump(self, tile: Tile, piece: Piece) -> bool:
+        color = piece.color
+        forward = color.value
+        for row_offset, over_row, over_col, landing_row, landing_col in JUMPS[tile.row][tile.column]:
+            if row_offset != forward and not piece.is_king:
+                continue
+            if self.tiles[landing_row][landing_col] is None:
+                jumped_piece = self.tiles[over_row][over_col]
+                if jumped_piece is not None and jumped_piece.color != color:
                     return True
         return False
 
-    def has_jump(self, end_tile: Tile):
-        emptied_made_jump = any([self.check_tiles_for_jump(tile, 2) for tile in self.emptied_tiles])
-        end_made_jump = self.check_tiles_for_jump(end_tile, 1)
-        self.emptied_tiles = []
-        return emptied_made_jump or end_made_jump
-
-    def check_tiles_for_jump(self, tile, distance):
-        tiles_to_check = tile.get_valid_diagonal_tiles(distance)
-        for tile in tiles_to_check:
-            if self.can_jump(tile):
-                return True
-        return False
+    def has_jump(self, color: Optional[Color] = None) -> bool:
+        if (self.turn if color is None else color) == Color.RED:
+            return bool(self.red_jumpers)
+        return bool(self.black_jumpers)
 
     def winner(self) -> Optional[Color]:
         if self.black_checkers == 0:
@@ -248,10 +519,14 @@ class Board:
 
     def check_for_promotion(self, end):
         if end.is_end_row():
-            self.get_piece_at(end).king()
+            piece = self.get_piece_at(end)
+            piece.king()
+            self.place_kind(end.row, end.column, piece_kind(piece))
+            self.update_jumper(end)
 
     def switch_turn_color(self):
         self.turn = Color(self.turn.value * -1)
+        self.zobrist_hash ^= ZOBRIST_RED_TURN_KEY
 
     def __str__(self):
         result = ""
@@ -267,8 +542,25 @@ class Board:
         return result
 
     def __eq__(self, other):
-        for row in range(8):
-            for col in range(8):
-                if self.tiles[row][col] != other.tiles[row][col]:
-                    return False
-        return True
+        return isinstance(other, Board) and self.to_key() == other.to_key()
+
+    def __hash__(self):
+        # boards used as dict or set keys must not be changed while they are in there
+        return hash(self.to_key())
+
+
+def read_weights(path: str) -> tuple:
+    # parameters missing from the file keep Board's defaults
+    with open(path) as file:
+        values = json.load(file)
+    unknown = set(values) - set(WEIGHT_NAMES)
+    if unknown:
+        raise ValueError("Unknown weights in {}: {}".format(path, ", ".join(sorted(unknown))))
+    defaults = Board(True).get_weights()
+    return tuple(values.get(name, default) for name, default in zip(WEIGHT_NAMES, defaults))
+
+
+def write_weights(path: str, weights: tuple):
+    with open(path, "w") as file:
+        json.dump(dict(zip(WEIGHT_NAMES, weights)), file, indent=4)
+        file.write("\n")
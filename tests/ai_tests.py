@@ -1,7 +1,10 @@
+import copy
 import unittest
 from concurrent.futures.process import ProcessPoolExecutor
 
-from ai.ai import Ai, Move
+import time
+
+from ai.ai import Ai, Move, evaluate_snapshot, tile_pairs, worker_ai
 from model.model import Board, Tile, Piece, Color
 
 
@@ -44,6 +47,28 @@ class MyTestCase(unittest.TestCase):
                                 Tile(4, 1)])],
                          moves)
 
+    def test_generate_moves_is_lazy(self):
+        moves = self.ai.generate_moves(self.b)
+        self.assertEqual(Move([Tile(5, 0), Tile(4, 1)]), next(moves))
+        self.assertEqual(self.ai.get_available_moves(self.b)[1:], list(moves))
+
+    def test_jump_circuit_takes_each_piece_once(self):
+        self.b = Board(True)
+        king = Piece(Color.RED)
+        king.king()
+        self.b.set_piece_at(Tile(4, 1), king)
+        for row, column in [(3, 2), (3, 4), (5, 4), (5, 2)]:
+            self.b.set_piece_at(Tile(row, column), Piece(Color.BLACK))
+        self.b.red_checkers = 1
+        self.b.black_checkers = 4
+        self.b.turn = Color.RED
+        self.b.reset_incremental_state()
+        self.b.must_jump = True
+        # the king comes back to its own square, and may not set off round the circuit again
+        self.assertEqual([Move([Tile(4, 1), Tile(2, 3), Tile(4, 5), Tile(6, 3), Tile(4, 1)]),
+                          Move([Tile(4, 1), Tile(6, 3), Tile(4, 5), Tile(2, 3), Tile(4, 1)])],
+                         self.ai.get_available_moves(self.b))
+
     def test_undo_normal_move(self):
         move = Move([Tile(5, 2), Tile(4, 3)])
         must_jump = self.b.must_jump
@@ -99,6 +124,150 @@ class MyTestCase(unittest.TestCase):
         jumped_pieces, _ = self.ai.do_move(self.ai.get_available_moves(self.b)[1], self.b)
         self.assertEqual(6, len(jumped_pieces))
 
+    def test_alpha_beta_matches_minimax(self):
+        for ply in range(12):
+            moves = self.ai.get_available_moves(self.b)
+            self.ai.do_move(moves[(ply * 5) % len(moves)], self.b)
+            minimax_board = copy.deepcopy(self.b)
+            pruned_board = copy.deepcopy(self.b)
+            minimax_ai = Ai(minimax_board, minimax_board.turn, 3)
+            pruned_ai = Ai(pruned_board, pruned_board.turn, 3, alpha_beta=True)
+            minimax_value, minimax_move = minimax_ai.evaluate_tree(None, minimax_board, 1, None)
+            pruned_value, pruned_move = pruned_ai.evaluate_tree(None, pruned_board, 1, None)
+            self.assertEqual(minimax_value, pruned_value)
+            self.assertEqual(minimax_move, pruned_move)
+
+    def test_undo_restores_turn_counter(self):
+        move = Move([Tile(5, 2), Tile(4, 3)])
+        must_jump = self.b.must_jump
+        jumped_pieces, was_king = self.ai.do_move(move, self.b)
+        self.ai.undo_move(move, jumped_pieces, must_jump, was_king, self.b)
+        self.assertEqual(0, self.b.turn_counter)
+
+    def test_timed_search_respects_budget(self):
+        self.b.turn = Color.RED
+        self.ai = Ai(self.b, Color.RED, alpha_beta=True, bitboard=True, time_limit=0.3)
+        start = time.time()
+        move = self.ai.get_best_move(None)
+        # a generous margin past the budget, so a loaded machine does not fail this
+        self.assertLess(time.time() - start, self.ai.time_limit + 10)
+        self.assertIsNone(self.ai.deadline)
+        self.assertIn(move, self.ai.get_available_moves(self.b))
+        self.assertGreaterEqual(self.ai.completed_depth, 2)
+        self.assertEqual(4, self.ai.depth)
+
+    def test_timed_search_restores_board(self):
+        before = str(self.b)
+        self.ai = Ai(self.b, Color.BLACK, alpha_beta=True, time_limit=0.05)
+        self.ai.get_best_move(None)
+        self.assertEqual(before, str(self.b))
+        self.assertEqual(Color.BLACK, self.b.turn)
+        self.assertEqual(0, self.b.turn_counter)
+
+    def test_timed_search_stops_when_tree_is_exhausted(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(6, 1), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(6, 3), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(5, 2), Piece(Color.RED))
+        self.b.black_checkers = 2
+        self.b.red_checkers = 1
+        self.b.must_jump = True
+        self.ai = Ai(self.b, Color.BLACK, time_limit=10)
+        self.assertEqual(Move([Tile(6, 1), Tile(4, 3)]), self.ai.get_best_move(None))
+        # stopping at depth 1 shows the search did not wait out the budget
+        self.assertEqual(1, self.ai.completed_depth)
+        self.assertFalse(self.ai.depth_limited)
+
+    def set_up_exchange(self):
+        # red must take on (3, 2), and black takes back from (5, 4), which (6, 5) covers
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(0, 1), Piece(Color.RED))
+        self.b.set_piece_at(Tile(2, 1), Piece(Color.RED))
+        self.b.set_piece_at(Tile(3, 2), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(5, 4), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(6, 5), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(7, 0), Piece(Color.BLACK))
+        self.b.red_checkers = 2
+        self.b.black_checkers = 4
+        self.b.turn = Color.RED
+        self.b.reset_incremental_state()
+        self.b.must_jump = True
+
+    def test_quiescence_resolves_captures(self):
+        self.set_up_exchange()
+        after_exchange = copy.deepcopy(self.b)
+        self.ai.do_move(Move([Tile(2, 1), Tile(4, 3)]), after_exchange)
+        self.ai.do_move(Move([Tile(5, 4), Tile(3, 2)]), after_exchange)
+        horizon_value, _ = Ai(self.b, Color.RED, 1).evaluate_tree(None, self.b, 1, None)
+        quiet_ai = Ai(self.b, Color.RED, 1, quiescence_depth=4, collect_stats=True)
+        quiet_ai.get_best_move(None)
+        quiet_value, _ = quiet_ai.evaluate_tree(None, self.b, 1, None)
+        self.assertEqual(after_exchange.get_value(), quiet_value)
+        self.assertGreater(horizon_value, quiet_value)
+        self.assertEqual(1, quiet_ai.last_stats.quiescence_nodes)
+
+    def test_quiescence_depth_caps_extension(self):
+        # red takes on (4, 5), black takes back on (2, 1), and red takes again on (3, 6): two captures
+        # past a depth of one
+        self.b = Board(True)
+        for row, column in ((2, 1), (2, 7), (3, 4)):
+            self.b.set_piece_at(Tile(row, column), Piece(Color.RED))
+        for row, column in ((2, 3), (3, 0), (3, 6), (4, 5)):
+            self.b.set_piece_at(Tile(row, column), Piece(Color.BLACK))
+        self.b.red_checkers = 3
+        self.b.black_checkers = 4
+        self.b.turn = Color.RED
+        self.b.reset_incremental_state()
+        self.b.must_jump = True
+        exchange = [copy.deepcopy(self.b)]
+        for move in (Move([Tile(3, 4), Tile(5, 6)]), Move([Tile(3, 0), Tile(1, 2)]),
+                     Move([Tile(2, 7), Tile(4, 5)])):
+            exchange.append(copy.deepcopy(exchange[-1]))
+            self.ai.do_move(move, exchange[-1])
+        values, quiescence_nodes = [], []
+        for quiescence_depth in (1, 8):
+            ai = Ai(self.b, Color.RED, 1, quiescence_depth=quiescence_depth, collect_stats=True)
+            ai.get_best_move(None)
+            quiescence_nodes.append(ai.last_stats.quiescence_nodes)
+            values.append(ai.evaluate_tree(None, self.b, 1, None)[0])
+        self.assertEqual([exchange[2].get_value(), exchange[3].get_value()], values)
+        self.assertNotEqual(values[0], values[1])
+        # one capture searched past the depth with the cap at one, and the exchange ends after two
+        self.assertEqual([1, 2], quiescence_nodes)
+
+    def test_evaluate_snapshot_matches_evaluate_move(self):
+        move = Move([Tile(5, 2), Tile(4, 3)])
+        self.ai = Ai(self.b, Color.BLACK, 3, alpha_beta=True)
+        expected, _ = self.ai.evaluate_move((move, self.b, 1, None, 7, float("-inf"), float("inf")))
+        value, depth_limited, _ = evaluate_snapshot((self.ai.worker_settings(), self.b.snapshot(),
+                                                     tile_pairs(move), 1, 7))
+        self.assertEqual(expected, value)
+        self.assertTrue(depth_limited)
+
+    def test_depth_limited_search_is_flagged(self):
+        for bitboard in (False, True):
+            ai = Ai(Board(), Color.RED, 2, alpha_beta=True, bitboard=bitboard)
+            ai.get_best_move(None)
+            self.assertTrue(ai.depth_limited)
+
+    def test_worker_table_ages_between_searches(self):
+        ai = Ai(self.b, Color.BLACK, 2, alpha_beta=True)
+        ai.get_best_move(None)
+        table = worker_ai(ai.worker_settings()).transposition_table
+        generation = table.generation
+        # more tasks of the same search leave the generation alone, and the next search moves it on
+        worker_ai(ai.worker_settings())
+        self.assertEqual(generation, table.generation)
+        ai.get_best_move(None)
+        self.assertIs(table, worker_ai(ai.worker_settings()).transposition_table)
+        self.assertEqual(generation + 1, table.generation)
+
+    def test_executor_search_matches_local_search(self):
+        with ProcessPoolExecutor(2) as executor:
+            parallel_move = Ai(Board(), Color.BLACK, 3, alpha_beta=True, bitboard=True).get_best_move(executor)
+        local_move = Ai(Board(), Color.BLACK, 3, alpha_beta=True, bitboard=True).get_best_move(None)
+        self.assertEqual(local_move, parallel_move)
+
 
 if __name__ == '__main__':
     unittest.main()
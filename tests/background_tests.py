@@ -0,0 +1,104 @@
+import time
+import unittest
+
+from ai.ai import Ai
+from ai.background import BackgroundSearch, StopFlag
+from model.model import Board, Color, Piece, Tile
+
+
+def wait_for_move(search: BackgroundSearch, timeout: float = 30):
+    start = time.time()
+    while time.time() - start < timeout:
+        move = search.poll()
+        if move is not None:
+            return move
+        time.sleep(0.01)
+    raise AssertionError("background search did not finish")
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.b = Board()
+        self.ai = Ai(self.b, Color.BLACK, 3, alpha_beta=True)
+        self.search = BackgroundSearch(self.ai)
+
+    def tearDown(self) -> None:
+        self.search.shutdown()
+
+    def test_finds_same_move_as_blocking_search(self):
+        expected = Ai(Board(), Color.BLACK, 3, alpha_beta=True).get_best_move(None)
+        self.search.start(self.b)
+        self.assertEqual(expected, wait_for_move(self.search))
+        self.assertFalse(self.search.running())
+
+    def test_board_is_left_alone(self):
+        snapshot = self.b.snapshot()
+        self.search.start(self.b)
+        wait_for_move(self.search)
+        self.assertEqual(snapshot, self.b.snapshot())
+
+    def test_cancel_drops_the_result(self):
+        self.ai.set_depth(8)
+        self.search.start(self.b)
+        self.search.cancel()
+        self.assertFalse(self.search.running())
+        self.assertIsNone(self.search.poll())
+        # the cancelled search stops early, so a new one is answered quickly
+        self.ai.set_depth(2)
+        self.search.start(self.b)
+        self.assertIsNotNone(wait_for_move(self.search, 10))
+
+    def test_cancel_can_wait_for_the_search(self):
+        self.ai.set_depth(8)
+        self.search.start(self.b)
+        future = self.search.future
+        self.search.cancel(wait=True)
+        self.assertTrue(future.done())
+        self.assertIsNone(self.ai.stop_signal)
+
+    def test_no_move_is_final(self):
+        # black's only man is hemmed in by red men it cannot jump
+        board = Board(True)
+        board.set_piece_at(Tile(2, 1), Piece(Color.BLACK))
+        for tile in (Tile(1, 0), Tile(1, 2), Tile(0, 3)):
+            board.set_piece_at(tile, Piece(Color.RED))
+        board.black_checkers, board.red_checkers = 1, 3
+        board.turn = Color.BLACK
+        board.reset_incremental_state()
+        self.search.start(board)
+        start = time.time()
+        while self.search.running() and time.time() - start < 30:
+            self.assertIsNone(self.search.poll())
+            time.sleep(0.01)
+        self.assertIsNone(board.winner())
+        self.assertTrue(self.search.has_no_move(board))
+        self.assertFalse(self.search.has_no_move(self.b))
+
+    def test_stop_flag(self):
+        flag = StopFlag()
+        self.assertFalse(flag.stopped())
+        flag.set_stopped(True)
+        self.assertTrue(flag.stopped())
+
+    def test_ponder_hit_keeps_the_search(self):
+        # the board has the opponent to move, so the search ponders their likely reply
+        self.search.ponder(self.b)
+        self.assertTrue(self.search.pondering)
+        self.assertIsNone(self.search.poll())
+        guess = Ai(Board(), Color.BLACK, self.search.ponder_depth, alpha_beta=True).get_best_move(None)
+        Ai.do_move(guess, self.b)
+        self.assertTrue(self.search.resume(self.b))
+        self.assertIsNotNone(wait_for_move(self.search))
+
+    def test_ponder_miss_starts_over(self):
+        self.search.ponder(self.b)
+        guess = Ai(Board(), Color.BLACK, self.search.ponder_depth, alpha_beta=True).get_best_move(None)
+        other = next(move for move in Ai(self.b, Color.BLACK).get_available_moves(self.b) if move != guess)
+        Ai.do_move(other, self.b)
+        self.assertFalse(self.search.resume(self.b))
+        expected = Ai(self.b, Color.RED, 3, alpha_beta=True).get_best_move(None)
+        self.assertEqual(expected, wait_for_move(self.search))
+
+
+if __name__ == '__main__':
+    unittest.main()
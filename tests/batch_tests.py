@@ -0,0 +1,92 @@
+import random
+import unittest
+
+from ai.ai import Ai
+from model.batch import BatchEvaluator, codes_from_boards, codes_from_keys, codes_from_masks, evaluator_for
+from model.bitboard import BitBoard, square_value_tables
+from model.model import Board, Color, Piece, Tile, WEIGHT_CACHE_SIZE, value_tables
+
+
+def random_boards(count: int, seed: int):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = Board()
+        ai = Ai(board, Color.RED)
+        for _ in range(rng.randrange(0, 90)):
+            moves = ai.get_available_moves(board)
+            if not moves or board.winner() is not None:
+                break
+            Ai.do_move(rng.choice(moves), board)
+        boards.append(board)
+    return boards
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.boards = random_boards(60, 3)
+        self.evaluator = BatchEvaluator()
+
+    def test_matches_get_value(self):
+        values = self.evaluator.evaluate_boards(self.boards)
+        self.assertEqual([board.get_value() for board in self.boards], values.tolist())
+        # endgames by piece count or by move count were both in there
+        self.assertTrue(any(board.turn_counter > 50 for board in self.boards))
+        self.assertTrue(any(board.red_checkers < 4 and board.turn_counter <= 50 for board in self.boards))
+
+    def test_bitboards_encode_the_same(self):
+        bit_boards = [BitBoard.from_board(board) for board in self.boards]
+        self.assertTrue((codes_from_keys([board.to_key() for board in self.boards]) ==
+                         codes_from_masks([board.black for board in bit_boards], [board.red for board in bit_boards],
+                                          [board.kings for board in bit_boards])).all())
+        self.assertEqual([board.get_value() for board in bit_boards],
+                         self.evaluator.evaluate_boards(bit_boards).tolist())
+        self.assertTrue((codes_from_boards(self.boards) == codes_from_boards(bit_boards)).all())
+
+    def test_won_positions(self):
+        board = Board(True)
+        king = Piece(Color.BLACK)
+        king.king()
+        board.set_piece_at(Tile(3, 2), king)
+        board.black_checkers = 1
+        board.red_checkers = 0
+        board.reset_incremental_state()
+        self.assertEqual([-99999], self.evaluator.evaluate_boards([board]).tolist())
+
+    def test_weights(self):
+        weights = (1.1, 1.2, 1.0, 3)
+        for board in self.boards[:5]:
+            board.set_weights(weights)
+        self.assertEqual([board.get_value() for board in self.boards[:5]],
+                         BatchEvaluator(weights).evaluate_boards(self.boards[:5]).tolist())
+
+    def test_weight_caches_are_bounded(self):
+        # a tuner scores far more weight sets than the caches keep
+        for step in range(3 * WEIGHT_CACHE_SIZE):
+            weights = (1.05 + step / 1000, 1.1, 1.15, 2.0, 4, 50)
+            evaluator_for(weights)
+            board = Board(True)
+            board.set_weights(weights)
+            BitBoard(board)
+        for cache in (evaluator_for, square_value_tables, value_tables):
+            self.assertEqual(WEIGHT_CACHE_SIZE, cache.cache_info().currsize)
+        self.assertIs(evaluator_for(weights), evaluator_for(weights))
+
+    def test_search_with_batched_leaves(self):
+        for bitboard in (False, True):
+            for alpha_beta in (False, True):
+                results = []
+                for batch_evaluation in (False, True):
+                    board = self.boards[7].copy()
+                    ai = Ai(board, board.turn, 4, alpha_beta=alpha_beta, bitboard=bitboard, quiescence_depth=4,
+                            collect_stats=True)
+                    ai.set_batch_evaluation(batch_evaluation)
+                    ai.prepare_batch_evaluator(board.get_weights())
+                    value, move = ai.evaluate_tree(None, BitBoard.from_board(board) if bitboard else board, 1, None)
+                    results.append((value, str(move)))
+                self.assertEqual(results[0], results[1])
+                self.assertIsNotNone(ai.batch_evaluator)
+
+
+if __name__ == '__main__':
+    unittest.main()
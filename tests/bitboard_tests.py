@@ -0,0 +1,118 @@
+import unittest
+
+from ai.ai import Ai, Move
+from model.bitboard import BitBoard
+from model.model import Board, Tile, Piece, Color
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.b = Board()
+        self.ai = Ai(self.b, Color.RED, 6)
+
+    def test_round_trip(self):
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        bit_board = BitBoard.from_board(self.b)
+        board = bit_board.to_board()
+        self.assertEqual(str(self.b), str(board))
+        self.assertEqual(self.b.turn, board.turn)
+        self.assertEqual(self.b.zobrist_hash, bit_board.zobrist_hash)
+
+    def test_snapshot_matches_board(self):
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        bit_board = BitBoard.from_board(self.b)
+        self.assertEqual(self.b.snapshot(), bit_board.snapshot())
+        self.assertEqual(bit_board.zobrist_hash, BitBoard.from_snapshot(bit_board.snapshot()).zobrist_hash)
+
+    def test_hash_follows_endgame_turn(self):
+        self.b.turn_counter = self.b.endgame_turn
+        self.b.reset_incremental_state()
+        before = self.b.zobrist_hash
+        bit_board = BitBoard.from_board(self.b)
+        move = Move([Tile(5, 0), Tile(4, 1)])
+        jumped_pieces, was_king = Ai.do_move(move, self.b)
+        saved_state, _ = bit_board.do_move(move)
+        self.assertTrue(self.b.is_late_game())
+        self.assertEqual(self.b.zobrist_hash, bit_board.zobrist_hash)
+        self.assertEqual(self.b.zobrist_hash, BitBoard.from_board(self.b).zobrist_hash)
+        self.ai.undo_move(move, jumped_pieces, False, was_king, self.b)
+        self.ai.undo_move(move, saved_state, False, was_king, bit_board)
+        self.assertEqual([before] * 2, [self.b.zobrist_hash, bit_board.zobrist_hash])
+
+    def test_pieces_are_shared(self):
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        bit_board = BitBoard.from_board(self.b)
+        piece = bit_board.get_piece_at(Tile(4, 1))
+        self.assertIs(piece, bit_board.get_piece_at(Tile(5, 2)))
+        self.assertEqual((Color.BLACK, False), (piece.color, piece.is_king))
+        self.assertIsNone(bit_board.get_piece_at(Tile(5, 0)))
+        with self.assertRaises(TypeError):
+            piece.king()
+        for tile in (Tile(4, 1), Tile(5, 0), Tile(2, 1)):
+            self.assertEqual(self.b.is_king_at(tile), bit_board.is_king_at(tile))
+
+    def test_moves_match_board(self):
+        bit_board = BitBoard.from_board(self.b)
+        self.assertEqual(self.ai.get_available_moves(self.b), self.ai.get_available_moves(bit_board))
+
+    def test_value_matches_board(self):
+        for row in range(2):
+            for col in range(8):
+                self.b.set_piece_at(Tile(row, col), None)
+        self.b.set_piece_at(Tile(2, 1), None)
+        self.b.set_piece_at(Tile(2, 3), None)
+        self.b.red_checkers = 2
+        self.assertEqual(self.b.get_value(), BitBoard.from_board(self.b).get_value())
+
+    def test_forced_jump(self):
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.b.move_piece(Tile(2, 7), Tile(3, 6))
+        self.b.move_piece(Tile(6, 1), Tile(5, 0))
+        self.b.move_piece(Tile(1, 6), Tile(2, 7))
+        self.b.move_piece(Tile(4, 1), Tile(3, 2))
+        bit_board = BitBoard.from_board(self.b)
+        self.assertTrue(bit_board.must_jump)
+        self.assertEqual([Move([Tile(2, 1), Tile(4, 3), Tile(6, 1)]),
+                          Move([Tile(2, 3), Tile(4, 1)])],
+                         self.ai.get_available_moves(bit_board))
+
+    def test_sextuple_jump(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(3, 0), Piece(Color.RED))
+        for tile in [Tile(4, 1), Tile(4, 3), Tile(4, 5), Tile(6, 1), Tile(6, 3), Tile(6, 5)]:
+            self.b.set_piece_at(tile, Piece(Color.BLACK))
+        self.b.turn = Color.RED
+        bit_board = BitBoard.from_board(self.b)
+        moves = self.ai.get_available_moves(bit_board)
+        self.assertEqual("[(3, 0), (5, 2), (7, 4), (5, 6), (3, 4), (5, 2), (7, 0)]", str(moves[1]))
+        self.ai.do_move(moves[1], bit_board)
+        self.assertEqual(0, bit_board.black_checkers)
+        self.assertEqual(Color.RED, bit_board.winner())
+
+    def test_undo_restores_position(self):
+        bit_board = BitBoard.from_board(self.b)
+        before = (bit_board.black, bit_board.red, bit_board.kings, bit_board.turn, bit_board.zobrist_hash)
+        move = Move([Tile(5, 2), Tile(4, 3)])
+        must_jump = bit_board.must_jump
+        saved_state, was_king = self.ai.do_move(move, bit_board)
+        self.assertEqual(Color.RED, bit_board.turn)
+        self.ai.undo_move(move, saved_state, must_jump, was_king, bit_board)
+        self.assertEqual(before, (bit_board.black, bit_board.red, bit_board.kings, bit_board.turn,
+                                  bit_board.zobrist_hash))
+
+    def test_promotion_continues_jump_as_king(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(2, 1), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(1, 2), Piece(Color.RED))
+        self.b.set_piece_at(Tile(1, 4), Piece(Color.RED))
+        bit_board = BitBoard.from_board(self.b)
+        self.assertEqual([Move([Tile(2, 1), Tile(0, 3), Tile(2, 5)])], self.ai.get_available_moves(bit_board))
+
+    def test_search_matches_board(self):
+        board_ai = Ai(Board(), Color.BLACK, 3)
+        bit_board_ai = Ai(Board(), Color.BLACK, 3, bitboard=True)
+        self.assertEqual(board_ai.get_best_move(None), bit_board_ai.get_best_move(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
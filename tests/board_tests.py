@@ -122,6 +122,25 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(Tile(3, 4), Tile(1, 3) + Tile(2, 1))
         self.assertEqual(Tile(1, 1), Tile(4, 2) + Tile(-3, -1))
 
+    def test_tiles_are_interned(self):
+        self.assertIs(Tile(3, 4), Tile(1, 3) + Tile(2, 1))
+        self.assertIs(Tile(2, 2), Tile(1, 1).midpoint(Tile(3, 3)))
+        self.assertIs(Tile(3, 4), copy.deepcopy(Tile(3, 4)))
+        self.assertEqual({Tile(3, 4)}, {Tile(3, 4), Tile(3, 4)})
+
+    def test_valid_diagonal_tiles(self):
+        self.assertEqual([Tile(1, 1), Tile(1, 3), Tile(3, 1), Tile(3, 3)],
+                         list(Tile(2, 2).get_valid_diagonal_tiles(1)))
+        self.assertEqual([Tile(2, 2)], list(Tile(0, 0).get_valid_diagonal_tiles(2)))
+
+    def test_can_jump_only_forward_for_men(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(4, 3), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(5, 4), Piece(Color.RED))
+        self.assertFalse(self.b.can_jump(Tile(4, 3)))
+        self.b.get_piece_at(Tile(4, 3)).king()
+        self.assertTrue(self.b.can_jump(Tile(4, 3)))
+
     def test_double_jump(self):
         self.b.set_piece_at(Tile(4, 3), Piece(Color.RED))
         self.b.set_piece_at(Tile(1, 0), None)
@@ -196,6 +215,16 @@ class MyTestCase(unittest.TestCase):
         self.assertMoveType(MoveType.JUMP, self.b.move_piece(Tile(3, 2), Tile(5, 4)))
         self.assertTrue(self.b.must_jump)
 
+    def test_jumpers_follow_moves(self):
+        self.test_has_jump_after_normal_with_jump()
+        self.assertEqual({Tile(3, 2)}, self.b.red_jumpers)
+        self.assertEqual({Tile(4, 3)}, self.b.black_jumpers)
+        self.b.move_piece(Tile(3, 2), Tile(5, 4))
+        red_jumpers, black_jumpers = set(self.b.red_jumpers), set(self.b.black_jumpers)
+        self.b.reset_incremental_state()
+        self.assertEqual(self.b.red_jumpers, red_jumpers)
+        self.assertEqual(self.b.black_jumpers, black_jumpers)
+
     def test_cannot_move_piece_if_has_jump(self):
         self.test_has_jump_after_normal_with_jump()
         self.assertMoveType(MoveType.INVALID, self.b.move_piece(Tile(2, 7), Tile(3, 6)))
@@ -229,6 +258,152 @@ class MyTestCase(unittest.TestCase):
         self.b.move_piece(Tile(2, 1), Tile(3, 0))
         self.assertEqual(None, nb.get_piece_at(Tile(3, 0)))
         
+    def test_copy_shares_no_state(self):
+        nb = self.b.copy()
+        self.assertEqual(self.b, nb)
+        self.b.get_piece_at(Tile(2, 1)).king()
+        self.assertEqual(False, nb.get_piece_at(Tile(2, 1)).is_king)
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.assertIsNone(nb.get_piece_at(Tile(4, 1)))
+        self.assertEqual(Color.BLACK, nb.turn)
+        self.assertNotEqual(self.b, nb)
+        nb.move_piece(Tile(5, 0), Tile(4, 1))
+        self.assertEqual(self.b.zobrist_hash, nb.zobrist_hash)
+
+    def test_key_round_trip(self):
+        self.b.move_piece(Tile(5, 2), Tile(4, 3))
+        self.b.move_piece(Tile(2, 5), Tile(3, 4))
+        self.b.get_piece_at(Tile(7, 0)).king()
+        self.b.reset_incremental_state()
+        restored = Board.from_key(self.b.to_key(), self.b.get_weights())
+        self.assertEqual(self.b.to_key(), restored.to_key())
+        self.assertEqual(str(self.b), str(restored))
+        self.assertEqual(self.b.zobrist_hash, restored.zobrist_hash)
+        self.assertEqual(self.b.must_jump, restored.must_jump)
+        self.assertEqual(12, restored.red_checkers)
+
+    def test_boards_as_keys(self):
+        moved = Board()
+        moved.move_piece(Tile(5, 0), Tile(4, 1))
+        positions = {Board(): "start", moved: "moved"}
+        self.assertEqual("start", positions[self.b])
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.assertEqual("moved", positions[self.b])
+        # the side to move is part of the position
+        moved.switch_turn_color()
+        self.assertNotEqual(self.b, moved)
+
+    def test_zobrist_hash_follows_moves(self):
+        start_hash = self.b.zobrist_hash
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.assertNotEqual(start_hash, self.b.zobrist_hash)
+        moved_hash = self.b.zobrist_hash
+        self.b.reset_incremental_state()
+        self.assertEqual(moved_hash, self.b.zobrist_hash)
+
+    def test_zobrist_hash_includes_promotion(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(1, 0), Piece(Color.BLACK))
+        self.b.move_piece(Tile(1, 0), Tile(0, 1))
+        promoted_hash = self.b.zobrist_hash
+        self.b.reset_incremental_state()
+        self.assertEqual(promoted_hash, self.b.zobrist_hash)
+
+    def test_zobrist_hash_same_for_transposed_moves(self):
+        other = Board()
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.b.move_piece(Tile(2, 1), Tile(3, 2))
+        self.b.move_piece(Tile(5, 6), Tile(4, 7))
+        other.move_piece(Tile(5, 6), Tile(4, 7))
+        other.move_piece(Tile(2, 1), Tile(3, 2))
+        other.move_piece(Tile(5, 0), Tile(4, 1))
+        self.assertEqual(self.b.zobrist_hash, other.zobrist_hash)
+
+    def test_position_includes_passing_endgame_turn(self):
+        # the same pieces score by the other formula past endgame_turn, so they must not share a table entry
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        late = self.b.copy()
+        late.turn_counter = self.b.endgame_turn + 2
+        late.reset_incremental_state()
+        self.assertNotEqual(self.b.get_value(), late.get_value())
+        self.assertNotEqual(self.b.zobrist_hash, late.zobrist_hash)
+        self.assertNotEqual(self.b.to_key(), late.to_key())
+        self.assertEqual(late.zobrist_hash, Board.from_key(late.to_key()).zobrist_hash)
+        # the counter's exact value does not matter on either side
+        later = late.copy()
+        later.turn_counter += 2
+        later.reset_incremental_state()
+        self.assertEqual(late.zobrist_hash, later.zobrist_hash)
+
+    def test_zobrist_hash_follows_endgame_turn(self):
+        self.b.turn_counter = self.b.endgame_turn
+        self.b.reset_incremental_state()
+        before = self.b.zobrist_hash
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        moved_hash = self.b.zobrist_hash
+        self.b.reset_incremental_state()
+        self.assertEqual(moved_hash, self.b.zobrist_hash)
+        self.b.count_turn(-1)
+        self.assertFalse(self.b.is_late_game())
+        self.b.set_piece_at(Tile(4, 1), None)
+        self.b.set_piece_at(Tile(5, 0), Piece(Color.BLACK))
+        self.b.switch_turn_color()
+        self.assertEqual(before, self.b.zobrist_hash)
+
+    def test_value_is_kept_up_to_date(self):
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.b.move_piece(Tile(2, 1), Tile(3, 2))
+        self.b.move_piece(Tile(4, 1), Tile(2, 3))
+        value = self.b.get_value()
+        self.b.reset_incremental_state()
+        self.assertEqual(value, self.b.get_value())
+
+    def test_opening_value(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(4, 1), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(2, 1), Piece(Color.RED))
+        self.b.black_checkers = 4
+        self.b.red_checkers = 4
+        self.assertAlmostEqual(-pow(1.05, 3) + pow(1.05, 2), self.b.get_value())
+
+    def test_value_switches_to_endgame(self):
+        self.b = Board(True)
+        self.b.set_piece_at(Tile(4, 1), Piece(Color.BLACK))
+        self.b.set_piece_at(Tile(2, 1), Piece(Color.RED))
+        self.b.black_checkers = 4
+        self.b.red_checkers = 4
+        self.b.turn_counter = 51
+        endgame_value = -pow(1.1, 4) * pow(1.15, 1) + pow(1.1, 3) * pow(1.15, 2)
+        self.assertAlmostEqual(endgame_value, self.b.get_value())
+        self.b.turn_counter = 0
+        self.b.red_checkers = 3
+        self.assertAlmostEqual(endgame_value, self.b.get_value())
+
+    def test_promotion_updates_value(self):
+        self.b = Board(True)
+        self.b.black_checkers = 4
+        self.b.red_checkers = 4
+        self.b.set_piece_at(Tile(1, 0), Piece(Color.BLACK))
+        self.b.move_piece(Tile(1, 0), Tile(0, 1))
+        self.assertAlmostEqual(-pow(1.05, 7) * 2, self.b.get_value())
+
+    def test_snapshot_round_trip(self):
+        self.b.move_piece(Tile(5, 0), Tile(4, 1))
+        self.b.get_piece_at(Tile(4, 1)).king()
+        self.b.reset_incremental_state()
+        snapshot = self.b.snapshot()
+        self.assertEqual(38, len(snapshot))
+        nb = Board.from_snapshot(snapshot)
+        self.assertEqual(str(self.b), str(nb))
+        self.assertEqual(Color.RED, nb.turn)
+        self.assertEqual(1, nb.turn_counter)
+        self.assertEqual(snapshot, nb.snapshot())
+
+    def test_snapshot_keeps_weights(self):
+        weights = (1.1, 1.2, 1.3, 3, 5, 60)
+        nb = Board.from_snapshot(self.b.snapshot(), weights)
+        self.assertEqual(weights, nb.get_weights())
+
     def assertMoveType(self, expected: MoveType, actual: (MoveType, Piece)):
         actual_move, _ = actual
         self.assertEqual(expected, actual_move)
@@ -0,0 +1,87 @@
+import os
+import random
+import tempfile
+import unittest
+
+from ai.ai import Ai, Move
+from ai.book import BookBuilder, OpeningBook, BOOK_HEADER
+from ai.notation import moves_from_text
+from model.model import Board, Color, Tile
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.book")
+        self.builder = BookBuilder(max_ply=4)
+        self.builder.add_games_text([
+            "22-18 11-15 18x11 8x15 black",
+            "22-18 11-15 18x11 8x15 red",
+            "# a comment",
+            "22-18 10-14 24-19 draw",
+            "21-17 9-13 black",
+        ])
+        self.builder.write(self.path)
+        self.book = OpeningBook(self.path)
+
+    def tearDown(self) -> None:
+        self.book.close()
+        self.directory.cleanup()
+
+    def test_probe_returns_weighted_moves(self):
+        entries = dict((str(move), weight) for move, weight in self.book.probe(Board().zobrist_hash))
+        # 22-18 won once, lost once and drew once; 21-17 won once
+        self.assertEqual({"[(5, 2), (4, 3)]": 3, "[(5, 0), (4, 1)]": 2}, entries)
+
+    def test_probe_misses_unknown_position(self):
+        board = Board()
+        Ai.do_move(Move([Tile(5, 6), Tile(4, 7)]), board)
+        self.assertEqual([], self.book.probe(board.zobrist_hash))
+
+    def test_book_keeps_only_max_ply(self):
+        board = Board()
+        for move in moves_from_text("22-18 11-15 18x11 8x15"):
+            Ai.do_move(move, board)
+        self.assertEqual([], self.book.probe(board.zobrist_hash))
+        self.assertEqual(len(self.builder.weights), len(self.book))
+        self.assertEqual(BOOK_HEADER.size + len(self.book) * 20, os.path.getsize(self.path))
+
+    def test_choose_heaviest_without_randomness(self):
+        board = Board()
+        ai = Ai(board, Color.BLACK)
+        move = self.book.choose(board.zobrist_hash, ai.get_available_moves(board))
+        self.assertEqual(Move([Tile(5, 2), Tile(4, 3)]), move)
+
+    def test_choose_randomly(self):
+        board = Board()
+        legal_moves = Ai(board, Color.BLACK).get_available_moves(board)
+        rng = random.Random(3)
+        chosen = {str(self.book.choose(board.zobrist_hash, legal_moves, 1.0, rng)) for _ in range(50)}
+        self.assertEqual({"[(5, 2), (4, 3)]", "[(5, 0), (4, 1)]"}, chosen)
+
+    def test_losing_moves_are_not_played(self):
+        board = Board()
+        Ai.do_move(Move([Tile(5, 0), Tile(4, 1)]), board)
+        legal_moves = Ai(board, Color.RED).get_available_moves(board)
+        self.assertIsNone(self.book.choose(board.zobrist_hash, legal_moves))
+
+    def test_ai_answers_from_book(self):
+        board = Board()
+        ai = Ai(board, Color.BLACK, 6, collect_stats=True)
+        ai.set_opening_book(self.book, 4)
+        self.assertEqual(Move([Tile(5, 2), Tile(4, 3)]), ai.get_best_move(None))
+        self.assertEqual(0, ai.last_stats.nodes)
+        ai.set_opening_book(self.book, 0)
+        ai.set_depth(1)
+        ai.get_best_move(None)
+        self.assertGreater(ai.last_stats.nodes, 0)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a book at all")
+        with self.assertRaises(ValueError):
+            OpeningBook(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from ai.ai import Ai
+from ai.engine import Engine
+from ai.notation import move_from_text
+from model.model import Board
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.out = io.StringIO()
+        self.engine = Engine(self.out)
+
+    def tearDown(self) -> None:
+        self.engine.close()
+
+    def send(self, *lines: str) -> list:
+        for line in lines:
+            self.assertTrue(self.engine.handle(line))
+        self.engine.wait_for_search()
+        return self.out.getvalue().splitlines()
+
+    def test_search_reports_every_depth(self):
+        lines = self.send("position startpos moves 22-18", "go depth 3")
+        self.assertEqual(["info depth 1", "info depth 2", "info depth 3"],
+                         [" ".join(line.split()[:3]) for line in lines[:-1]])
+        board = Board()
+        Ai.do_move(move_from_text("22-18"), board)
+        self.assertIn(move_from_text(lines[-1].split()[1]), Ai(board, board.turn).get_available_moves(board))
+
+    def test_single_move_is_answered_at_once(self):
+        # the capture is forced
+        self.assertEqual(["bestmove 18x11"], self.send("position startpos moves 22-18 11-15", "go depth 3"))
+
+    def test_position_from_key(self):
+        board = Board()
+        Ai.do_move(move_from_text("22-18"), board)
+        lines = self.send("position {:x}".format(board.to_key()), "go depth 2")
+        move = move_from_text(lines[-1].split()[1])
+        self.assertIn(move, Ai(board, board.turn).get_available_moves(board))
+        self.assertEqual(board.to_key(), self.engine.board.to_key())
+
+    def test_errors(self):
+        lines = self.send("position startpos moves 1-2", "fly", "setoption depth deep", "setoption speed 3",
+                          "go speed 3")
+        self.assertEqual(5, len(lines))
+        self.assertTrue(all(line.startswith("error ") for line in lines))
+
+    def test_stop_answers_with_the_deepest_finished_move(self):
+        self.send("position startpos")
+        self.engine.handle("go time 60")
+        started = time.time()
+        time.sleep(0.2)
+        self.send("isready", "stop")
+        self.assertLess(time.time() - started, 5)
+        lines = self.out.getvalue().splitlines()
+        self.assertIn("readyok", lines)
+        self.assertTrue(lines[-1].startswith("bestmove "))
+        self.assertNotEqual("bestmove none", lines[-1])
+
+    def test_table_stays_warm(self):
+        self.send("setoption depth 5", "position startpos", "go")
+        first = int(self.out.getvalue().splitlines()[-2].split()[4])
+        self.send("go")
+        second = int(self.out.getvalue().splitlines()[-2].split()[4])
+        self.assertLess(second, first)
+        self.send("newgame", "go")
+        self.assertEqual(first, int(self.out.getvalue().splitlines()[-2].split()[4]))
+
+    def test_depths_share_one_generation(self):
+        table = self.engine.ai.transposition_table
+        self.send("position startpos", "go depth 4")
+        self.assertEqual(1, table.generation)
+        # the last depth found what the ones before it stored, which are all still current
+        self.assertGreater(self.engine.ai.last_stats.table_hits, 0)
+        self.assertEqual({1}, {entry.generation for entry in table.entries if entry is not None})
+        self.send("go depth 4")
+        self.assertEqual(2, table.generation)
+
+    def test_runs_headless(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", "import sys, ai.engine; print('pygame' in sys.modules); "
+                                                       "sys.argv = ['engine']; ai.engine.main()"],
+                                input="isready\nposition startpos\ngo depth 2\nquit\n", capture_output=True,
+                                text=True, cwd=root, timeout=60)
+        lines = result.stdout.splitlines()
+        self.assertEqual("False", lines[0])
+        self.assertEqual("readyok", lines[1])
+        self.assertTrue(lines[-1].startswith("bestmove "))
+
+
+if __name__ == '__main__':
+    unittest.main()
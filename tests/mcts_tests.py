@@ -0,0 +1,77 @@
+import time
+import unittest
+from concurrent.futures.process import ProcessPoolExecutor
+
+from ai.ai import Ai, Move
+from ai.mcts import Mcts
+from model.model import Board, Color, Piece, Tile
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.b = Board()
+        self.mcts = Mcts(self.b, Color.RED, playouts=300, collect_stats=True, seed=1)
+
+    def check_tree(self):
+        root = self.mcts.root
+        first, count = self.mcts.first_children[root], self.mcts.child_counts[root]
+        # every playout goes through one of the root's children, but for the one that scored a reused root
+        # as a leaf before it was expanded, and no virtual loss is left behind
+        self.assertIn(self.mcts.visits[root] - sum(self.mcts.visits[first:first + count]), (0, 1))
+        self.assertFalse(any(self.mcts.virtual_losses))
+
+    def test_search_plays_a_legal_move(self):
+        before = str(self.b)
+        move = self.mcts.get_best_move(None)
+        self.assertIn(move, self.mcts.get_available_moves(self.b))
+        self.assertEqual(before, str(self.b))
+        self.assertEqual(300, self.mcts.last_stats.nodes)
+        self.assertEqual(300, self.mcts.visits[self.mcts.root])
+        self.check_tree()
+
+    def test_tree_is_reused(self):
+        self.mcts.next_move(None)
+        reply = Ai(self.b, Color.BLACK, 2, alpha_beta=True)
+        reply.next_move(None)
+        old_root, node_count = self.mcts.root, self.mcts.node_count()
+        self.mcts.get_best_move(None)
+        self.assertNotEqual(old_root, self.mcts.root)
+        self.assertGreater(self.mcts.visits[self.mcts.root], 300)
+        self.assertGreater(self.mcts.node_count(), node_count)
+        self.check_tree()
+        # a position the tree has not seen starts a new one
+        self.mcts.get_best_move(None, Board())
+        self.assertEqual(0, self.mcts.root)
+
+    def test_does_not_take_back_its_last_move(self):
+        board = Board(True)
+        king = Piece(Color.RED)
+        king.king()
+        board.set_piece_at(Tile(3, 2), king)
+        board.set_piece_at(Tile(7, 6), Piece(Color.BLACK))
+        board.turn = Color.RED
+        board.red_checkers = 1
+        board.black_checkers = 1
+        board.reset_incremental_state()
+        mcts = Mcts(board, Color.RED, playouts=50, seed=3)
+        mcts.last_move = Move([Tile(2, 1), Tile(3, 2)])
+        self.assertNotIn(Move([Tile(3, 2), Tile(2, 1)]), [mcts.get_best_move(None) for _ in range(3)])
+
+    def test_rollouts_across_processes(self):
+        mcts = Mcts(self.b, Color.RED, playouts=64, rollout_plies=4, batch_size=16, collect_stats=True, seed=4)
+        with ProcessPoolExecutor(2) as executor:
+            move = mcts.get_best_move(executor)
+        self.assertIn(move, mcts.get_available_moves(self.b))
+        self.assertEqual(64, mcts.last_stats.nodes)
+        self.mcts = mcts
+        self.check_tree()
+
+    def test_time_limit(self):
+        mcts = Mcts(self.b, Color.RED, time_limit=0.2, playouts=10 ** 9)
+        started = time.time()
+        mcts.get_best_move(None)
+        self.assertLess(time.time() - started, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from ai.ai import Ai
+from ai.network import Network, NetworkEvaluator, network_inputs
+from ai.tuning import Dataset
+from model.batch import BatchEvaluator, codes_from_keys
+from model.bitboard import BitBoard
+from model.model import Board, Color
+
+
+def random_games(count: int, seed: int, max_plies: int = 100):
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        board = Board()
+        ai = Ai(board, Color.RED)
+        moves = []
+        while len(moves) < max_plies and board.winner() is None:
+            legal_moves = ai.get_available_moves(board)
+            if not legal_moves:
+                break
+            moves.append(rng.choice(legal_moves))
+            Ai.do_move(moves[-1], board)
+        games.append((moves, board.winner()))
+    return games
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dataset = Dataset.from_games(random_games(8, 2), 4)
+        self.network = Network.random((16, 8), 0.5, seed=3)
+
+    def test_inputs_are_one_hot(self):
+        board = Board()
+        inputs = network_inputs(codes_from_keys([board.piece_codes]))
+        self.assertEqual((1, 128), inputs.shape)
+        self.assertEqual(24, inputs.sum())
+        # black men fill the first kind's columns of the last twelve squares, red men the second's of the first
+        self.assertEqual([0] * 20 + [1] * 12, inputs[0, 0::4].tolist())
+        self.assertEqual([1] * 12 + [0] * 20, inputs[0, 1::4].tolist())
+
+    def test_cache(self):
+        evaluator = NetworkEvaluator(self.network, cache_size=50)
+        codes = self.dataset.codes[:40]
+        first = evaluator.evaluate(codes)
+        self.assertEqual(40, evaluator.inferences)
+        self.assertTrue(np.allclose(first, evaluator.evaluate(codes)))
+        self.assertEqual(40, evaluator.inferences)
+        self.assertEqual(40, evaluator.cache_hits)
+        evaluator.evaluate(self.dataset.codes[40:60])
+        self.assertEqual(50, len(evaluator.cache))
+        # the least recently used positions were dropped
+        evaluator.evaluate(codes[:1])
+        self.assertEqual(61, evaluator.inferences)
+        self.assertIn("inferences", evaluator.report())
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "network.npz")
+            self.network.save(path)
+            loaded = Network.load(path)
+        inputs = network_inputs(self.dataset.codes)
+        self.assertEqual(0.5, loaded.scale)
+        self.assertTrue(np.array_equal(self.network.forward(inputs), loaded.forward(inputs)))
+
+    def test_training_lowers_the_loss(self):
+        first = self.network.train(self.dataset, 1, seed=1)
+        last = self.network.train(self.dataset, 5, seed=1)
+        self.assertLess(last, first)
+
+    def test_search_with_an_evaluator(self):
+        board = Board()
+        for bitboard in (False, True):
+            for alpha_beta in (False, True):
+                # a BatchEvaluator plugged in searches exactly like get_value
+                moves = []
+                for evaluator in (None, BatchEvaluator()):
+                    ai = Ai(board, Color.RED, 3, alpha_beta=alpha_beta, bitboard=bitboard, quiescence_depth=4)
+                    ai.set_evaluator(evaluator)
+                    moves.append(ai.get_best_move(None))
+                self.assertEqual(moves[0], moves[1])
+        evaluator = NetworkEvaluator(self.network)
+        ai = Ai(board, Color.RED, 3, alpha_beta=True, bitboard=True)
+        ai.set_evaluator(evaluator)
+        self.assertIn(ai.get_best_move(None), ai.get_available_moves(board))
+        self.assertGreater(evaluator.inferences, 0)
+        self.assertGreater(evaluator.cache_hits, 0)
+        self.assertEqual(ai.leaf_value(board), evaluator.evaluate_boards([BitBoard.from_board(board)])[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
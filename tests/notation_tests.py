@@ -0,0 +1,35 @@
+import unittest
+
+from ai.ai import Move
+from ai.notation import move_to_text, move_from_text, moves_from_text, move_code, move_from_code
+from model.model import Tile
+
+
+class MyTestCase(unittest.TestCase):
+    def test_step_round_trip(self):
+        move = Move([Tile(5, 2), Tile(4, 3)])
+        self.assertEqual("22-18", move_to_text(move))
+        self.assertEqual(move, move_from_text("22-18"))
+
+    def test_jump_round_trip(self):
+        move = Move([Tile(3, 0), Tile(5, 2), Tile(7, 4)])
+        self.assertEqual("13x22x31", move_to_text(move))
+        self.assertEqual(move, move_from_text("13x22x31"))
+
+    def test_game_text(self):
+        self.assertEqual([Move([Tile(5, 2), Tile(4, 3)]), Move([Tile(2, 5), Tile(3, 4)])],
+                         moves_from_text("22-18  11-15\n"))
+
+    def test_bad_moves(self):
+        for text in ("22", "0-5", "22-33", "a-b"):
+            with self.assertRaises(ValueError):
+                move_from_text(text)
+
+    def test_code_round_trip(self):
+        move = Move([Tile(7, 0), Tile(5, 2), Tile(3, 4), Tile(1, 6), Tile(3, 4)])
+        self.assertEqual(move, move_from_code(move_code(move)))
+        self.assertLess(move_code(move), 1 << 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from ai.ai import Ai, Move
+from ai.ordering import MoveOrdering
+from ai.transposition import TranspositionTable
+from model.model import Board, Tile, Color
+
+
+def no_priority(move: Move) -> int:
+    return 0
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ordering = MoveOrdering()
+        self.moves = [Move([Tile(5, 0), Tile(4, 1)]),
+                      Move([Tile(5, 2), Tile(4, 1)]),
+                      Move([Tile(5, 2), Tile(4, 3)])]
+
+    def ordered(self, ply: int = 3, hash_move=None):
+        return [move for _, move in self.ordering.order(self.moves, ply, no_priority, hash_move)]
+
+    def test_generation_order_without_information(self):
+        self.assertEqual(self.moves, self.ordered())
+
+    def test_killer_goes_first_at_its_ply(self):
+        self.ordering.record_cutoff(self.moves[2], 3, 1)
+        self.assertEqual(self.moves[2], self.ordered()[0])
+        # a killer from another ply only counts through the history table
+        self.ordering.history = [[0] * 32 for _ in range(32)]
+        self.assertEqual(self.moves, self.ordered(ply=4))
+
+    def test_history_orders_quiet_moves(self):
+        self.ordering.record_cutoff(self.moves[1], 6, 3)
+        self.ordering.record_cutoff(self.moves[2], 7, 2)
+        self.assertEqual([self.moves[1], self.moves[2], self.moves[0]], self.ordered(ply=0))
+
+    def test_killers_are_kept_per_ply(self):
+        for move in self.moves:
+            self.ordering.record_cutoff(move, 1, 1)
+        self.assertEqual([self.moves[2].path, self.moves[1].path], self.ordering.killers[1])
+
+    def test_captures_do_not_become_killers(self):
+        self.ordering.record_cutoff(Move([Tile(5, 2), Tile(3, 4)]), 1, 4)
+        self.assertEqual([], self.ordering.killers)
+        self.assertEqual(0, sum(map(sum, self.ordering.history)))
+
+    def test_hash_move_beats_killers(self):
+        self.ordering.record_cutoff(self.moves[2], 3, 1)
+        self.assertEqual(self.moves[0], self.ordered(hash_move=self.moves[0])[0])
+
+    def test_new_search_forgets_killers_and_ages_history(self):
+        self.ordering.record_cutoff(self.moves[2], 3, 4)
+        self.ordering.new_search()
+        self.assertEqual([], self.ordering.killers)
+        self.assertEqual(8, self.ordering.history[21][17])
+
+    def test_search_reports_first_move_best_rate(self):
+        board = Board()
+        ai = Ai(board, Color.BLACK, 5, alpha_beta=True, transposition_table=TranspositionTable(), collect_stats=True)
+        ai.get_best_move(None)
+        rate = ai.last_stats.first_move_best_rate()
+        self.assertGreater(rate, 0.5)
+        self.assertLessEqual(rate, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import io
+import unittest
+
+from ai.ai import Ai
+from ai.perft import perft, divide, run_suite, PerftPosition, TEST_POSITIONS, START_POSITION
+from model.bitboard import BitBoard
+from model.model import Board
+
+
+class MyTestCase(unittest.TestCase):
+    def test_start_position_counts(self):
+        board = Board()
+        ai = Ai(board, board.turn)
+        for depth in range(1, 5):
+            self.assertEqual(START_POSITION.counts[depth - 1], perft(ai, board, depth))
+
+    def test_board_is_restored(self):
+        board = Board()
+        ai = Ai(board, board.turn)
+        snapshot = board.snapshot()
+        perft(ai, board, 3)
+        self.assertEqual(snapshot, board.snapshot())
+
+    def test_divide_sums_to_perft(self):
+        board = Board()
+        ai = Ai(board, board.turn)
+        self.assertEqual(perft(ai, board, 3), sum(divide(ai, board, 3).values()))
+
+    def test_suite_passes_with_both_generators(self):
+        for bitboard in (False, True):
+            out = io.StringIO()
+            self.assertTrue(run_suite(4, bitboard, out=out))
+            self.assertEqual(len(TEST_POSITIONS), len(out.getvalue().splitlines()))
+
+    def test_suite_reports_mismatch(self):
+        position = TEST_POSITIONS[1]
+        wrong = PerftPosition(position.name, position.diagram, position.turn, [position.counts[0] + 1])
+        self.assertFalse(run_suite(1, positions=[wrong], out=io.StringIO()))
+
+    def test_bitboard_matches_reference(self):
+        for position in TEST_POSITIONS[1:]:
+            board = position.board()
+            ai = Ai(board, board.turn)
+            self.assertEqual(position.counts[4], perft(ai, BitBoard.from_board(board), 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
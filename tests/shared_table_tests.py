@@ -0,0 +1,99 @@
+import unittest
+from concurrent.futures.process import ProcessPoolExecutor
+
+from ai.ai import Ai, Move
+from ai.shared_table import SharedTranspositionTable, HEADER_WORDS, SLOT_WORDS, _attached_tables
+from ai.transposition import Bound
+from model.model import Board, Tile, Color
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = SharedTranspositionTable(64 * SharedTranspositionTable.ENTRY_BYTES)
+
+    def tearDown(self) -> None:
+        self.table.close()
+
+    def test_probe_returns_stored_entry(self):
+        self.table.store(1234, 3, 1.5, Bound.LOWER, Move([Tile(5, 2), Tile(3, 4), Tile(1, 2)]))
+        entry = self.table.probe(1234)
+        self.assertEqual(3, entry.depth)
+        self.assertEqual(1.5, entry.value)
+        self.assertEqual(Bound.LOWER, entry.bound)
+        # only the first step of the best move is kept
+        self.assertEqual(Move([Tile(5, 2), Tile(3, 4)]), entry.best_move)
+
+    def test_values_are_exact(self):
+        # a value rounded on the way through could pass a beta cutoff the true value does not
+        for key, (value, bound) in enumerate([(0.123456789, Bound.LOWER), (-1 / 3, Bound.UPPER),
+                                              (99999.000000001, Bound.EXACT)]):
+            self.table.store(key, 4, value, bound, None)
+            entry = self.table.probe(key)
+            self.assertEqual(value.hex(), entry.value.hex())
+            self.assertEqual(bound, entry.bound)
+
+    def test_attached_table_sees_stores(self):
+        self.table.store(99, 2, -0.25, Bound.EXACT, None)
+        other = SharedTranspositionTable(64 * SharedTranspositionTable.ENTRY_BYTES, self.table.memory.name)
+        entry = other.probe(99)
+        self.assertEqual(-0.25, entry.value)
+        self.assertIsNone(entry.best_move)
+        other.close()
+
+    def test_attaching_another_table_detaches_the_old_one(self):
+        other = SharedTranspositionTable(64 * SharedTranspositionTable.ENTRY_BYTES)
+        try:
+            first = SharedTranspositionTable.attach(*self.table.spec())
+            self.assertIs(first, SharedTranspositionTable.attach(*self.table.spec()))
+            SharedTranspositionTable.attach(*other.spec())
+            self.assertIsNone(first.memory.buf)
+            self.assertEqual([other.memory.name], list(_attached_tables))
+        finally:
+            for table in _attached_tables.values():
+                table.close()
+            _attached_tables.clear()
+            other.close()
+
+    def test_torn_entry_is_ignored(self):
+        self.table.store(1234, 3, 1.5, Bound.EXACT, None)
+        index = HEADER_WORDS + SLOT_WORDS * (1234 % self.table.size)
+        self.table.words[index + 1] ^= 1
+        self.assertIsNone(self.table.probe(1234))
+        self.table.store(1234, 3, 1.5, Bound.EXACT, None)
+        self.table.words[index + 2] ^= 1
+        self.assertIsNone(self.table.probe(1234))
+
+    def test_deeper_entry_is_kept(self):
+        self.table.store(3, 5, 1.5, Bound.EXACT, None)
+        self.table.store(3 + self.table.size, 2, 2.5, Bound.EXACT, None)
+        self.assertEqual(5, self.table.probe(3).depth)
+        self.table.new_search()
+        self.table.store(3 + self.table.size, 2, 2.5, Bound.EXACT, None)
+        self.assertIsNone(self.table.probe(3))
+
+    def test_clear(self):
+        self.table.store(7, 3, 0.5, Bound.EXACT, None)
+        self.table.new_search()
+        self.table.set_stopped(True)
+        self.table.clear()
+        self.assertIsNone(self.table.probe(7))
+        self.assertEqual(0, self.table.generation)
+        self.assertFalse(self.table.stopped())
+
+    def test_stop_flag(self):
+        self.assertFalse(self.table.stopped())
+        self.table.set_stopped(True)
+        self.assertTrue(self.table.stopped())
+
+    def test_lazy_smp_search(self):
+        board = Board()
+        ai = Ai(board, Color.BLACK, 4, alpha_beta=True, bitboard=True, transposition_table=self.table,
+                lazy_smp_workers=2)
+        with ProcessPoolExecutor(2) as executor:
+            move = ai.get_best_move(executor)
+        self.assertIn(move, ai.get_available_moves(board))
+        self.assertTrue(self.table.stopped())
+
+
+if __name__ == '__main__':
+    unittest.main()
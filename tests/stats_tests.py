@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures.process import ProcessPoolExecutor
+
+from ai.ai import Ai
+from ai.transposition import TranspositionTable
+from model.model import Board, Color
+
+
+class MyTestCase(unittest.TestCase):
+    def test_stats_are_off_by_default(self):
+        ai = Ai(Board(), Color.BLACK, 2)
+        ai.get_best_move(None)
+        self.assertIsNone(ai.last_stats)
+        self.assertIsNone(ai.stats)
+
+    def test_minimax_counts(self):
+        ai = Ai(Board(), Color.BLACK, 2, collect_stats=True)
+        ai.get_best_move(None)
+        stats = ai.last_stats
+        # 7 opening moves, each answered by 7 replies
+        self.assertEqual(1 + 7 + 49, stats.nodes)
+        self.assertEqual(49, stats.leaves)
+        self.assertEqual([1, 7], stats.expanded_per_ply)
+        self.assertEqual([7.0, 7.0], stats.branching_factors())
+        self.assertEqual(2, stats.completed_depth)
+        self.assertIsNone(stats.worker_utilization())
+
+    def test_alpha_beta_counts_cutoffs_and_table(self):
+        ai = Ai(Board(), Color.BLACK, 4, alpha_beta=True, transposition_table=TranspositionTable(), collect_stats=True)
+        ai.get_best_move(None)
+        stats = ai.last_stats
+        self.assertGreater(stats.cutoffs, 0)
+        self.assertGreater(stats.table_probes, 0)
+        self.assertLessEqual(stats.table_hits, stats.table_probes)
+        self.assertLess(stats.nodes, 1 + 7 + 49 + 302 + 1469)
+
+    def test_timed_search_records_each_depth(self):
+        ai = Ai(Board(), Color.BLACK, alpha_beta=True, time_limit=0.5, collect_stats=True)
+        ai.get_best_move(None)
+        depths = [depth for depth, _, _ in ai.last_stats.depth_times]
+        self.assertEqual(list(range(1, ai.completed_depth + 1)), depths)
+
+    def test_executor_search_reports_workers(self):
+        ai = Ai(Board(), Color.BLACK, 2, collect_stats=True)
+        with ProcessPoolExecutor(2) as executor:
+            ai.get_best_move(executor)
+        stats = ai.last_stats
+        # workers keep their own tables between searches, so deeper counts depend on what they ran before
+        self.assertEqual(1, stats.expanded_per_ply[0])
+        self.assertGreaterEqual(stats.nodes, 1 + 7)
+        self.assertGreaterEqual(stats.to_dict()["workers"], 1)
+        self.assertGreater(stats.worker_utilization(), 0)
+
+    def test_json_lines_export(self):
+        ai = Ai(Board(), Color.BLACK, 2, collect_stats=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stats.jsonl")
+            for _ in range(2):
+                ai.get_best_move(None)
+                ai.last_stats.write_json_line(path, version="test")
+            with open(path) as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual(2, len(records))
+        self.assertEqual("test", records[0]["version"])
+        self.assertEqual(57, records[1]["nodes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+
+from ai.ai import Ai
+import numpy as np
+
+from ai.tablebase import Tablebase, TABLEBASE_WIN, generate, materials, positions, position_index, \
+    position_indices, table_size, solve, successor_materials, write
+from model.bitboard import BitBoard
+from model.model import Board, Color, Piece, Tile
+
+
+def board_with(pieces, turn: Color) -> Board:
+    # pieces: (tile, color, is_king)
+    board = Board(True)
+    for tile, color, is_king in pieces:
+        piece = Piece(color)
+        if is_king:
+            piece.king()
+        board.set_piece_at(tile, piece)
+    board.red_checkers = sum(1 for _, color, _ in pieces if color == Color.RED)
+    board.black_checkers = len(pieces) - board.red_checkers
+    board.turn = turn
+    board.reset_incremental_state()
+    return board
+
+
+class MyTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # every two-piece table, and two kings against one, which needs only the king against king table
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "test.tb")
+        tables = {}
+        for material in materials(2) + [(0, 2, 0, 1)]:
+            tables[material] = solve(material, tables)
+        write(cls.path, 3, tables)
+        cls.tablebase = Tablebase(cls.path)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tablebase.close()
+        cls.directory.cleanup()
+
+    def test_materials_come_after_what_they_lead_to(self):
+        order = materials(3)
+        self.assertLess(order.index((0, 1, 0, 1)), order.index((1, 0, 0, 1)))
+        self.assertLess(order.index((1, 0, 0, 1)), order.index((0, 1, 1, 1)))
+        self.assertNotIn((0, 2, 0, 0), order)
+
+    def test_indices_are_distinct_and_in_range(self):
+        for material in materials(2):
+            indices = [position_index(material, black, red, kings, red_to_move)
+                       for black, red, kings in positions(material) for red_to_move in (False, True)]
+            self.assertEqual(len(indices), len(set(indices)))
+            self.assertLess(max(indices), table_size(material))
+
+    def test_indices_of_arrays_match(self):
+        for material in materials(3):
+            black, red, kings = (np.array(masks, np.uint32) for masks in zip(*positions(material)))
+            for red_to_move in (False, True):
+                self.assertEqual([position_index(material, int(b), int(r), int(k), red_to_move)
+                                  for b, r, k in zip(black, red, kings)],
+                                 position_indices(material, black, red, kings, red_to_move).tolist())
+
+    def test_successors_come_first(self):
+        order = materials(4)
+        for material in order:
+            for successor in successor_materials(material):
+                self.assertLess(order.index(successor), order.index(material))
+        # captures of the last piece end the game, leaving the crownings
+        self.assertEqual([(0, 1, 1, 0), (1, 0, 0, 1)], successor_materials((1, 0, 1, 0)))
+
+    def test_parallel_generation_matches(self):
+        serial = generate(3)
+        parallel = generate(3, workers=2)
+        self.assertEqual(list(serial), list(parallel))
+        for material, values in serial.items():
+            self.assertTrue(np.array_equal(values, parallel[material]))
+        self.assertTrue(np.array_equal(serial[(0, 2, 0, 1)], np.asarray(self.tablebase.tables[(0, 2, 0, 1)])))
+
+    def test_side_without_a_move_loses(self):
+        board = board_with([(Tile(0, 1), Color.RED, False), (Tile(1, 0), Color.BLACK, False)], Color.BLACK)
+        self.assertEqual(-1, self.tablebase.probe(board))
+        self.assertEqual(TABLEBASE_WIN, self.tablebase.value(board))
+
+    def test_capture_of_the_last_piece_wins_at_once(self):
+        board = board_with([(Tile(4, 3), Color.RED, True), (Tile(5, 4), Color.BLACK, False)], Color.RED)
+        self.assertEqual(1, self.tablebase.probe(board))
+        self.assertEqual(TABLEBASE_WIN - 1, self.tablebase.value(board))
+
+    def test_lone_kings_draw(self):
+        board = board_with([(Tile(0, 1), Color.RED, True), (Tile(7, 6), Color.BLACK, True)], Color.RED)
+        self.assertEqual(0, self.tablebase.probe(board))
+
+    def test_positions_outside_the_tablebase_are_not_found(self):
+        self.assertIsNone(self.tablebase.probe(Board()))
+        board = board_with([(Tile(0, 1), Color.RED, True), (Tile(2, 1), Color.RED, False),
+                            (Tile(7, 6), Color.BLACK, True)], Color.RED)
+        self.assertIsNone(self.tablebase.probe(board))
+
+    def test_bitboard_probes_the_same_entry(self):
+        board = board_with([(Tile(7, 0), Color.RED, True), (Tile(6, 1), Color.RED, True),
+                            (Tile(0, 1), Color.BLACK, True)], Color.RED)
+        self.assertEqual(self.tablebase.probe(board), self.tablebase.probe(BitBoard.from_board(board)))
+
+    def test_engines_play_the_endgame_perfectly(self):
+        for bitboard in (False, True):
+            board = board_with([(Tile(7, 0), Color.RED, True), (Tile(6, 1), Color.RED, True),
+                                (Tile(0, 1), Color.BLACK, True)], Color.RED)
+            distance = self.tablebase.probe(board)
+            self.assertGreater(distance, 0)
+            ais = {color: Ai(board, color, 1, alpha_beta=True, bitboard=bitboard, collect_stats=True)
+                   for color in Color}
+            for ai in ais.values():
+                ai.set_tablebase(self.tablebase)
+            plies, hits = 0, 0
+            while board.winner() is None:
+                ai = ais[board.turn]
+                ai.play(ai.get_best_move(None))
+                hits += ai.last_stats.tablebase_hits
+                plies += 1
+            # the winner takes the shortest way and the loser the longest
+            self.assertEqual(Color.RED, board.winner())
+            self.assertEqual(distance, plies)
+            self.assertGreater(hits, 0)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.directory.name, "other.tb")
+        with open(path, "wb") as file:
+            file.write(bytes(64))
+        with self.assertRaises(ValueError):
+            Tablebase(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from ai.tournament import parse_engine, elo_difference, play_game, random_opening, run_tournament, DEFAULT_ENGINE
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.strong = parse_engine("depth=3")
+        self.weak = parse_engine("depth=1,quiescence_depth=0,transposition_table=false")
+
+    def test_parse_engine(self):
+        engine = parse_engine("depth=6,bitboard=off,time_limit=0.5,weights=1:2:3:4")
+        self.assertEqual(6, engine["depth"])
+        self.assertFalse(engine["bitboard"])
+        self.assertEqual(0.5, engine["time_limit"])
+        self.assertEqual((1, 2, 3, 4), engine["weights"])
+        self.assertEqual(DEFAULT_ENGINE["quiescence_depth"], engine["quiescence_depth"])
+        with self.assertRaises(ValueError):
+            parse_engine("speed=11")
+        with self.assertRaises(ValueError):
+            parse_engine("weights=1:2")
+
+    def test_elo_difference(self):
+        elo, margin = elo_difference(30, 40, 30)
+        self.assertAlmostEqual(0, elo)
+        self.assertGreater(margin, 0)
+        better, _ = elo_difference(60, 20, 20)
+        worse, _ = elo_difference(20, 20, 60)
+        self.assertAlmostEqual(better, -worse)
+        self.assertGreater(better, 100)
+        # more games, narrower error bars
+        self.assertLess(elo_difference(300, 400, 300)[1], margin)
+        # identical results leave the difference unbounded rather than exact
+        self.assertEqual((float("inf"), float("inf")), elo_difference(10, 0, 0))
+        self.assertEqual((float("-inf"), float("inf")), elo_difference(0, 0, 10))
+        self.assertEqual((0.0, float("inf")), elo_difference(0, 10, 0))
+
+    def test_random_opening_is_reproducible(self):
+        first = random_opening(6, random.Random(3))
+        self.assertEqual(6, len(first))
+        self.assertEqual(first, random_opening(6, random.Random(3)))
+
+    def test_play_game_reports_both_engines(self):
+        record = play_game((0, (self.strong, self.weak), 1, "22-18 11-15", 20))
+        self.assertEqual("b", record["red"])
+        self.assertEqual(20, record["plies"])
+        self.assertIsNone(record["winner"])
+        self.assertEqual(18, sum(record["moves"]))
+        self.assertTrue(all(nodes > 0 for nodes in record["nodes"]))
+
+    def test_win_on_the_last_ply_counts(self):
+        record = play_game((0, (self.strong, self.weak), 0, "22-18 11-15", 200))
+        self.assertEqual("a", record["winner"])
+        line = record["opening"] + " " + record["moves_played"]
+        # the whole winning line as the opening, and as the game with nothing to spare
+        for opening, max_plies in ((line, record["plies"]), ("22-18 11-15", record["plies"])):
+            replayed = play_game((0, (self.strong, self.weak), 0, opening, max_plies))
+            self.assertEqual("a", replayed["winner"])
+            self.assertEqual(record["plies"], replayed["plies"])
+
+    def test_tournament_swaps_colors_and_streams_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.jsonl")
+            result = run_tournament((self.strong, self.weak), 4, random_plies=2, max_plies=60, seed=7, output=path)
+            with open(path) as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual(4, result.games())
+        self.assertEqual(["a", "b", "a", "b"], [record["red"] for record in records])
+        self.assertEqual(records[0]["opening"], records[1]["opening"])
+        self.assertEqual(4, sum(1 for record in records if record["winner"] is not None) + result.draws)
+        self.assertGreaterEqual(result.score(), 0.5)
+        self.assertIn("Elo", result.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
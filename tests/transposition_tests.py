@@ -0,0 +1,47 @@
+import unittest
+
+from ai.ai import Ai, Move
+from ai.transposition import TranspositionTable, Bound
+from model.model import Board, Tile, Color
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = TranspositionTable(10 * TranspositionTable.ENTRY_BYTES)
+
+    def test_probe_returns_stored_entry(self):
+        move = Move([Tile(5, 2), Tile(4, 3)])
+        self.table.store(1234, 3, 1.5, Bound.EXACT, move)
+        entry = self.table.probe(1234)
+        self.assertEqual(3, entry.depth)
+        self.assertEqual(1.5, entry.value)
+        self.assertEqual(Bound.EXACT, entry.bound)
+        self.assertEqual(move, entry.best_move)
+
+    def test_probe_misses_other_key_in_same_slot(self):
+        self.table.store(3, 3, 1.5, Bound.EXACT, None)
+        self.assertIsNone(self.table.probe(3 + self.table.size))
+
+    def test_deeper_entry_is_kept(self):
+        self.table.store(3, 5, 1.5, Bound.EXACT, None)
+        self.table.store(3 + self.table.size, 2, 2.5, Bound.EXACT, None)
+        self.assertEqual(5, self.table.probe(3).depth)
+        self.table.store(3 + self.table.size, 6, 2.5, Bound.LOWER, None)
+        self.assertIsNone(self.table.probe(3))
+
+    def test_stale_entry_is_replaced(self):
+        self.table.store(3, 5, 1.5, Bound.EXACT, None)
+        self.table.new_search()
+        self.table.store(3 + self.table.size, 1, 2.5, Bound.UPPER, None)
+        self.assertEqual(1, self.table.probe(3 + self.table.size).depth)
+
+    def test_search_fills_table(self):
+        board = Board()
+        ai = Ai(board, Color.BLACK, 3, alpha_beta=True, transposition_table=self.table)
+        move = ai.get_best_move(None)
+        self.assertIn(move, ai.get_available_moves(board))
+        self.assertTrue(any(entry is not None for entry in self.table.entries))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from ai.ai import Ai
+from ai.notation import move_to_text
+from ai.tuning import Dataset, evaluation_loss, fit_scale, games_from_records, read_dataset, tune
+from model.model import Board, Color, read_weights, write_weights
+
+
+def random_games(count: int, seed: int, max_plies: int = 120):
+    # random play, so a side ahead on material usually goes on to win
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        board = Board()
+        ai = Ai(board, Color.RED)
+        moves = []
+        while len(moves) < max_plies and board.winner() is None:
+            legal_moves = ai.get_available_moves(board)
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            Ai.do_move(move, board)
+            moves.append(move)
+        winner = board.winner()
+        if winner is None and len(moves) < max_plies:
+            winner = Color(-board.turn.value)
+        games.append((moves, winner))
+    return games
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.games = random_games(12, 5)
+        self.dataset = Dataset.from_games(self.games, 4)
+
+    def test_dataset_from_games(self):
+        self.assertGreater(len(self.dataset), 100)
+        self.assertEqual((len(self.dataset), 32), self.dataset.codes.shape)
+        self.assertTrue(set(self.dataset.scores.tolist()) <= {0.0, 0.5, 1.0})
+        # the positions skipped at the start of each game are not in there
+        self.assertLess(len(self.dataset), sum(len(moves) for moves, _ in self.games))
+
+    def test_files_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            games_path = os.path.join(directory, "games.txt")
+            with open(games_path, "w") as file:
+                for moves, winner in self.games:
+                    result = {Color.RED: "red", Color.BLACK: "black", None: "draw"}[winner]
+                    file.write(" ".join(move_to_text(move) for move in moves) + " " + result + "\n")
+            from_text = read_dataset(games_path, 4)
+            dataset_path = os.path.join(directory, "positions.npz")
+            from_text.save(dataset_path)
+            loaded = read_dataset(dataset_path)
+        self.assertTrue((self.dataset.codes == from_text.codes).all())
+        self.assertTrue((self.dataset.scores == loaded.scores).all())
+        self.assertTrue((self.dataset.turn_counters == loaded.turn_counters).all())
+
+    def test_games_from_records(self):
+        moves, _ = self.games[0]
+        record = {"opening": " ".join(move_to_text(move) for move in moves[:4]),
+                  "moves_played": " ".join(move_to_text(move) for move in moves[4:]), "red": "b", "winner": "b"}
+        games = games_from_records([json.dumps(record), ""])
+        self.assertEqual([(moves, Color.RED)], games)
+
+    def test_tuning_lowers_the_loss(self):
+        weights = Board(True).get_weights()
+        scale = fit_scale(self.dataset, weights)
+        loss = evaluation_loss(self.dataset, weights, scale)
+        self.assertLess(loss, evaluation_loss(self.dataset, weights, scale * 4))
+        self.assertLess(loss, evaluation_loss(self.dataset, weights, scale / 4))
+        tuned, tuned_loss = tune(self.dataset, weights, scale, iterations=10)
+        self.assertLess(tuned_loss, loss)
+        self.assertAlmostEqual(tuned_loss, evaluation_loss(self.dataset, tuned, scale))
+        self.assertIsInstance(tuned[4], int)
+        self.assertIsInstance(tuned[5], int)
+
+    def test_weights_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "weights.json")
+            write_weights(path, (1.1, 1.2, 1.3, 3, 5, 60))
+            board = Board()
+            board.load_weights(path)
+            self.assertEqual((1.1, 1.2, 1.3, 3, 5, 60), board.get_weights())
+            with open(path, "w") as file:
+                json.dump({"king_value": 2.5}, file)
+            self.assertEqual(2.5, read_weights(path)[3])
+            self.assertEqual(Board(True).get_weights()[:3], read_weights(path)[:3])
+            with open(path, "w") as file:
+                json.dump({"queen_value": 9}, file)
+            with self.assertRaises(ValueError):
+                read_weights(path)
+
+
+if __name__ == '__main__':
+    unittest.main()